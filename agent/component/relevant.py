@@ -18,7 +18,7 @@ from abc import ABC
 from api.db import LLMType
 from api.db.services.llm_service import LLMBundle
 from agent.component import GenerateParam, Generate
-from rag.utils import num_tokens_from_string, encoder
+from rag.utils import num_tokens_from_string, truncate
 
 
 class RelevantParam(GenerateParam):
@@ -66,7 +66,7 @@ class Relevant(Generate, ABC):
         chat_mdl = LLMBundle(self._canvas.get_tenant_id(), LLMType.CHAT, self._param.llm_id)
 
         if num_tokens_from_string(ans) >= chat_mdl.max_length - 4:
-            ans = encoder.decode(encoder.encode(ans)[:chat_mdl.max_length - 4])
+            ans = truncate(ans, chat_mdl.max_length - 4)
 
         ans = chat_mdl.chat(self._param.get_prompt(), [{"role": "user", "content": ans}],
                             self._param.gen_conf())
@@ -25,6 +25,8 @@ from rag.nlp import search, rag_tokenizer
 from rag.prompts import keyword_extraction, cross_languages
 from rag.settings import PAGERANK_FLD
 from rag.utils import rmSpace
+from rag.utils.doc_store_conn import DEFAULT_VECTOR_PRECISION
+from rag.utils.latency import Spans
 from api.db import LLMType, ParserType
 from api.db.services.knowledgebase_service import KnowledgebaseService
 from api.db.services.llm_service import LLMBundle
@@ -255,7 +257,8 @@ def create():
         v, c = embd_mdl.encode([doc.name, req["content_with_weight"] if not d["question_kwd"] else "\n".join(d["question_kwd"])])
         v = 0.1 * v[0] + 0.9 * v[1]
         d["q_%d_vec" % len(v)] = v.tolist()
-        settings.docStoreConn.insert([d], search.index_name(tenant_id), doc.kb_id)
+        settings.docStoreConn.insert([d], search.index_name(tenant_id), doc.kb_id,
+                                     kb.parser_config.get("vector_precision", DEFAULT_VECTOR_PRECISION))
 
         DocumentService.increment_chunk_num(
             doc.id, doc.kb_id, c, 1, 0)
@@ -300,37 +303,44 @@ def retrieval_test():
         if not e:
             return get_data_error_result(message="Knowledgebase not found!")
 
-        if langs:
-            question = cross_languages(kb.tenant_id, None, question, langs)
-
-        embd_mdl = LLMBundle(kb.tenant_id, LLMType.EMBEDDING.value, llm_name=kb.embd_id)
-
-        rerank_mdl = None
-        if req.get("rerank_id"):
-            rerank_mdl = LLMBundle(kb.tenant_id, LLMType.RERANK.value, llm_name=req["rerank_id"])
-
-        if req.get("keyword", False):
-            chat_mdl = LLMBundle(kb.tenant_id, LLMType.CHAT)
-            question += keyword_extraction(chat_mdl, question)
-
-        labels = label_question(question, [kb])
-        ranks = settings.retrievaler.retrieval(question, embd_mdl, tenant_ids, kb_ids, page, size,
-                               similarity_threshold, vector_similarity_weight, top,
-                               doc_ids, rerank_mdl=rerank_mdl, highlight=req.get("highlight"),
-                               rank_feature=labels
-                               )
-        if use_kg:
-            ck = settings.kg_retrievaler.retrieval(question,
-                                                   tenant_ids,
-                                                   kb_ids,
-                                                   embd_mdl,
-                                                   LLMBundle(kb.tenant_id, LLMType.CHAT))
-            if ck["content_with_weight"]:
-                ranks["chunks"].insert(0, ck)
-
-        for c in ranks["chunks"]:
-            c.pop("vector", None)
-        ranks["labels"] = labels
+        with Spans("retrieval_test", root=True) as spans:
+            if langs:
+                with spans.span("cross_languages"):
+                    question = cross_languages(kb.tenant_id, None, question, langs)
+
+            embd_mdl = LLMBundle(kb.tenant_id, LLMType.EMBEDDING.value, llm_name=kb.embd_id)
+
+            rerank_mdl = None
+            if req.get("rerank_id"):
+                rerank_mdl = LLMBundle(kb.tenant_id, LLMType.RERANK.value, llm_name=req["rerank_id"])
+
+            if req.get("keyword", False):
+                chat_mdl = LLMBundle(kb.tenant_id, LLMType.CHAT)
+                with spans.span("keyword_extraction"):
+                    question += keyword_extraction(chat_mdl, question)
+
+            with spans.span("label_question"):
+                labels = label_question(question, [kb])
+            ranks = settings.retrievaler.retrieval(question, embd_mdl, tenant_ids, kb_ids, page, size,
+                                   similarity_threshold, vector_similarity_weight, top,
+                                   doc_ids, rerank_mdl=rerank_mdl, highlight=req.get("highlight"),
+                                   rank_feature=labels
+                                   )
+            if use_kg:
+                with spans.span("kg_retrieval"):
+                    ck = settings.kg_retrievaler.retrieval(question,
+                                                           tenant_ids,
+                                                           kb_ids,
+                                                           embd_mdl,
+                                                           LLMBundle(kb.tenant_id, LLMType.CHAT))
+                if ck["content_with_weight"]:
+                    ranks["chunks"].insert(0, ck)
+
+            for c in ranks["chunks"]:
+                c.pop("vector", None)
+            ranks["labels"] = labels
+        if req.get("timings"):
+            ranks["timings"] = spans.summary()
 
         return get_json_result(data=ranks)
     except Exception as e:
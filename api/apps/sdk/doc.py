@@ -39,6 +39,8 @@ from rag.app.tag import label_question
 from rag.nlp import rag_tokenizer, search
 from rag.prompts import keyword_extraction
 from rag.utils import rmSpace
+from rag.utils.doc_store_conn import DEFAULT_VECTOR_PRECISION
+from rag.utils.latency import Spans
 from rag.utils.storage_factory import STORAGE_IMPL
 
 MAXIMUM_OF_UPLOADING_FILES = 256
@@ -1080,7 +1082,9 @@ def add_chunk(tenant_id, dataset_id, document_id):
     v, c = embd_mdl.encode([doc.name, req["content"] if not d["question_kwd"] else "\n".join(d["question_kwd"])])
     v = 0.1 * v[0] + 0.9 * v[1]
     d["q_%d_vec" % len(v)] = v.tolist()
-    settings.docStoreConn.insert([d], search.index_name(tenant_id), dataset_id)
+    _, kb = KnowledgebaseService.get_by_id(dataset_id)
+    settings.docStoreConn.insert([d], search.index_name(tenant_id), dataset_id,
+                                 kb.parser_config.get("vector_precision", DEFAULT_VECTOR_PRECISION))
 
     DocumentService.increment_chunk_num(doc.id, doc.kb_id, c, 1, 0)
     # rename keys
@@ -1325,6 +1329,12 @@ def retrieval_test(tenant_id):
             highlight:
               type: boolean
               description: Whether to highlight matched content.
+            cursor:
+              type: string
+              description: The `next_cursor` of a previous response, to get its next page from cache.
+            timings:
+              type: boolean
+              description: Whether to return the milliseconds spent in each retrieval stage.
       - in: header
         name: Authorization
         type: string
@@ -1367,6 +1377,12 @@ def retrieval_test(tenant_id):
     for id in kb_ids:
         if not KnowledgebaseService.accessible(kb_id=id, user_id=tenant_id):
             return get_error_data_result(f"You don't own the dataset {id}.")
+    if req.get("cursor"):
+        ranks = settings.retrievaler.retrieval_by_cursor(str(req["cursor"]), kb_ids)
+        if ranks is None:
+            return get_error_data_result("The cursor has expired, please retrieve again.")
+        ranks["chunks"] = rename_retrieval_chunks(ranks["chunks"])
+        return get_result(data=ranks)
     kbs = KnowledgebaseService.get_by_ids(kb_ids)
     embd_nms = list(set([TenantLLMService.split_model_name_and_factory(kb.embd_id)[0] for kb in kbs]))  # remove vendor suffix for comparison
     if len(embd_nms) != 1:
@@ -1401,16 +1417,171 @@ def retrieval_test(tenant_id):
             return get_error_data_result(message="Dataset not found!")
         embd_mdl = LLMBundle(kb.tenant_id, LLMType.EMBEDDING, llm_name=kb.embd_id)
 
+        rerank_mdl = None
+        if req.get("rerank_id"):
+            rerank_mdl = LLMBundle(kb.tenant_id, LLMType.RERANK, llm_name=req["rerank_id"])
+
+        with Spans("retrieval_test", root=True) as spans:
+            if req.get("keyword", False):
+                chat_mdl = LLMBundle(kb.tenant_id, LLMType.CHAT)
+                with spans.span("keyword_extraction"):
+                    question += keyword_extraction(chat_mdl, question)
+
+            with spans.span("label_question"):
+                rank_feature = label_question(question, kbs)
+            ranks = settings.retrievaler.retrieval(
+                question,
+                embd_mdl,
+                tenant_ids,
+                kb_ids,
+                page,
+                size,
+                similarity_threshold,
+                vector_similarity_weight,
+                top,
+                doc_ids,
+                rerank_mdl=rerank_mdl,
+                highlight=highlight,
+                rank_feature=rank_feature,
+            )
+            if use_kg:
+                with spans.span("kg_retrieval"):
+                    ck = settings.kg_retrievaler.retrieval(question, [k.tenant_id for k in kbs], kb_ids, embd_mdl, LLMBundle(kb.tenant_id, LLMType.CHAT))
+                if ck["content_with_weight"]:
+                    ranks["chunks"].insert(0, ck)
+
+        ranks["chunks"] = rename_retrieval_chunks(ranks["chunks"])
+        if req.get("timings"):
+            ranks["timings"] = spans.summary()
+        return get_result(data=ranks)
+    except Exception as e:
+        if str(e).find("not_found") > 0:
+            return get_result(
+                message="No chunk found! Check the chunk status please!",
+                code=settings.RetCode.DATA_ERROR,
+            )
+        return server_error_response(e)
+
+
+@manager.route("/retrieval/batch", methods=["POST"])  # noqa: F821
+@token_required
+def batch_retrieval(tenant_id):
+    """
+    Retrieve chunks for several queries in one call.
+    ---
+    tags:
+      - Retrieval
+    security:
+      - ApiKeyAuth: []
+    parameters:
+      - in: body
+        name: body
+        description: Retrieval parameters, shared by all questions.
+        required: true
+        schema:
+          type: object
+          properties:
+            dataset_ids:
+              type: array
+              items:
+                type: string
+              required: true
+              description: List of dataset IDs to search in.
+            questions:
+              type: array
+              items:
+                type: string
+              required: true
+              description: Query strings.
+            document_ids:
+              type: array
+              items:
+                type: string
+              description: List of document IDs to filter.
+            similarity_threshold:
+              type: number
+              format: float
+              description: Similarity threshold.
+            vector_similarity_weight:
+              type: number
+              format: float
+              description: Vector similarity weight.
+            top_k:
+              type: integer
+              description: Maximum number of chunks to return.
+            highlight:
+              type: boolean
+              description: Whether to highlight matched content.
+      - in: header
+        name: Authorization
+        type: string
+        required: true
+        description: Bearer token for authentication.
+    responses:
+      200:
+        description: One retrieval result per question, in order.
+        schema:
+          type: array
+          items:
+            type: object
+            properties:
+              chunks:
+                type: array
+                items:
+                  type: object
+    """
+    req = request.json
+    if not req.get("dataset_ids"):
+        return get_error_data_result("`dataset_ids` is required.")
+    kb_ids = req["dataset_ids"]
+    if not isinstance(kb_ids, list):
+        return get_error_data_result("`dataset_ids` should be a list")
+    for id in kb_ids:
+        if not KnowledgebaseService.accessible(kb_id=id, user_id=tenant_id):
+            return get_error_data_result(f"You don't own the dataset {id}.")
+    kbs = KnowledgebaseService.get_by_ids(kb_ids)
+    embd_nms = list(set([TenantLLMService.split_model_name_and_factory(kb.embd_id)[0] for kb in kbs]))  # remove vendor suffix for comparison
+    if len(embd_nms) != 1:
+        return get_result(
+            message='Datasets use different embedding models."',
+            code=settings.RetCode.DATA_ERROR,
+        )
+    questions = req.get("questions")
+    if not questions or not isinstance(questions, list) or not all(isinstance(q, str) for q in questions):
+        return get_error_data_result("`questions` should be a non-empty list of strings.")
+    page = int(req.get("page", 1))
+    size = int(req.get("page_size", 30))
+    doc_ids = req.get("document_ids", [])
+    if not isinstance(doc_ids, list):
+        return get_error_data_result("`documents` should be a list")
+    doc_ids_list = KnowledgebaseService.list_documents_by_ids(kb_ids)
+    for doc_id in doc_ids:
+        if doc_id not in doc_ids_list:
+            return get_error_data_result(f"The datasets don't own the document {doc_id}")
+    similarity_threshold = float(req.get("similarity_threshold", 0.2))
+    vector_similarity_weight = float(req.get("vector_similarity_weight", 0.3))
+    top = int(req.get("top_k", 1024))
+    if req.get("highlight") == "False" or req.get("highlight") == "false":
+        highlight = False
+    else:
+        highlight = True
+    try:
+        tenant_ids = list(set([kb.tenant_id for kb in kbs]))
+        e, kb = KnowledgebaseService.get_by_id(kb_ids[0])
+        if not e:
+            return get_error_data_result(message="Dataset not found!")
+        embd_mdl = LLMBundle(kb.tenant_id, LLMType.EMBEDDING, llm_name=kb.embd_id)
+
         rerank_mdl = None
         if req.get("rerank_id"):
             rerank_mdl = LLMBundle(kb.tenant_id, LLMType.RERANK, llm_name=req["rerank_id"])
 
         if req.get("keyword", False):
             chat_mdl = LLMBundle(kb.tenant_id, LLMType.CHAT)
-            question += keyword_extraction(chat_mdl, question)
+            questions = [question + keyword_extraction(chat_mdl, question) for question in questions]
 
-        ranks = settings.retrievaler.retrieval(
-            question,
+        rankss = settings.retrievaler.batch_retrieval(
+            questions,
             embd_mdl,
             tenant_ids,
             kb_ids,
@@ -1422,35 +1593,11 @@ def retrieval_test(tenant_id):
             doc_ids,
             rerank_mdl=rerank_mdl,
             highlight=highlight,
-            rank_feature=label_question(question, kbs),
+            rank_feature=[label_question(question, kbs) for question in questions],
         )
-        if use_kg:
-            ck = settings.kg_retrievaler.retrieval(question, [k.tenant_id for k in kbs], kb_ids, embd_mdl, LLMBundle(kb.tenant_id, LLMType.CHAT))
-            if ck["content_with_weight"]:
-                ranks["chunks"].insert(0, ck)
-
-        for c in ranks["chunks"]:
-            c.pop("vector", None)
-
-        ##rename keys
-        renamed_chunks = []
-        for chunk in ranks["chunks"]:
-            key_mapping = {
-                "chunk_id": "id",
-                "content_with_weight": "content",
-                "doc_id": "document_id",
-                "important_kwd": "important_keywords",
-                "question_kwd": "questions",
-                "docnm_kwd": "document_keyword",
-                "kb_id": "dataset_id",
-            }
-            rename_chunk = {}
-            for key, value in chunk.items():
-                new_key = key_mapping.get(key, key)
-                rename_chunk[new_key] = value
-            renamed_chunks.append(rename_chunk)
-        ranks["chunks"] = renamed_chunks
-        return get_result(data=ranks)
+        for ranks in rankss:
+            ranks["chunks"] = rename_retrieval_chunks(ranks["chunks"])
+        return get_result(data=rankss)
     except Exception as e:
         if str(e).find("not_found") > 0:
             return get_result(
@@ -1458,3 +1605,24 @@ def retrieval_test(tenant_id):
                 code=settings.RetCode.DATA_ERROR,
             )
         return server_error_response(e)
+
+
+def rename_retrieval_chunks(chunks):
+    key_mapping = {
+        "chunk_id": "id",
+        "content_with_weight": "content",
+        "doc_id": "document_id",
+        "important_kwd": "important_keywords",
+        "question_kwd": "questions",
+        "docnm_kwd": "document_keyword",
+        "kb_id": "dataset_id",
+    }
+    renamed_chunks = []
+    for chunk in chunks:
+        chunk.pop("vector", None)
+        rename_chunk = {}
+        for key, value in chunk.items():
+            new_key = key_mapping.get(key, key)
+            rename_chunk[new_key] = value
+        renamed_chunks.append(rename_chunk)
+    return renamed_chunks
@@ -35,6 +35,7 @@ from api.versions import get_ragflow_version
 from rag.utils.storage_factory import STORAGE_IMPL, STORAGE_IMPL_TYPE
 from timeit import default_timer as timer
 
+from rag.utils.latency import LATENCY_HISTOGRAMS
 from rag.utils.redis_conn import REDIS_CONN
 
 @manager.route("/version", methods=["GET"])  # noqa: F821
@@ -169,6 +170,51 @@ def status():
     return get_json_result(data=res)
 
 
+@manager.route("/latency", methods=["GET"])  # noqa: F821
+@login_required
+def latency():
+    """
+    Get the latency histograms of chat and retrieval stages served by this server process.
+    ---
+    tags:
+      - System
+    security:
+      - ApiKeyAuth: []
+    responses:
+      200:
+        description: Per-stage latency histograms, keyed by request kind then stage.
+        schema:
+          type: object
+          additionalProperties:
+            type: object
+            additionalProperties:
+              type: object
+              properties:
+                count:
+                  type: integer
+                  description: Number of requests the stage ran in.
+                sum_ms:
+                  type: number
+                  description: Total milliseconds spent in the stage.
+                max_ms:
+                  type: number
+                  description: Slowest run of the stage.
+                p50_ms:
+                  type: number
+                  description: Bucket bound of the median run.
+                p95_ms:
+                  type: number
+                  description: Bucket bound of the 95th percentile.
+                p99_ms:
+                  type: number
+                  description: Bucket bound of the 99th percentile.
+                buckets:
+                  type: object
+                  description: Number of runs per bucket, keyed by the bucket's upper bound in milliseconds.
+    """
+    return get_json_result(data=LATENCY_HISTOGRAMS.snapshot())
+
+
 @manager.route("/new_token", methods=["POST"])  # noqa: F821
 @login_required
 def new_token():
@@ -38,7 +38,7 @@ from rag.nlp import rag_tokenizer, search
 from rag.settings import get_svr_queue_name
 from rag.utils.redis_conn import REDIS_CONN
 from rag.utils.storage_factory import STORAGE_IMPL
-from rag.utils.doc_store_conn import OrderByExpr
+from rag.utils.doc_store_conn import OrderByExpr, DEFAULT_VECTOR_PRECISION
 
 
 class DocumentService(CommonService):
@@ -148,18 +148,10 @@ class DocumentService(CommonService):
     def remove_document(cls, doc, tenant_id):
         cls.clear_chunk_num(doc.id)
         try:
-            page = 0
-            page_size = 1000
             all_chunk_ids = []
-            while True:
-                chunks = settings.docStoreConn.search(["img_id"], [], {"doc_id": doc.id}, [], OrderByExpr(),
-                                                      page * page_size, page_size, search.index_name(tenant_id),
-                                                      [doc.kb_id])
-                chunk_ids = settings.docStoreConn.getChunkIds(chunks)
-                if not chunk_ids:
-                    break
-                all_chunk_ids.extend(chunk_ids)
-                page += 1
+            for chunks in settings.docStoreConn.scan(["img_id"], {"doc_id": doc.id}, search.index_name(tenant_id),
+                                                     [doc.kb_id], batchSize=1000):
+                all_chunk_ids.extend(settings.docStoreConn.getChunkIds(chunks))
             for cid in all_chunk_ids:
                 if STORAGE_IMPL.obj_exist(doc.kb_id, cid):
                     STORAGE_IMPL.rm(doc.kb_id, cid)
@@ -696,9 +688,11 @@ def doc_upload_and_parse(conversation_id, file_objs, user_id):
         for b in range(0, len(cks), es_bulk_size):
             if try_create_idx:
                 if not settings.docStoreConn.indexExist(idxnm, kb_id):
-                    settings.docStoreConn.createIdx(idxnm, kb_id, len(vects[0]))
+                    settings.docStoreConn.createIdx(idxnm, kb_id, len(vects[0]),
+                                                    kb.parser_config.get("vector_precision", DEFAULT_VECTOR_PRECISION))
                 try_create_idx = False
-            settings.docStoreConn.insert(cks[b:b + es_bulk_size], idxnm, kb_id)
+            settings.docStoreConn.insert(cks[b:b + es_bulk_size], idxnm, kb_id,
+                                         kb.parser_config.get("vector_precision", DEFAULT_VECTOR_PRECISION))
 
         DocumentService.increment_chunk_num(
             doc_id, kb.id, token_counts[doc_id], chunk_counts[doc_id], 0)
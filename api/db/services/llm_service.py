@@ -256,6 +256,19 @@ class LLMBundle:
 
         return emd, used_tokens
 
+    def encode_queries_batch(self, queries: list):
+        if self.langfuse:
+            generation = self.trace.generation(name="encode_queries_batch", model=self.llm_name, input={"queries": queries})
+
+        embeddings, used_tokens = self.mdl.encode_queries_batch(queries)
+        if not TenantLLMService.increase_usage(self.tenant_id, self.llm_type, used_tokens):
+            logging.error("LLMBundle.encode_queries_batch can't update token usage for {}/EMBEDDING used_tokens: {}".format(self.tenant_id, used_tokens))
+
+        if self.langfuse:
+            generation.end(usage_details={"total_tokens": used_tokens})
+
+        return embeddings, used_tokens
+
     def similarity(self, query: str, texts: list):
         if self.langfuse:
             generation = self.trace.generation(name="similarity", model=self.llm_name, input={"query": query, "texts": texts})
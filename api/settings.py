@@ -22,6 +22,7 @@ from enum import Enum, IntEnum
 import rag.utils
 import rag.utils.es_conn
 import rag.utils.infinity_conn
+import rag.utils.local_conn
 import rag.utils.opensearch_coon
 from api.constants import RAG_FLOW_SERVICE_NAME
 from api.utils import decrypt_database_config, get_base_config
@@ -165,6 +166,8 @@ def init_settings():
         docStoreConn = rag.utils.infinity_conn.InfinityConnection()
     elif lower_case_doc_engine == "opensearch":
         docStoreConn = rag.utils.opensearch_coon.OSConnection()
+    elif lower_case_doc_engine == "local":
+        docStoreConn = rag.utils.local_conn.LocalConnection()
     else:
         raise Exception(f"Not supported doc engine: {DOC_ENGINE}")
 
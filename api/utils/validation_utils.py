@@ -360,6 +360,12 @@ class GraphragConfig(Base):
     resolution: bool = Field(default=False)
 
 
+class VectorPrecisionEnum(StrEnum):
+    float32 = auto()
+    float16 = auto()
+    int8 = auto()
+
+
 class ParserConfig(Base):
     auto_keywords: int = Field(default=0, ge=0, le=32)
     auto_questions: int = Field(default=0, ge=0, le=10)
@@ -374,6 +380,7 @@ class ParserConfig(Base):
     filename_embd_weight: float | None = Field(default=None, ge=0.0, le=1.0)
     task_page_size: int | None = Field(default=None, ge=1)
     pages: list[list[int]] | None = None
+    vector_precision: VectorPrecisionEnum | None = None
 
 
 class CreateDatasetReq(Base):
@@ -0,0 +1,147 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Recall and latency of cascade reranking for several shortlist sizes, on the datasets of `rag/benchmark.py`.
+
+    python -m bench.cascade_rerank <kb_id> ms_marco_v1.1 <dataset_path> --rerank_id <rerank model> \
+        --max_docs 2000 --top_n 0,8,16,32
+
+The dataset is indexed the way `rag/benchmark.py` does, then every query is retrieved with each `--top_n`,
+0 being the full model rerank of all candidates and -1 no rerank model at all. Window and rerank score caches
+are off so each run pays for its own reranking. `agreement@k` is the share of the full rerank's top k a run
+returns in its own top k.
+"""
+import argparse
+import json
+import time
+from timeit import default_timer as timer
+
+import numpy as np
+from ranx import Qrels, Run, evaluate
+
+from api import settings
+from api.db import LLMType
+from api.db.services.llm_service import LLMBundle
+from rag import benchmark
+from rag.nlp import search
+
+
+class CountingReranker:
+    """
+    Forwards to the rerank model and counts the (query, text) pairs sent to it.
+    """
+
+    def __init__(self, mdl):
+        self.mdl = mdl
+        self.tenant_id = getattr(mdl, "tenant_id", "")
+        self.llm_name = getattr(mdl, "llm_name", "")
+        self.pairs = 0
+
+    def similarity(self, query, texts):
+        self.pairs += len(texts)
+        return self.mdl.similarity(query, texts)
+
+
+def index(bench: benchmark.Benchmark, dataset: str, dataset_path: str, miracl_corpus: str, lang: str):
+    if dataset == "ms_marco_v1.1":
+        bench.tenant_id = "benchmark_ms_marco_v11"
+        bench.index_name = search.index_name(bench.tenant_id)
+        return bench.ms_marco_index(dataset_path, "benchmark_ms_marco_v1.1")
+    if dataset == "trivia_qa":
+        bench.tenant_id = "benchmark_trivia_qa"
+        bench.index_name = search.index_name(bench.tenant_id)
+        return bench.trivia_qa_index(dataset_path, "benchmark_trivia_qa")
+    if dataset == "miracl":
+        bench.tenant_id = "benchmark_miracl_" + lang
+        bench.index_name = search.index_name(bench.tenant_id)
+        return bench.miracl_index(f"{dataset_path}/miracl-v1.0-{lang}", f"{miracl_corpus}/miracl-corpus-v1.0-{lang}",
+                                  "benchmark_miracl_" + lang)
+    raise ValueError(f"Dataset {dataset} not supported!")
+
+
+def retrieve(bench: benchmark.Benchmark, queries: list[str], reranker, top_n: int, page_size: int):
+    run, latencies = {}, []
+    for query in queries:
+        st = timer()
+        ranks = settings.retrievaler.retrieval(query, bench.embd_mdl, bench.tenant_id, [bench.kb.id], 1, page_size,
+                                               0.0, bench.vector_similarity_weight,
+                                               rerank_mdl=reranker if top_n >= 0 else None,
+                                               rerank_top_n=max(top_n, 0))
+        latencies.append((timer() - st) * 1000)
+        run[query] = {c["chunk_id"]: float(c["similarity"]) for c in ranks["chunks"]}
+    return run, latencies
+
+
+def agreement(run: dict, full: dict, k: int) -> float:
+    shares = []
+    for query, scores in full.items():
+        expected = set(sorted(scores, key=scores.get, reverse=True)[:k])
+        got = set(sorted(run.get(query, {}), key=run.get(query, {}).get, reverse=True)[:k])
+        if expected:
+            shares.append(len(expected & got) / len(expected))
+    return float(np.mean(shares)) if shares else 0.
+
+
+def run(kb_id: str, dataset: str, dataset_path: str, rerank_id: str, top_ns: list[int], page_size: int, k: int,
+        miracl_corpus: str = "", lang: str = "en"):
+    search.RETRIEVAL_WINDOW_CACHE_TTL = 0
+    search.RERANK_CACHE_TTL = 0
+    bench = benchmark.Benchmark(kb_id)
+    qrels, _ = index(bench, dataset, dataset_path, miracl_corpus, lang)
+    # Need to wait for the ES and Infinity index to be ready
+    time.sleep(20)
+    reranker = CountingReranker(LLMBundle(bench.kb.tenant_id, LLMType.RERANK, llm_name=rerank_id))
+    queries = list(qrels.keys())
+
+    runs, report = {}, []
+    for top_n in sorted(set(top_ns), key=lambda n: (n != 0, n)):
+        reranker.pairs = 0
+        runs[top_n], latencies = retrieve(bench, queries, reranker, top_n, page_size)
+        report.append({"top_n": top_n, "queries": len(queries),
+                       "latency_ms_mean": round(float(np.mean(latencies)), 1),
+                       "latency_ms_p95": round(float(np.percentile(latencies, 95)), 1),
+                       "rerank_pairs_per_query": round(reranker.pairs / max(len(queries), 1), 1)})
+
+    # Queries without any chunk can't be evaluated, `rag/benchmark.py` drops them too.
+    answered = [q for q in queries if all(r[q] for r in runs.values())]
+    qrels = Qrels({q: qrels[q] for q in answered})
+    for row in report:
+        r = {q: runs[row["top_n"]][q] for q in answered}
+        row.update({m: round(float(v), 4) for m, v in
+                    evaluate(qrels, Run(r), [f"recall@{k}", f"ndcg@{k}", f"mrr@{k}"]).items()})
+        if 0 in runs:
+            row[f"agreement@{k}"] = round(agreement(r, {q: runs[0][q] for q in answered}, k), 4)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("kb_id", help="knowledgebase id, its embedding model encodes the dataset")
+    parser.add_argument("dataset", choices=["ms_marco_v1.1", "trivia_qa", "miracl"])
+    parser.add_argument("dataset_path")
+    parser.add_argument("--rerank_id", required=True, help="rerank model name, as in the knowledgebase settings")
+    parser.add_argument("--max_docs", type=int, default=2000)
+    parser.add_argument("--top_n", default="-1,0,8,16,32",
+                        help="comma separated shortlist sizes, 0 reranks all candidates, -1 uses no rerank model")
+    parser.add_argument("--page_size", type=int, default=10)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--miracl_corpus", default="", help="miracl corpus path, only needed for miracl")
+    parser.add_argument("--lang", default="en", help="miracl language")
+    args = parser.parse_args()
+    benchmark.max_docs = args.max_docs
+    for row in run(args.kb_id, args.dataset, args.dataset_path, args.rerank_id,
+                   [int(n) for n in args.top_n.split(",")], args.page_size, args.k, args.miracl_corpus, args.lang):
+        print(json.dumps(row))
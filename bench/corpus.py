@@ -0,0 +1,65 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Texts of the benchmarks: the corpora bundled in bench/corpora, a passage per line, or a file given instead.
+"""
+import os
+import re
+
+import numpy as np
+
+CORPORA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpora")
+LANGS = ["zh", "en", "mixed", "tables"]
+
+
+def lines(name: str) -> list[str]:
+    """
+    Passages of the bundled corpus `name`, such as "zh.txt" or "queries.txt".
+    """
+    with open(os.path.join(CORPORA, name), encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def passages(corpus: str = "") -> list[str]:
+    """
+    Passages of the file `corpus`, of every bundled corpus but the queries if it is empty.
+    """
+    if not corpus:
+        return [p for lang in LANGS for p in lines(f"{lang}.txt")]
+    with open(corpus, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def sentences(texts: list[str]) -> list[str]:
+    res = []
+    for p in texts:
+        res.extend(s for s in re.split(r"(?<=[。！？；!?;\n])", p) if s.strip())
+    return res
+
+
+def documents(pool: list[str], n_docs: int, n_chunks: int, n_sentences: int, zipf: float, seed: int = 0):
+    """
+    Documents of a title and `n_chunks` chunks of `n_sentences` sentences of `pool` drawn with a Zipf
+    distribution, as headers, footers and boilerplate recur across chunks and documents.
+    """
+    rng = np.random.default_rng(seed)
+    p = np.arange(1, len(pool) + 1, dtype=np.float64) ** -zipf
+    p /= p.sum()
+    docs = []
+    for i in range(n_docs):
+        chunks = ["".join(pool[j] for j in rng.choice(len(pool), size=n_sentences, p=p)) for _ in range(n_chunks)]
+        docs.append([pool[int(rng.integers(len(pool)))][:30]] + chunks)
+    return docs
@@ -0,0 +1,47 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Writes the most frequent English words of a corpus with their lemmatized stems, for TOKENIZER_ENGLISH_WORDS.
+
+    python -m bench.english_words --corpus english.txt --output rag/res/english_words.txt
+
+Every line of `--corpus` is a passage, the bundled English corpus by default. Words are written by decreasing
+frequency, `--top` of them, the size of the cache RagTokenizer fills with them.
+"""
+import argparse
+import re
+from collections import Counter
+
+from bench.corpus import lines, passages
+from rag.nlp import rag_tokenizer
+
+
+def write_words(corpus: str, path: str, top: int):
+    texts = passages(corpus) if corpus else lines("en.txt")
+    counts = Counter(w for txt in texts for w in re.findall(r"[a-zA-Z_-]+", txt.lower()))
+    tknzr = rag_tokenizer.RagTokenizer()
+    with open(path, "w", encoding="utf-8") as f:
+        for w, _ in counts.most_common(top):
+            f.write(f"{w} {tknzr.stem_(w)}\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default="", help="text file with a passage per line")
+    parser.add_argument("--output", default="rag/res/english_words.txt")
+    parser.add_argument("--top", type=int, default=65536, help="words to write, TOKENIZER_ENGLISH_CACHE_SIZE")
+    args = parser.parse_args()
+    write_words(args.corpus, args.output, args.top)
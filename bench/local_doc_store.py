@@ -0,0 +1,93 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Indexing and search latency of the embedded doc engine, no external service needed.
+
+    python -m bench.local_doc_store --chunks 20000 --dim 1024 --queries 50
+
+Synthetic chunks are indexed into a temporary directory, then the same queries run as full-text,
+k-NN and the hybrid query `Dealer.search` issues.
+"""
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+
+from rag import settings
+from rag.nlp import query
+from rag.utils.doc_store_conn import MatchDenseExpr, FusionExpr, OrderByExpr
+
+WORDS = ["knowledge", "document", "parser", "retrieval", "vector", "model", "question", "answer", "user",
+         "system", "data", "config", "service", "index", "chunk", "permission", "expense", "workflow",
+         "leave", "contract", "customer", "product", "price", "release", "refund", "policy", "invoice",
+         "report", "table", "figure", "layout", "embedding", "rerank", "tenant", "dataset", "agent"]
+
+
+def synthetic(n_chunks: int, dim: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    docs = []
+    for i in range(n_chunks):
+        words = list(rng.choice(WORDS, 60))
+        docs.append({"id": f"chunk_{i}", "doc_id": f"doc_{i % 100}", "docnm_kwd": f"doc_{i % 100}.pdf",
+                     "content_with_weight": " ".join(words), "content_ltks": " ".join(words),
+                     "content_sm_ltks": " ".join(words), "title_tks": f"doc_{i % 100}",
+                     "important_kwd": list(rng.choice(WORDS, 2)), "available_int": 1,
+                     "q_%d_vec" % dim: rng.normal(size=dim).tolist()})
+    return docs
+
+
+def run(n_chunks: int, dim: int, n_queries: int, batch: int):
+    settings.LOCAL = {"path": tempfile.mkdtemp(prefix="ragflow_local_doc_store_")}
+    from rag.utils.local_conn import LocalConnection
+    conn = LocalConnection()
+    idx, kb = "ragflow_bench", "kb_bench"
+    conn.createIdx(idx, kb, dim)
+    docs = synthetic(n_chunks, dim)
+    st = time.perf_counter()
+    for i in range(0, len(docs), batch):
+        conn.insert(docs[i:i + batch], idx, kb)
+    report = [{"stage": "insert", "chunks": n_chunks, "chunks_per_s": round(n_chunks / (time.perf_counter() - st), 1)}]
+
+    rng = np.random.default_rng(1)
+    qryr = query.FulltextQueryer()
+    questions = [" ".join(rng.choice(WORDS, 4)) for _ in range(n_queries)]
+    vectors = rng.normal(size=(n_queries, dim)).tolist()
+    fields = ["content_with_weight", "docnm_kwd", "doc_id"]
+    for mode in ["fulltext", "knn", "hybrid"]:
+        st = time.perf_counter()
+        for qst, qv in zip(questions, vectors):
+            matchText, _ = qryr.question(qst, min_match=0.3)
+            matchDense = MatchDenseExpr(f"q_{dim}_vec", qv, "float", "cosine", 1024, {"similarity": 0.1})
+            matchExprs = {"fulltext": [matchText], "knn": [matchDense],
+                          "hybrid": [matchText, matchDense, FusionExpr("weighted_sum", 1024, {"weights": "0.05, 0.95"})]}[mode]
+            conn.search(fields, [], {}, matchExprs, OrderByExpr(), 0, 30, idx, [kb])
+        report.append({"stage": mode, "queries": n_queries,
+                       "latency_ms": round((time.perf_counter() - st) * 1000 / n_queries, 2)})
+    conn.deleteIdx(idx, "")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--batch", type=int, default=16, help="chunks per insert, as the task executor bulks them")
+    args = parser.parse_args()
+    for row in run(args.chunks, args.dim, args.queries, args.batch):
+        print(json.dumps(row))
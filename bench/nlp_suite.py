@@ -0,0 +1,252 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Offline microbenchmarks of the NLP code on the query and ingestion paths, checked against golden outputs.
+
+    python -m bench.nlp_suite --repeat 5 --output nlp_suite.json
+    python -m bench.nlp_suite --update_golden
+
+Cases run on the corpora bundled in bench/corpora, a passage per line: Chinese, English, mixed and HTML tables,
+and on its questions. Per corpus:
+- `normalize`, `tokenize` and `fine_grained_tokenize` of every passage;
+- `tokenize_many` of documents made of the corpus sentences drawn with a Zipf distribution, as in ingestion;
+- `term_weight`, one `weights` call per passage, and `term_weight_many`, one call for all of them;
+- `count_tokens`, `token_count.count_many` of the passages;
+- `naive_merge` and `tokenize_chunks`.
+Per question:
+- `question`, the analysis of each question once, and `question_replay`, a Zipf stream of them;
+- `synonym`, the lookup of every token of the questions;
+- `citations`, `Dealer.citation_candidates` of answers made of passages, vectors being seeded random ones;
+- `rerank`, `Dealer.rerank` of synthetic hits made of every passage.
+The caches of the tokenizer, the term weights, the synonyms, the question analysis and the token counts are
+emptied before every repetition, so each one does the work.
+
+Every case's output is hashed, floats rounded to 6 decimals, and compared with the golden ones of --golden,
+bench/golden/nlp_suite.json by default: `golden` is "match", "mismatch" or "missing", and the exit status is 1
+on a mismatch. Synonyms are sorted, older trees returning them in no set order. Results are printed as JSON
+lines, and written to --output as one JSON document for tracking.
+
+Outputs depend on the tokenizer dictionary and NLP resources in rag/res, so golden ones are written by
+--update_golden with the resources of the docker image rather than committed. The suite can write them for an
+older tree, bench/ copied into it: cases the tree lacks the functions of are "unsupported" and left out. For a
+pull request, CI writes them from its base branch this way, checks the pull request against them and attaches
+both to the run as the nlp-suite-golden artifact. A pull request changing outputs on purpose is given the
+`nlp-output-change` label, mismatches are then reported as warnings instead of failing the run.
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+from bench.corpus import LANGS, documents, lines, sentences
+from rag.nlp import naive_merge, rag_tokenizer, query, tokenize_chunks
+from rag.nlp.search import Dealer
+
+try:
+    from rag.utils import token_count
+except ImportError:  # Trees older than the token count cache, whose count_tokens case is unsupported.
+    token_count = None
+
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden", "nlp_suite.json")
+DIM = 64
+REPLAY = 20
+
+
+def plain(obj):
+    if isinstance(obj, float | np.floating):
+        return round(float(obj), 6)
+    if isinstance(obj, np.ndarray):
+        return plain(obj.tolist())
+    if isinstance(obj, dict):
+        return {str(k): plain(v) for k, v in obj.items()}
+    if isinstance(obj, list | tuple | set):
+        return [plain(v) for v in (sorted(obj) if isinstance(obj, set) else obj)]
+    return obj
+
+
+def digest(obj) -> str:
+    return hashlib.sha256(json.dumps(plain(obj), ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def reset(qryr: query.FulltextQueryer):
+    """
+    Empties the caches, those an older tree doesn't have aside.
+    """
+    if hasattr(rag_tokenizer.tokenizer, "clear_cache"):
+        rag_tokenizer.tokenizer.clear_cache()
+    qryr.tw.token_ids = {}
+    for cache in [getattr(rag_tokenizer.tokenizer, "english_cache", None), getattr(qryr.syn, "cache", None),
+                  getattr(qryr, "question_cache", None), getattr(token_count, "_cache", None)]:
+        if cache is not None:
+            cache.clear()
+
+
+def hits(passages: list[str], chunks: list[dict]) -> Dealer.SearchResult:
+    rng = np.random.default_rng(0)
+    field = {}
+    for i, (p, d) in enumerate(zip(passages, chunks)):
+        field[f"c{i}"] = {"content_ltks": d["content_ltks"], "content_with_weight": p,
+                          "title_tks": rag_tokenizer.tokenize(p[:12]), "important_kwd": [],
+                          "question_tks": "", f"q_{DIM}_vec": rng.standard_normal(DIM).tolist()}
+    return Dealer.SearchResult(total=len(field), ids=list(field.keys()), field=field)
+
+
+def answers(passages: list[str], n: int, seed: int = 2):
+    """
+    Answers of `n` sentences each taken from a passage, their vectors the passage's plus noise.
+    """
+    rng = np.random.default_rng(seed)
+    chunk_v = rng.standard_normal((len(passages), DIM))
+    chunk_v /= np.linalg.norm(chunk_v, axis=1, keepdims=True)
+    pieces, ans_v = [], []
+    for _ in range(n):
+        c = int(rng.integers(len(passages)))
+        pieces.append(passages[c][:60])
+        v = chunk_v[c] + 0.05 * rng.standard_normal(DIM)
+        ans_v.append(v / np.linalg.norm(v))
+    return pieces, np.array(ans_v), chunk_v
+
+
+def cases(qryr: query.FulltextQueryer):
+    """
+    (case, corpus, items, function returning the output) of every benchmark.
+    """
+    dealer = Dealer.__new__(Dealer)
+    dealer.qryr = qryr
+    # Older trees return WordNet synonyms in set order, which changes with the hash seed of the process.
+    lookup = qryr.syn.lookup
+    qryr.syn.lookup = lambda tk, topn=8: sorted(lookup(tk, topn))
+    res, all_passages, all_chunks = [], [], []
+    for lang in LANGS:
+        passages = lines(f"{lang}.txt")
+        eng = lang == "en"
+        tks = [rag_tokenizer.tokenize(p) for p in passages]
+        docs = documents(sentences(passages), 8, 16, 3, 1.1)
+        chunks = naive_merge(passages, 128, "\n。；！？")
+        all_passages.extend(passages)
+        all_chunks.extend(tokenize_chunks(passages, {"docnm_kwd": f"{lang}.txt"}, eng))
+        res.extend([
+            ("normalize", lang, len(passages), lambda ps=passages: [rag_tokenizer.normalize(p) for p in ps]),
+            ("tokenize", lang, len(passages), lambda ps=passages: [rag_tokenizer.tokenize(p) for p in ps]),
+            ("fine_grained_tokenize", lang, len(tks),
+             lambda tks=tks: [rag_tokenizer.fine_grained_tokenize(t) for t in tks]),
+            ("tokenize_many", lang, sum(len(d) for d in docs),
+             lambda docs=docs: [rag_tokenizer.tokenize_many(d) for d in docs]),
+            ("term_weight", lang, len(tks), lambda tks=tks: [qryr.tw.weights(t.split(), preprocess=False) for t in tks]),
+            ("term_weight_many", lang, len(tks),
+             lambda tks=tks: qryr.tw.weights_many([t.split() for t in tks], preprocess=False)),
+            ("count_tokens", lang, len(passages), lambda ps=passages: token_count.count_many(ps)),
+            ("naive_merge", lang, len(passages), lambda ps=passages: naive_merge(ps, 128, "\n。；！？")),
+            ("tokenize_chunks", lang, len(chunks),
+             lambda cks=chunks, doc={"docnm_kwd": f"{lang}.txt"}, eng=eng:
+             [(d["content_ltks"], d["content_sm_ltks"]) for d in tokenize_chunks(cks, doc, eng)]),
+        ])
+
+    questions = lines("queries.txt")
+    rng = np.random.default_rng(3)
+    p = np.arange(1, len(questions) + 1, dtype=np.float64) ** -1.2
+    stream = [questions[i] for i in rng.choice(len(questions), size=len(questions) * REPLAY, p=p / p.sum())]
+    words = [w for q in questions for w in rag_tokenizer.tokenize(q).split()]
+
+    def question(qs):
+        out = []
+        for q in qs:
+            expr, keywords = qryr.question(q)
+            out.append((expr.matching_text if expr else None, keywords))
+        return out
+
+    sres = hits(all_passages, all_chunks)
+    rng = np.random.default_rng(1)
+    qvecs = [rng.standard_normal(DIM).tolist() for _ in questions]
+    pieces, ans_v, chunk_v = answers(all_passages, len(questions) * 4)
+    chunks_tks = [d["content_ltks"].split() for d in all_chunks]
+
+    def rerank():
+        out = []
+        for q, v in zip(questions, qvecs):
+            sres.query_vector = v
+            sim, tksim, vtsim = dealer.rerank(sres, q)
+            out.append((sim, tksim, vtsim))
+        return out
+
+    res.extend([("question", "queries", len(questions), lambda: question(questions)),
+                ("question_replay", "queries", len(stream), lambda: question(stream)),
+                ("synonym", "queries", len(words), lambda: [qryr.syn.lookup(w) for w in words]),
+                ("citations", "queries", len(pieces),
+                 lambda: {i: sorted(c) for i, c in
+                          dealer.citation_candidates(pieces, ans_v, chunks_tks, chunk_v).items()}),
+                ("rerank", "queries", len(questions) * len(sres.ids), rerank)])
+    return res
+
+
+def run(repeat: int, update_golden: bool, golden_path: str = GOLDEN):
+    qryr = query.FulltextQueryer()
+    golden = {}
+    if os.path.exists(golden_path):
+        with open(golden_path, encoding="utf-8") as f:
+            golden = json.load(f)
+    report, digests = [], {}
+    for case, corpus, items, fn in cases(qryr):
+        name = f"{case}/{corpus}"
+        timings = []
+        try:
+            for _ in range(repeat):
+                reset(qryr)
+                st = time.perf_counter()
+                out = fn()
+                timings.append(time.perf_counter() - st)
+        except AttributeError:
+            # The golden outputs of a tree are written by the suite of a newer one, skipping what it lacks.
+            if not update_golden:
+                raise
+            report.append({"case": case, "corpus": corpus, "items": items, "golden": "unsupported"})
+            continue
+        digests[name] = digest(out)
+        best = min(timings)
+        report.append({"case": case, "corpus": corpus, "items": items,
+                       "ms_best": round(best * 1e3, 3), "ms_mean": round(float(np.mean(timings)) * 1e3, 3),
+                       "items_per_s": round(items / best, 1),
+                       "golden": "missing" if name not in golden else
+                       ("match" if golden[name] == digests[name] else "mismatch")})
+    if update_golden:
+        os.makedirs(os.path.dirname(os.path.abspath(golden_path)), exist_ok=True)
+        with open(golden_path, "w", encoding="utf-8") as f:
+            json.dump(digests, f, indent=2, sort_keys=True)
+            f.write("\n")
+    return report, digests
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="", help="JSON file to write the results to")
+    parser.add_argument("--golden", default=GOLDEN, help="JSON file of the golden outputs")
+    parser.add_argument("--update_golden", action="store_true", help="write the outputs as the golden ones")
+    args = parser.parse_args()
+    report, digests = run(args.repeat, args.update_golden, args.golden)
+    for row in report:
+        print(json.dumps(row, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"python": platform.python_version(), "repeat": args.repeat, "results": report}, f, indent=2)
+    if args.update_golden and not digests:
+        sys.exit("No case is supported by this tree")
+    sys.exit(1 if any(row["golden"] == "mismatch" for row in report) else 0)
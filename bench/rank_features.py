@@ -0,0 +1,94 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Tag/rank feature scoring latency of `Dealer._rank_feature_scores` on synthetic candidates.
+
+    python -m bench.rank_features --candidates 1024 --tags 8 --vocab 200
+
+The per-row `eval` of stringified tag dicts used before connectors returned native dicts is timed
+on the same candidates, and `max_abs_diff` is the largest score difference between both.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from rag.nlp.search import Dealer
+from rag.settings import TAG_FLD, PAGERANK_FLD
+
+
+def synthetic(n_candidates: int, n_tags: int, vocab: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    tags = [f"tag_{i}" for i in range(vocab)]
+    field = {}
+    for i in range(n_candidates):
+        picked = rng.choice(vocab, size=int(rng.integers(0, n_tags + 1)), replace=False)
+        field[f"chunk_{i}"] = {TAG_FLD: {tags[t]: int(rng.integers(1, 10)) for t in picked},
+                               PAGERANK_FLD: int(rng.integers(0, 3))}
+    query_rfea = {tags[t]: float(rng.integers(1, 10)) for t in rng.choice(vocab, size=n_tags, replace=False)}
+    query_rfea[PAGERANK_FLD] = 10
+    return Dealer.SearchResult(total=n_candidates, ids=list(field.keys()), field=field), query_rfea
+
+
+def legacy_scores(query_rfea, search_res):
+    rank_fea = []
+    pageranks = np.array([search_res.field[i].get(PAGERANK_FLD, 0) for i in search_res.ids], dtype=float)
+    q_denor = np.sqrt(np.sum([s*s for t, s in query_rfea.items() if t != PAGERANK_FLD]))
+    for i in search_res.ids:
+        nor, denor = 0, 0
+        if not search_res.field[i].get(TAG_FLD):
+            rank_fea.append(0)
+            continue
+        for t, sc in eval(search_res.field[i].get(TAG_FLD, "{}")).items():
+            if t in query_rfea:
+                nor += query_rfea[t] * sc
+            denor += sc * sc
+        rank_fea.append(0 if denor == 0 else nor/np.sqrt(denor)/q_denor)
+    return np.array(rank_fea)*10. + pageranks
+
+
+def run(n_candidates: int, n_tags: int, vocab: int, repeat: int):
+    # Scoring never touches the doc store, so skip connecting to one.
+    dealer = Dealer.__new__(Dealer)
+    sres, query_rfea = synthetic(n_candidates, n_tags, vocab)
+    # What ESConnection.getFields used to hand over: the repr string of every tag dict.
+    stringified = Dealer.SearchResult(total=sres.total, ids=sres.ids,
+                                      field={k: {fld: str(v) for fld, v in d.items()} for k, d in sres.field.items()})
+
+    report, scores = [], []
+    for engine, fn in [("legacy_eval", lambda: legacy_scores(query_rfea, stringified)),
+                       ("vectorized", lambda: dealer._rank_feature_scores(query_rfea, sres))]:
+        st = time.perf_counter()
+        for _ in range(repeat):
+            sc = fn()
+        elapsed = (time.perf_counter() - st) / repeat
+        scores.append(sc)
+        report.append({"engine": engine, "candidates": n_candidates,
+                       "latency_us": round(elapsed * 1e6, 1)})
+    report[-1]["max_abs_diff"] = float(np.max(np.abs(scores[0] - scores[1]))) if n_candidates else 0.
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--candidates", type=int, default=1024)
+    parser.add_argument("--tags", type=int, default=8)
+    parser.add_argument("--vocab", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    for row in run(args.candidates, args.tags, args.vocab, args.repeat):
+        print(json.dumps(row))
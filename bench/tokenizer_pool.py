@@ -0,0 +1,86 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Chunk tokenization throughput and memory of the tokenizer pool for several numbers of workers.
+
+    python -m bench.tokenizer_pool --corpus passages.txt --workers 0,1,2,4,8 --threads 4
+
+Chunks are built with `bench.corpus.documents` from the sentences of `--corpus`, the bundled corpora by default,
+uniformly drawn by default so that the caches don't do most of the work. `--threads` callers tokenize documents concurrently, as the chunk builders
+of a task executor do. 0 workers tokenizes in the callers. `workers_pss_mb` is the proportional set size of
+the workers on Linux, where the dictionary pages they share are split between them.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.corpus import documents, passages, sentences
+from rag.nlp.tokenizer_pool import TokenizerPool
+
+
+def pss_mb(pid: int) -> float | None:
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def run(corpus: str, workers: list[int], threads: int, n_docs: int, n_chunks: int, n_sentences: int, zipf: float,
+        batch_chars: int):
+    docs = documents(sentences(passages(corpus)), n_docs, n_chunks, n_sentences, zipf)
+    n_texts = sum(len(d) for d in docs)
+    report = []
+    for n in workers:
+        pool = TokenizerPool(n, 0, batch_chars)
+        if n:
+            # Start the workers before timing.
+            pool.tokenize_many(["预热"] * n)
+        st = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as callers:
+            list(callers.map(pool.tokenize_many, docs))
+        elapsed = time.perf_counter() - st
+        row = {"workers": n, "threads": threads, "texts": n_texts, "texts_per_s": round(n_texts / elapsed, 1)}
+        if pool.executor is not None:
+            pss = [pss_mb(p) for p in pool.executor._processes]
+            if all(m is not None for m in pss):
+                row["workers_pss_mb"] = round(sum(pss), 1)
+            pool.executor.shutdown()
+        report.append(row)
+    for row in report:
+        row["speedup"] = round(row["texts_per_s"] / report[0]["texts_per_s"], 2)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default="", help="text file with a passage per line")
+    parser.add_argument("--workers", default=f"0,1,2,{os.cpu_count()}", help="comma separated pool sizes")
+    parser.add_argument("--threads", type=int, default=4, help="concurrent callers")
+    parser.add_argument("--docs", type=int, default=40)
+    parser.add_argument("--chunks", type=int, default=40, help="chunks per document")
+    parser.add_argument("--sentences", type=int, default=4, help="sentences per chunk")
+    parser.add_argument("--zipf", type=float, default=0.)
+    parser.add_argument("--batch_chars", type=int, default=32768, help="TOKENIZER_POOL_BATCH_CHARS")
+    args = parser.parse_args()
+    for row in run(args.corpus, [int(n) for n in args.workers.split(",")], args.threads, args.docs, args.chunks,
+                   args.sentences, args.zipf, args.batch_chars):
+        print(json.dumps(row))
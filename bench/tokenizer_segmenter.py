@@ -0,0 +1,94 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Tokenization latency and output agreement of the TOKENIZER_SEGMENTER choices of RagTokenizer.
+
+    python -m bench.tokenizer_segmenter --corpus passages.txt --join 1,4,16
+
+Every line of `--corpus` is a passage, the sample sentences of `rag/nlp/rag_tokenizer.py` by default.
+With `--join n`, n passages are concatenated without their punctuation, the long unpunctuated text that
+makes the enumeration of `dfs` blow up. Each segmenter tokenizes then fine-grained tokenizes every passage,
+`agreement` is the share of passages whose both outputs are the same as those of the first segmenter.
+"""
+import argparse
+import json
+import re
+from timeit import default_timer as timer
+
+import numpy as np
+
+from rag.nlp.rag_tokenizer import RagTokenizer
+
+SAMPLES = [
+    "公开征求意见稿提出，境外投资者可使用自有人民币或外汇投资。使用外汇投资的，可通过债券持有人在香港人民币业务清算行及香港地区经批准可进入境内银行间外汇市场进行交易的境外人民币业务参加行（以下统称香港结算行）办理外汇资金兑换。香港结算行由此所产生的头寸可到境内银行间外汇市场平盘。使用外汇投资的，在其投资的债券到期或卖出后，原则上应兑换回外汇。",
+    "多校划片就是一个小区对应多个小学初中，让买了学区房的家庭也不确定到底能上哪个学校。目的是通过这种方式为学区房降温，把就近入学落到实处。南京市长江大桥",
+    "实际上当时他们已经将业务中心偏移到安全部门和针对政府企业的部门 Scripts are compiled and cached aaaaaaaaa",
+    "虽然我不怎么玩",
+    "蓝月亮如何在外资夹击中生存,那是全宇宙最有意思的",
+    "涡轮增压发动机num最大功率,不像别的共享买车锁电子化的手段,我们接过来是否有意义,黄黄爱美食,不过，今天阿奇要讲到的这家农贸市场，说实话，还真蛮有特色的！不仅环境好，还打出了",
+    "这周日你去吗？这周日你有空吗？",
+    "Unity3D开发经验 测试开发工程师 c++双11双11 985 211 ",
+    "数据分析项目经理|数据分析挖掘|数据分析方向|商品数据分析|搜索数据分析 sql python hive tableau Cocos2d-",
+]
+
+
+def passages(corpus: str, join: int) -> list[str]:
+    if corpus:
+        with open(corpus, encoding="utf-8") as f:
+            lines = [line.strip() for line in f if line.strip()]
+    else:
+        lines = SAMPLES
+    if join <= 1:
+        return lines
+    lines = [re.sub(r"[^一-龥a-zA-Z0-9]+", "", line) for line in lines]
+    return ["".join(lines[i:i + join]) for i in range(0, len(lines), join)]
+
+
+def run(corpus: str, joins: list[int], segmenters: list[str], user_dict: str):
+    report = []
+    tokenizers = {}
+    for segmenter in segmenters:
+        tokenizers[segmenter] = RagTokenizer(segmenter=segmenter)
+        if user_dict:
+            tokenizers[segmenter].loadUserDict(user_dict)
+    for join in joins:
+        texts = passages(corpus, join)
+        outputs = {}
+        for segmenter, tknzr in tokenizers.items():
+            latencies, outputs[segmenter] = [], []
+            for txt in texts:
+                st = timer()
+                tks = tknzr.tokenize(txt)
+                outputs[segmenter].append((tks, tknzr.fine_grained_tokenize(tks)))
+                latencies.append((timer() - st) * 1000)
+            first = outputs[segmenters[0]]
+            report.append({"segmenter": segmenter, "join": join, "passages": len(texts),
+                           "chars_mean": round(float(np.mean([len(t) for t in texts])), 1),
+                           "latency_ms_mean": round(float(np.mean(latencies)), 2),
+                           "latency_ms_max": round(float(np.max(latencies)), 2),
+                           "agreement": round(float(np.mean([a == b for a, b in zip(outputs[segmenter], first)])), 4)})
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default="", help="text file with a passage per line")
+    parser.add_argument("--join", default="1,4", help="comma separated numbers of passages to concatenate")
+    parser.add_argument("--segmenters", default="dfs,dp", help="comma separated, the first one is the reference")
+    parser.add_argument("--user_dict", default="", help="dictionary to load in place of the default one")
+    args = parser.parse_args()
+    for row in run(args.corpus, [int(n) for n in args.join.split(",")], args.segmenters.split(","), args.user_dict):
+        print(json.dumps(row, ensure_ascii=False))
@@ -0,0 +1,102 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Startup time and memory of processes using the tokenizer, with the datrie dictionary versus the compiled one.
+
+    python -m bench.tokenizer_startup --processes 4
+
+Each mode starts `--processes` processes at once, which import the tokenizer and tokenize a sentence. Times
+are per process. `rss_mb` counts the dictionary pages a process maps, `anon_mb` only its own heap, and
+`pss_mb` splits the pages shared by the processes between them, summed over the processes. `--dict` is the
+dictionary path without its ".txt" extension, rag/res/huqie by default. The compiled dictionary is built
+before timing.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+def status_mb(pid: int | str, path: str, fields: list[str]) -> dict[str, float]:
+    res = {}
+    try:
+        with open(f"/proc/{pid}/{path}") as f:
+            for line in f:
+                name = line.split(":")[0]
+                if name in fields:
+                    res[name] = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return res
+
+
+def child(dict_path: str):
+    st = time.perf_counter()
+    from rag.nlp import rag_tokenizer
+    imported = time.perf_counter()
+    from bench.tokenizer_segmenter import SAMPLES
+    if dict_path:
+        rag_tokenizer.tokenizer.DIR_ = dict_path
+    rag_tokenizer.tokenize(SAMPLES[0])
+    tokenized = time.perf_counter()
+    mem = status_mb("self", "status", ["VmRSS", "RssAnon"])
+    print(json.dumps({"import_s": imported - st, "first_tokenize_s": tokenized - imported,
+                      "rss_mb": mem.get("VmRSS"), "anon_mb": mem.get("RssAnon")}), flush=True)
+    # Stay alive until the parent has measured the set size shared with the other processes.
+    sys.stdin.read()
+
+
+def start(mmap: bool, processes: int, dict_path: str) -> list[subprocess.Popen]:
+    env = {**os.environ, "TOKENIZER_DICT_MMAP": str(mmap).lower()}
+    cmd = [sys.executable, "-m", "bench.tokenizer_startup", "--child", "--dict", dict_path]
+    return [subprocess.Popen(cmd, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+            for _ in range(processes)]
+
+
+def run(processes: int, dict_path: str):
+    for p in start(True, 1, dict_path):
+        p.communicate("")
+    report = []
+    for mmap in (False, True):
+        procs = start(mmap, processes, dict_path)
+        rows = [json.loads(p.stdout.readline()) for p in procs]
+        pss = [status_mb(p.pid, "smaps_rollup", ["Pss"]).get("Pss") for p in procs]
+        for p in procs:
+            p.communicate("")
+        row = {"mode": "mmap" if mmap else "datrie", "processes": processes}
+        for k in rows[0]:
+            values = [r[k] for r in rows if r[k] is not None]
+            if values:
+                row[k] = round(sum(values) / len(values), 3)
+        if all(m is not None for m in pss):
+            row["pss_mb"] = round(sum(pss), 1)
+        report.append(row)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--dict", default="", help="dictionary path without .txt, rag/res/huqie by default")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.dict)
+    else:
+        for row in run(args.processes, args.dict):
+            print(json.dumps(row))
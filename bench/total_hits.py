@@ -0,0 +1,106 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Search latency with exact versus bounded total hit counting, on a synthetic index of a doc engine.
+
+    python -m bench.total_hits --engine elasticsearch --chunks 200000 --dim 1024 --queries 50
+
+Synthetic chunks share a small vocabulary so that every query matches most of them, the case where exact counting
+keeps the engine from terminating early. The full-text and hybrid queries of `Dealer.search` run once with an
+exact total and once counting up to the retrieval window (`--window`, the RERANK_LIMIT of `Dealer.retrieval`).
+The index is deleted afterwards.
+"""
+import argparse
+import json
+import time
+from timeit import default_timer as timer
+
+import numpy as np
+
+from bench.local_doc_store import WORDS, synthetic
+from rag.nlp import query
+from rag.utils.doc_store_conn import MatchDenseExpr, FusionExpr, OrderByExpr
+
+
+def connect(engine: str):
+    if engine == "elasticsearch":
+        from rag.utils.es_conn import ESConnection
+        return ESConnection()
+    if engine == "opensearch":
+        from rag.utils.opensearch_coon import OSConnection
+        return OSConnection()
+    if engine == "infinity":
+        from rag.utils.infinity_conn import InfinityConnection
+        return InfinityConnection()
+    from rag.utils.local_conn import LocalConnection
+    return LocalConnection()
+
+
+def run(engine: str, n_chunks: int, dim: int, n_queries: int, window: int, batch: int, wait: int):
+    conn = connect(engine)
+    idx, kb = "ragflow_bench_total_hits", "kb_bench_total_hits"
+    conn.createIdx(idx, kb, dim)
+    try:
+        for i in range(0, n_chunks, batch):
+            docs = synthetic(min(batch, n_chunks - i), dim, seed=i)
+            for j, d in enumerate(docs):
+                d["id"] = f"chunk_{i + j}"
+            conn.insert(docs, idx, kb)
+        # Wait for the index to be refreshed, as rag/benchmark.py does.
+        time.sleep(wait)
+
+        rng = np.random.default_rng(1)
+        qryr = query.FulltextQueryer()
+        questions = [" ".join(rng.choice(WORDS, 4)) for _ in range(n_queries)]
+        vectors = rng.normal(size=(n_queries, dim)).tolist()
+        fields = ["content_with_weight", "docnm_kwd", "doc_id"]
+        report = []
+        for mode in ["fulltext", "hybrid"]:
+            for trackTotalHits in [True, window]:
+                latencies, totals = [], []
+                for qst, qv in zip(questions, vectors):
+                    matchText, _ = qryr.question(qst, min_match=0.3)
+                    matchExprs = [matchText]
+                    if mode == "hybrid":
+                        matchExprs += [MatchDenseExpr(f"q_{dim}_vec", qv, "float", "cosine", 1024, {"similarity": 0.1}),
+                                       FusionExpr("weighted_sum", 1024, {"weights": "0.05, 0.95"})]
+                    st = timer()
+                    res = conn.search(fields, [], {"available_int": 1}, matchExprs, OrderByExpr(), 0, window, idx, [kb],
+                                      trackTotalHits=trackTotalHits)
+                    latencies.append((timer() - st) * 1000)
+                    totals.append(conn.getTotal(res))
+                report.append({"mode": mode, "track_total_hits": trackTotalHits, "queries": n_queries,
+                               "latency_ms_mean": round(float(np.mean(latencies)), 2),
+                               "latency_ms_p95": round(float(np.percentile(latencies, 95)), 2),
+                               "total_mean": round(float(np.mean(totals)), 1)})
+        return report
+    finally:
+        # Infinity has a table per knowledge base, the others an index per tenant.
+        conn.deleteIdx(idx, kb if engine == "infinity" else "")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--engine", choices=["elasticsearch", "opensearch", "infinity", "local"], default="elasticsearch")
+    parser.add_argument("--chunks", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--window", type=int, default=64, help="page size of the retrieval search, RERANK_LIMIT")
+    parser.add_argument("--batch", type=int, default=256)
+    parser.add_argument("--wait", type=int, default=5, help="seconds to wait for the index to be searchable")
+    args = parser.parse_args()
+    for row in run(args.engine, args.chunks, args.dim, args.queries, args.window, args.batch, args.wait):
+        print(json.dumps(row))
@@ -0,0 +1,94 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Recall/latency comparison of vector storage precisions over a synthetic local corpus.
+
+    python -m bench.vector_precision --docs 50000 --dim 1024 --queries 200 --topk 10
+
+float32 brute force is the ground truth. float16 and int8 rows store the corpus with the same
+quantization the doc engines use (see `rag.utils.doc_store_conn.quantize_int8`) and report recall@k,
+per-query brute-force latency and corpus memory. Latency is numpy on CPU, where float16 arithmetic is emulated,
+so use it to compare int8 against float32 only.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from rag.utils.doc_store_conn import VECTOR_PRECISIONS
+
+
+def synthetic_corpus(n_docs: int, dim: int, n_clusters: int = 64, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim)).astype(np.float32)
+    docs = centers[rng.integers(0, n_clusters, n_docs)] + 0.6 * rng.normal(size=(n_docs, dim)).astype(np.float32)
+    return docs / np.linalg.norm(docs, axis=1, keepdims=True)
+
+
+def synthetic_queries(docs: np.ndarray, n_queries: int, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    qs = docs[rng.integers(0, len(docs), n_queries)] + 0.3 * rng.normal(size=(n_queries, docs.shape[1])).astype(np.float32)
+    return qs / np.linalg.norm(qs, axis=1, keepdims=True)
+
+
+def encode(vectors: np.ndarray, precision: str):
+    if precision == "float16":
+        return vectors.astype(np.float16)
+    if precision == "int8":
+        scale = 127.0 / np.maximum(np.max(np.abs(vectors), axis=1, keepdims=True), 1e-12)
+        return np.clip(np.rint(vectors * scale), -127, 127).astype(np.int8)
+    return vectors.astype(np.float32)
+
+
+def search(corpus: np.ndarray, query: np.ndarray, topk: int, norms: np.ndarray | None = None):
+    if corpus.dtype == np.int8:
+        sims = (corpus @ query.astype(np.int32)) / norms
+    else:
+        sims = corpus @ query.astype(corpus.dtype)
+    idx = np.argpartition(-sims, topk)[:topk]
+    return idx[np.argsort(-sims[idx])]
+
+
+def run(n_docs: int, dim: int, n_queries: int, topk: int):
+    docs = synthetic_corpus(n_docs, dim)
+    queries = synthetic_queries(docs, n_queries)
+    truth = [set(search(docs, q, topk).tolist()) for q in queries]
+    report = []
+    for precision in VECTOR_PRECISIONS:
+        corpus = encode(docs, precision)
+        encoded = [encode(q[None, :], precision)[0] for q in queries]
+        norms = np.linalg.norm(corpus.astype(np.float32), axis=1) if precision == "int8" else None
+        st = time.perf_counter()
+        hits = [search(corpus, q, topk, norms) for q in encoded]
+        elapsed = time.perf_counter() - st
+        recall = np.mean([len(truth[i] & set(h.tolist())) / topk for i, h in enumerate(hits)])
+        report.append({"precision": precision,
+                       f"recall@{topk}": round(float(recall), 4),
+                       "latency_ms": round(elapsed * 1000 / n_queries, 3),
+                       "corpus_mb": round(corpus.nbytes / 1024 / 1024, 2)})
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--topk", type=int, default=10)
+    args = parser.parse_args()
+    for row in run(args.docs, args.dim, args.queries, args.topk):
+        print(json.dumps(row))
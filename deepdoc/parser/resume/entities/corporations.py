@@ -49,7 +49,7 @@ def corpNorm(nm, add_region=True):
     global CORP_TKS
     if not nm or not isinstance(nm, str):
         return ""
-    nm = rag_tokenizer.tradi2simp(rag_tokenizer.strQ2B(nm)).lower()
+    nm = rag_tokenizer.normalize(nm)
     nm = re.sub(r"&amp;", "&", nm)
     nm = re.sub(r"[\(\)（）\+'\"\t \*\\【】-]+", " ", nm)
     nm = re.sub(
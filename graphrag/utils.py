@@ -577,19 +577,14 @@ def flat_uniq_list(arr, key):
 async def rebuild_graph(tenant_id, kb_id, exclude_rebuild=None):
     graph = nx.Graph()
     flds = ["knowledge_graph_kwd", "content_with_weight", "source_id"]
-    bs = 256
-    for i in range(0, 1024*bs, bs):
-        es_res = await trio.to_thread.run_sync(lambda: settings.docStoreConn.search(flds, [],
-                                 {"kb_id": kb_id, "knowledge_graph_kwd": ["subgraph"]},
-                                 [],
-                                 OrderByExpr(),
-                                 i, bs, search.index_name(tenant_id), [kb_id]
-                                 ))
-        # tot = settings.docStoreConn.getTotal(es_res)
-        es_res = settings.docStoreConn.getFields(es_res, flds)
-
-        if len(es_res) == 0:
+    batches = settings.docStoreConn.scan(flds, {"kb_id": kb_id, "knowledge_graph_kwd": ["subgraph"]},
+                                         search.index_name(tenant_id), [kb_id], batchSize=256)
+    while True:
+        # Each batch is read by a worker thread, the scan keeps its position in between.
+        es_res = await trio.to_thread.run_sync(next, batches, None)
+        if es_res is None:
             break
+        es_res = settings.docStoreConn.getFields(es_res, flds)
 
         for id, d in es_res.items():
             assert d["knowledge_graph_kwd"] == "subgraph"
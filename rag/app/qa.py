@@ -269,8 +269,7 @@ def beAdocPdf(d, q, a, eng, image, poss):
     aprefix = "Answer: " if eng else "回答："
     d["content_with_weight"] = "\t".join(
         [qprefix + rmPrefix(q), aprefix + rmPrefix(a)])
-    d["content_ltks"] = rag_tokenizer.tokenize(q)
-    d["content_sm_ltks"] = rag_tokenizer.fine_grained_tokenize(d["content_ltks"])
+    d["content_ltks"], d["content_sm_ltks"] = rag_tokenizer.tokenize_many([q])[0]
     if image:
         d["image"] = image
         d["doc_type_kwd"] = "image"
@@ -283,8 +282,7 @@ def beAdocDocx(d, q, a, eng, image, row_num=-1):
     aprefix = "Answer: " if eng else "回答："
     d["content_with_weight"] = "\t".join(
         [qprefix + rmPrefix(q), aprefix + rmPrefix(a)])
-    d["content_ltks"] = rag_tokenizer.tokenize(q)
-    d["content_sm_ltks"] = rag_tokenizer.fine_grained_tokenize(d["content_ltks"])
+    d["content_ltks"], d["content_sm_ltks"] = rag_tokenizer.tokenize_many([q])[0]
     if image:
         d["image"] = image
         d["doc_type_kwd"] = "image"
@@ -298,8 +296,7 @@ def beAdoc(d, q, a, eng, row_num=-1):
     aprefix = "Answer: " if eng else "回答："
     d["content_with_weight"] = "\t".join(
         [qprefix + rmPrefix(q), aprefix + rmPrefix(a)])
-    d["content_ltks"] = rag_tokenizer.tokenize(q)
-    d["content_sm_ltks"] = rag_tokenizer.fine_grained_tokenize(d["content_ltks"])
+    d["content_ltks"], d["content_sm_ltks"] = rag_tokenizer.tokenize_many([q])[0]
     if row_num >= 0:
         d["top_int"] = [row_num]
     return d
@@ -26,6 +26,7 @@ from api.db.services.knowledgebase_service import KnowledgebaseService
 from api import settings
 from api.utils import get_uuid
 from rag.nlp import tokenize, search
+from rag.utils.doc_store_conn import DEFAULT_VECTOR_PRECISION
 from ranx import evaluate
 from ranx import Qrels, Run
 import pandas as pd
@@ -79,7 +80,8 @@ class Benchmark:
             return
         if settings.docStoreConn.indexExist(self.index_name, self.kb_id):
             settings.docStoreConn.deleteIdx(self.index_name, self.kb_id)
-        settings.docStoreConn.createIdx(self.index_name, self.kb_id, vector_size)
+        settings.docStoreConn.createIdx(self.index_name, self.kb_id, vector_size,
+                                        self.kb.parser_config.get("vector_precision", DEFAULT_VECTOR_PRECISION))
         self.initialized_index = True
 
     def ms_marco_index(self, file_path, index_name):
@@ -47,6 +47,15 @@ class Base(ABC):
     def encode_queries(self, text: str):
         raise NotImplementedError("Please implement encode method!")
 
+    def encode_queries_batch(self, texts: list):
+        # Models whose query embedding is the plain document embedding override this with one batched `encode`.
+        ress, token_count = [], 0
+        for t in texts:
+            embd, cnt = self.encode_queries(t)
+            ress.append(embd)
+            token_count += cnt
+        return np.array(ress), token_count
+
     def total_token_count(self, resp):
         try:
             return resp.usage.total_tokens
@@ -112,6 +121,16 @@ class DefaultEmbedding(Base):
         token_count = num_tokens_from_string(text)
         return self._model.encode_queries([text]).tolist()[0], token_count
 
+    def encode_queries_batch(self, texts: list):
+        batch_size = 16
+        token_count = 0
+        for t in texts:
+            token_count += num_tokens_from_string(t)
+        ress = []
+        for i in range(0, len(texts), batch_size):
+            ress.extend(self._model.encode_queries(texts[i:i + batch_size]).tolist())
+        return np.array(ress), token_count
+
 
 class OpenAIEmbed(Base):
     def __init__(self, key, model_name="text-embedding-ada-002",
@@ -139,6 +158,9 @@ class OpenAIEmbed(Base):
                                             model=self.model_name)
         return np.array(res.data[0].embedding), self.total_token_count(res)
 
+    def encode_queries_batch(self, texts: list):
+        return self.encode(texts)
+
 
 class LocalAIEmbed(Base):
     def __init__(self, key, model_name, base_url):
@@ -161,6 +183,9 @@ class LocalAIEmbed(Base):
         embds, cnt = self.encode([text])
         return np.array(embds[0]), cnt
 
+    def encode_queries_batch(self, texts: list):
+        return self.encode(texts)
+
 
 class AzureEmbed(OpenAIEmbed):
     def __init__(self, key, model_name, **kwargs):
@@ -321,6 +346,14 @@ class FastEmbed(DefaultEmbedding):
 
         return np.array(embedding), len(encoding.ids)
 
+    def encode_queries_batch(self, texts: list):
+        encodings = self._model.model.tokenizer.encode_batch(texts)
+        total_tokens = sum(len(e) for e in encodings)
+
+        embeddings = [e.tolist() for e in self._model.query_embed(texts, batch_size=16)]
+
+        return np.array(embeddings), total_tokens
+
 
 class XinferenceEmbed(Base):
     def __init__(self, key, model_name="", base_url=""):
@@ -412,6 +445,9 @@ class JinaEmbed(Base):
         embds, cnt = self.encode([text])
         return np.array(embds[0]), cnt
 
+    def encode_queries_batch(self, texts: list):
+        return self.encode(texts)
+
 
 class InfinityEmbed(Base):
     _model = None
@@ -452,6 +488,9 @@ class InfinityEmbed(Base):
         # number of tokens
         return self.encode([text])
 
+    def encode_queries_batch(self, texts: list[str]) -> tuple[np.ndarray, int]:
+        return self.encode(texts)
+
 
 class MistralEmbed(Base):
     def __init__(self, key, model_name="mistral-embed",
@@ -604,6 +643,9 @@ class NvidiaEmbed(Base):
         embds, cnt = self.encode([text])
         return np.array(embds[0]), cnt
 
+    def encode_queries_batch(self, texts: list):
+        return self.encode(texts)
+
 
 class LmStudioEmbed(LocalAIEmbed):
     def __init__(self, key, model_name, base_url):
@@ -37,6 +37,9 @@ def sigmoid(x):
 
 
 class Base(ABC):
+    # Scores rescaled within every call can't be compared, nor cached, across calls.
+    normalizes_per_call = False
+
     def __init__(self, key, model_name):
         pass
 
@@ -244,6 +247,8 @@ class XInferenceRerank(Base):
 
 
 class LocalAIRerank(Base):
+    normalizes_per_call = True
+
     def __init__(self, key, model_name, base_url):
         if base_url.find("/rerank") == -1:
             self.base_url = urljoin(base_url, "/rerank")
@@ -336,6 +341,8 @@ class LmStudioRerank(Base):
 
 
 class OpenAI_APIRerank(Base):
+    normalizes_per_call = True
+
     def __init__(self, key, model_name, base_url):
         if base_url.find("/rerank") == -1:
             self.base_url = urljoin(base_url, "/rerank")
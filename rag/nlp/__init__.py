@@ -18,8 +18,8 @@ import logging
 import random
 from collections import Counter
 
-from rag.utils import num_tokens_from_string
-from . import rag_tokenizer
+from rag.utils import num_tokens_from_string, token_count
+from . import rag_tokenizer as rag_tokenizer, tokenizer_pool
 import re
 import copy
 import roman_numbers as r
@@ -249,14 +249,23 @@ def is_chinese(text):
 
 
 def tokenize(d, t, eng):
-    d["content_with_weight"] = t
-    t = re.sub(r"</?(table|td|caption|tr|th)( [^<>]{0,12})?>", " ", t)
-    d["content_ltks"] = rag_tokenizer.tokenize(t)
-    d["content_sm_ltks"] = rag_tokenizer.fine_grained_tokenize(d["content_ltks"])
+    tokenize_batch([d], [t], eng)
+
+
+def tokenize_batch(ds, ts, eng):
+    """
+    `tokenize` of every chunk with its text, as one batch for the tokenizer pool.
+    """
+    texts = []
+    for d, t in zip(ds, ts):
+        d["content_with_weight"] = t
+        texts.append(re.sub(r"</?(table|td|caption|tr|th)( [^<>]{0,12})?>", " ", t))
+    for d, (ltks, sm_ltks) in zip(ds, tokenizer_pool.tokenize_many(texts)):
+        d["content_ltks"], d["content_sm_ltks"] = ltks, sm_ltks
 
 
 def tokenize_chunks(chunks, doc, eng, pdf_parser=None):
-    res = []
+    res, texts = [], []
     # wrap up as es documents
     for ii, ck in enumerate(chunks):
         if len(ck.strip()) == 0:
@@ -272,12 +281,13 @@ def tokenize_chunks(chunks, doc, eng, pdf_parser=None):
                 pass
         else:
             add_positions(d, [[ii]*5])
-        tokenize(d, ck, eng)
         res.append(d)
+        texts.append(ck)
+    tokenize_batch(res, texts, eng)
     return res
 
 def tokenize_chunks_with_images(chunks, doc, eng, images):
-    res = []
+    res, texts = [], []
     # wrap up as es documents
     for ii, (ck, image) in enumerate(zip(chunks, images)):
         if len(ck.strip()) == 0:
@@ -286,37 +296,38 @@ def tokenize_chunks_with_images(chunks, doc, eng, images):
         d = copy.deepcopy(doc)
         d["image"] = image
         add_positions(d, [[ii]*5])
-        tokenize(d, ck, eng)
         res.append(d)
+        texts.append(ck)
+    tokenize_batch(res, texts, eng)
     return res
 
 def tokenize_table(tbls, doc, eng, batch_size=10):
-    res = []
+    res, texts = [], []
     # add tables
     for (img, rows), poss in tbls:
         if not rows:
             continue
         if isinstance(rows, str):
             d = copy.deepcopy(doc)
-            tokenize(d, rows, eng)
-            d["content_with_weight"] = rows
             if img:
                 d["image"] = img
                 d["doc_type_kwd"] = "image"
             if poss:
                 add_positions(d, poss)
             res.append(d)
+            texts.append(rows)
             continue
         de = "; " if eng else "； "
         for i in range(0, len(rows), batch_size):
             d = copy.deepcopy(doc)
             r = de.join(rows[i:i + batch_size])
-            tokenize(d, r, eng)
             if img:
                 d["image"] = img
                 d["doc_type_kwd"] = "image"
             add_positions(d, poss)
             res.append(d)
+            texts.append(r)
+    tokenize_batch(res, texts, eng)
     return res
 
 
@@ -517,9 +528,8 @@ def naive_merge(sections, chunk_token_num=128, delimiter="\n。；！？"):
     cks = [""]
     tk_nums = [0]
 
-    def add_chunk(t, pos):
+    def add_chunk(t, pos, tnum):
         nonlocal cks, tk_nums, delimiter
-        tnum = num_tokens_from_string(t)
         if not pos:
             pos = ""
         if tnum < 8:
@@ -538,12 +548,16 @@ def naive_merge(sections, chunk_token_num=128, delimiter="\n。；！？"):
             tk_nums[-1] += tnum
 
     dels = get_delimiters(delimiter)
+    sub_secs = []
     for sec, pos in sections:
         splited_sec = re.split(r"(%s)" % dels, sec)
         for sub_sec in splited_sec:
             if re.match(f"^{dels}$", sub_sec):
                 continue
-            add_chunk(sub_sec, pos)
+            sub_secs.append((sub_sec, pos))
+    # Counted in one batch rather than one by one as they are merged.
+    for (sub_sec, pos), tnum in zip(sub_secs, token_count.count_many([t for t, _ in sub_secs])):
+        add_chunk(sub_sec, pos, tnum)
 
     return cks
 
@@ -633,9 +647,8 @@ def naive_merge_docx(sections, chunk_token_num=128, delimiter="\n。；！？"):
     images = [None]
     tk_nums = [0]
 
-    def add_chunk(t, image, pos=""):
+    def add_chunk(t, image, tnum, pos=""):
         nonlocal cks, tk_nums, delimiter
-        tnum = num_tokens_from_string(t)
         if tnum < 8:
             pos = ""
         if cks[-1] == "" or tk_nums[-1] > chunk_token_num:
@@ -652,12 +665,15 @@ def naive_merge_docx(sections, chunk_token_num=128, delimiter="\n。；！？"):
             tk_nums[-1] += tnum
 
     dels = get_delimiters(delimiter)
+    sub_secs = []
     for sec, image in sections:
         splited_sec = re.split(r"(%s)" % dels, sec)
         for sub_sec in splited_sec:
             if re.match(f"^{dels}$", sub_sec):
                 continue
-            add_chunk(sub_sec, image,"")
+            sub_secs.append((sub_sec, image))
+    for (sub_sec, image), tnum in zip(sub_secs, token_count.count_many([t for t, _ in sub_secs])):
+        add_chunk(sub_sec, image, tnum, "")
 
     return cks, images
 
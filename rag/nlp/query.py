@@ -17,8 +17,11 @@
 import logging
 import json
 import re
+import threading
 from collections import defaultdict
 
+from cachetools import LRUCache
+
 from rag.utils.doc_store_conn import MatchTextExpr
 from rag.nlp import rag_tokenizer, term_weight, synonym
 
@@ -36,6 +39,13 @@ class FulltextQueryer:
             "content_ltks^2",
             "content_sm_ltks",
         ]
+        # (txt, tbl, min_match) -> analysed question, dropped whenever the synonym or tokenizer dictionary reloads.
+        self.question_cache = LRUCache(maxsize=4096)
+        self.question_cache_lock = threading.Lock()
+        self.question_cache_version = self.dictionaries_version_()
+
+    def dictionaries_version_(self):
+        return self.syn.version, rag_tokenizer.tokenizer.version
 
     @staticmethod
     def subSpecialChar(line):
@@ -83,11 +93,33 @@ class FulltextQueryer:
         return txt
 
     def question(self, txt, tbl="qa", min_match: float = 0.6):
+        key = (txt, tbl, min_match)
+        with self.question_cache_lock:
+            if self.question_cache_version != self.dictionaries_version_():
+                self.question_cache.clear()
+                self.question_cache_version = self.dictionaries_version_()
+            cached = self.question_cache.get(key)
+            version = self.question_cache_version
+        if cached is None:
+            matchExpr, keywords = self._question(txt, tbl, min_match)
+            # Doc store connectors annotate the expression in place, so only its plain parts are kept.
+            cached = (None if matchExpr is None else (matchExpr.matching_text, matchExpr.topn, dict(matchExpr.extra_options)),
+                      tuple(keywords))
+            with self.question_cache_lock:
+                if version == self.dictionaries_version_():
+                    self.question_cache[key] = cached
+        expr, keywords = cached
+        if expr is None:
+            return None, list(keywords)
+        matching_text, topn, extra_options = expr
+        return MatchTextExpr(self.query_fields, matching_text, topn, dict(extra_options)), list(keywords)
+
+    def _question(self, txt, tbl="qa", min_match: float = 0.6):
         txt = FulltextQueryer.add_space_between_eng_zh(txt)
         txt = re.sub(
             r"[ :|\r\n\t,，。？?/`!！&^%%()\[\]{}<>]+",
             " ",
-            rag_tokenizer.tradi2simp(rag_tokenizer.strQ2B(txt.lower())),
+            rag_tokenizer.normalize(txt),
         ).strip()
         otxt = txt
         txt = FulltextQueryer.rmWWW(txt)
@@ -226,6 +258,50 @@ class FulltextQueryer:
             return np.array(tksim), tksim, sims[0]
         return np.array(sims[0]) * vtweight + np.array(tksim) * tkweight, tksim, sims[0]
 
+    def hybrid_similarity_matrix(self, avecs, bvecs, atkss, btkss, tkweight=0.3, vtweight=0.7):
+        """
+        `hybrid_similarity` of every `avecs[i]`/`atkss[i]` against all of `bvecs`/`btkss`, as one matrix.
+        """
+        from sklearn.metrics.pairwise import cosine_similarity as CosineSimilarity
+        import numpy as np
+
+        sims = CosineSimilarity(avecs, bvecs)
+        tksim = self.token_similarity_matrix(atkss, btkss)
+        no_vec = (np.sum(sims, axis=1) == 0)[:, None]
+        return np.where(no_vec, tksim, sims * vtweight + tksim * tkweight), tksim, sims
+
+    def token_similarity_matrix(self, atkss, btkss):
+        """
+        `token_similarity` of every `atkss[i]` against all of `btkss`: the query weight share of the terms
+        found in each candidate, computed as a sparse (queries x terms) @ (terms x candidates) product.
+        """
+        from scipy.sparse import csr_matrix
+        import numpy as np
+
+        vocab = {}
+        rows, cols, wts = [], [], []
+        atkss = [tks.split() if isinstance(tks, str) else tks for tks in atkss]
+        for i, tw in enumerate(self.tw.weights_many(atkss, preprocess=False)):
+            for t, c in tw:
+                rows.append(i)
+                cols.append(vocab.setdefault(t, len(vocab)))
+                wts.append(c)
+        qwts = csr_matrix((wts, (rows, cols)), shape=(len(atkss), len(vocab)), dtype=np.float64)
+
+        rows, cols = [], []
+        for j, tks in enumerate(btkss):
+            if isinstance(tks, str):
+                tks = tks.split()
+            for t in set(tks):
+                if t in vocab:
+                    rows.append(vocab[t])
+                    cols.append(j)
+        found = csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(vocab), len(btkss)), dtype=np.float64)
+
+        s = (qwts @ found).toarray() + 1e-9
+        q = np.asarray(qwts.sum(axis=1)).reshape(-1, 1) + 1e-9
+        return s / q
+
     def token_similarity(self, atks, btkss):
         def toDict(tks):
             if isinstance(tks, str):
@@ -237,7 +313,8 @@ class FulltextQueryer:
             return d
 
         atks = toDict(atks)
-        btkss = [toDict(tks) for tks in btkss]
+        # Only the terms of a candidate count in `similarity`, not their weights.
+        btkss = [set(tks.split() if isinstance(tks, str) else tks) for tks in btkss]
         return [self.similarity(atks, btks) for btks in btkss]
 
     def similarity(self, qtwt, dtwt):
@@ -22,18 +22,43 @@ import os
 import re
 import string
 import sys
-from hanziconv import HanziConv
+import threading
+from cachetools import LRUCache
+from hanziconv.charmap import simplified_charmap, traditional_charmap
 from nltk import word_tokenize
 from nltk.stem import PorterStemmer, WordNetLemmatizer
 from api.utils.file_utils import get_project_base_directory
+from rag.nlp.tokenizer_dict import DatrieDict, MmapDict, key, rkey
+from rag.settings import TOKENIZER_SEGMENTER, TOKENIZER_CACHE_SIZE, TOKENIZER_DICT_MMAP, \
+    TOKENIZER_ENGLISH_CACHE_SIZE, TOKENIZER_ENGLISH_WORDS
+
+
+def _translation_tables():
+    """
+    str.translate tables for `_strQ2B`, `_tradi2simp` and both in turn.
+    """
+    q2b = {0x3000: " "}
+    # Full-width forms are half-width ones shifted by 0xfee0.
+    for code in range(0xff00, 0xff5f):
+        q2b[code] = chr(code - 0xfee0)
+    t2s = {}
+    # HanziConv takes the first occurrence in its map of a traditional character.
+    for t, s in zip(traditional_charmap, simplified_charmap):
+        t2s.setdefault(ord(t), s)
+    t2s = {code: s for code, s in t2s.items() if chr(code) != s}
+    both = {**t2s, **{code: t2s.get(ord(c), c) for code, c in q2b.items()}}
+    return q2b, t2s, both
+
+
+Q2B_TABLE, T2S_TABLE, NORMALIZE_TABLE = _translation_tables()
 
 
 class RagTokenizer:
     def key_(self, line):
-        return str(line.lower().encode("utf-8"))[2:-1]
+        return key(line)
 
     def rkey_(self, line):
-        return str(("DD" + (line[::-1].lower())).encode("utf-8"))[2:-1]
+        return rkey(line)
 
     def loadDict_(self, fnm):
         logging.info(f"[HUQIE]:Build trie from {fnm}")
@@ -51,6 +76,7 @@ class RagTokenizer:
                     self.trie_[self.key_(line[0])] = (F, line[2])
                 self.trie_[self.rkey_(line[0])] = 1
 
+            self.clear_cache()
             dict_file_cache = fnm + ".trie"
             logging.info(f"[HUQIE]:Build trie cache to {dict_file_cache}")
             self.trie_.save(dict_file_cache)
@@ -58,8 +84,19 @@ class RagTokenizer:
         except Exception:
             logging.exception(f"[HUQIE]:Build trie {fnm} failed")
 
-    def __init__(self, debug=False):
+    def __init__(self, debug=False, segmenter=None):
         self.DEBUG = debug
+        self.SEGMENTER = segmenter or TOKENIZER_SEGMENTER
+        # Coarse tokens of each run of word characters and fine-grained tokens of each coarse token, both only
+        # depend on the dictionary. Sizes are in characters of the cached tokens.
+        self.span_cache = LRUCache(maxsize=TOKENIZER_CACHE_SIZE, getsizeof=len) if TOKENIZER_CACHE_SIZE > 0 else None
+        self.fine_cache = LRUCache(maxsize=TOKENIZER_CACHE_SIZE, getsizeof=len) if TOKENIZER_CACHE_SIZE > 0 else None
+        self.cache_lock = threading.Lock()
+        # Bumped whenever the caches are cleared for a new dictionary, so results derived from it can be dropped.
+        self.version = 0
+        # Lemmatized stems of English words, sized in words. They don't depend on the dictionary.
+        self.english_cache = LRUCache(maxsize=TOKENIZER_ENGLISH_CACHE_SIZE) if TOKENIZER_ENGLISH_CACHE_SIZE > 0 else None
+        self.english_seeded = not TOKENIZER_ENGLISH_WORDS
         self.DENOMINATOR = 1000000
         self.DIR_ = os.path.join(get_project_base_directory(), "rag/res", "huqie")
 
@@ -68,13 +105,19 @@ class RagTokenizer:
 
         self.SPLIT_CHAR = r"([ ,\.<>/?;:'\[\]\\`!@#$%^&*\(\)\{\}\|_+=《》，。？、；‘’：“”【】~！￥%……（）——-]+|[a-zA-Z0-9,\.-]+)"
 
+        # The default dictionary is opened on first lookup, see `load_`.
+        self.trie_ = None
+        self.dict_ = None
+        self.dict_lock = threading.Lock()
+
+    def loadTrie_(self):
         trie_file_name = self.DIR_ + ".txt.trie"
         # check if trie file existence
         if os.path.exists(trie_file_name):
             try:
                 # load trie from file
                 self.trie_ = datrie.Trie.load(trie_file_name)
-                return
+                return self.trie_
             except Exception:
                 # fail to load trie from file, build default trie
                 logging.exception(f"[HUQIE]:Fail to load trie file {trie_file_name}, build the default trie file")
@@ -86,35 +129,100 @@ class RagTokenizer:
 
         # load data from dict file and save to trie file
         self.loadDict_(self.DIR_ + ".txt")
+        return self.trie_
+
+    def openDict_(self):
+        """
+        The default dictionary, compiled from the datrie or the text file whenever they are newer than the
+        compiled one and memory-mapped, or the datrie itself when TOKENIZER_DICT_MMAP is off.
+        """
+        dict_file_name = self.DIR_ + ".txt.dict"
+        sources = [f for f in (self.DIR_ + ".txt", self.DIR_ + ".txt.trie") if os.path.exists(f)]
+        # Without any source, an empty dictionary is not compiled, it would outlive sources copied later.
+        if TOKENIZER_DICT_MMAP and (sources or os.path.exists(dict_file_name)):
+            try:
+                if not os.path.exists(dict_file_name) or \
+                        any(os.path.getmtime(f) > os.path.getmtime(dict_file_name) for f in sources):
+                    logging.info(f"[HUQIE]:Compile dictionary to {dict_file_name}")
+                    MmapDict.compile(DatrieDict(self.loadTrie_()).words(), dict_file_name)
+                    self.trie_ = None
+                return MmapDict(dict_file_name)
+            except Exception:
+                logging.exception(f"[HUQIE]:Fail to open compiled dictionary {dict_file_name}, use the trie")
+        return DatrieDict(self.trie_ if self.trie_ is not None else self.loadTrie_())
+
+    def load_(self):
+        with self.dict_lock:
+            if self.dict_ is None:
+                self.dict_ = self.openDict_()
+            return self.dict_
 
     def loadUserDict(self, fnm):
-        try:
-            self.trie_ = datrie.Trie.load(fnm + ".trie")
-            return
-        except Exception:
-            self.trie_ = datrie.Trie(string.printable)
-        self.loadDict_(fnm)
+        with self.dict_lock:
+            try:
+                self.trie_ = datrie.Trie.load(fnm + ".trie")
+            except Exception:
+                self.trie_ = datrie.Trie(string.printable)
+                self.loadDict_(fnm)
+            self.dict_ = DatrieDict(self.trie_)
+            self.clear_cache()
 
     def addUserDict(self, fnm):
-        self.loadDict_(fnm)
+        with self.dict_lock:
+            # Words are added to the datrie, which a compiled dictionary is not loaded from.
+            if self.trie_ is None:
+                self.loadTrie_()
+            self.loadDict_(fnm)
+            self.dict_ = DatrieDict(self.trie_)
+            self.clear_cache()
+
+    def word_(self, tk):
+        """
+        (log frequency, tag) of the word `tk` in the dictionary, None if it is not a word.
+        """
+        return (self.dict_ or self.load_()).get(tk)
+
+    def hasPrefix_(self, tk):
+        return (self.dict_ or self.load_()).has_prefix(tk)
+
+    def hasSuffix_(self, tk):
+        return (self.dict_ or self.load_()).has_suffix(tk)
+
+    def clear_cache(self):
+        with self.cache_lock:
+            self.version += 1
+            for cache in (self.span_cache, self.fine_cache):
+                if cache is not None:
+                    cache.clear()
+
+    def cached_(self, cache, key, fn):
+        if cache is None:
+            return fn(key)
+        with self.cache_lock:
+            res = cache.get(key)
+            version = self.version
+        if res is None:
+            res = fn(key)
+            if len(res) <= cache.maxsize:
+                with self.cache_lock:
+                    # Not cached if the dictionary was replaced while segmenting.
+                    if version == self.version:
+                        cache[key] = res
+        return res
 
     def _strQ2B(self, ustring):
         """Convert full-width characters to half-width characters"""
-        rstring = ""
-        for uchar in ustring:
-            inside_code = ord(uchar)
-            if inside_code == 0x3000:
-                inside_code = 0x0020
-            else:
-                inside_code -= 0xfee0
-            if inside_code < 0x0020 or inside_code > 0x7e:  # After the conversion, if it's not a half-width character, return the original character.
-                rstring += uchar
-            else:
-                rstring += chr(inside_code)
-        return rstring
+        return ustring.translate(Q2B_TABLE)
 
     def _tradi2simp(self, line):
-        return HanziConv.toSimplified(line)
+        return line.translate(T2S_TABLE)
+
+    def normalize(self, line):
+        """
+        Full-width to half-width, lowercase and traditional to simplified, as tokenize does before segmenting.
+        str.lower stays a pass of its own, its final sigma depends on the context.
+        """
+        return line.translate(NORMALIZE_TABLE).lower()
 
     def dfs_(self, chars, s, preTks, tkslist, _depth=0, _memo=None):
         if _memo is None:
@@ -150,12 +258,8 @@ class RagTokenizer:
                     end += 1
                 mid = s + min(10, end - s)
                 t = "".join(chars[s:mid])
-                k = self.key_(t)
                 copy_pretks = copy.deepcopy(preTks)
-                if k in self.trie_:
-                    copy_pretks.append((t, self.trie_[k]))
-                else:
-                    copy_pretks.append((t, (-12, '')))
+                copy_pretks.append((t, self.word_(t) or (-12, '')))
                 next_res = self.dfs_(chars, mid, copy_pretks, tkslist, _depth + 1, _memo)
                 res = max(res, next_res)
                 _memo[state_key] = res
@@ -165,21 +269,21 @@ class RagTokenizer:
         if s + 2 <= len(chars):
             t1 = "".join(chars[s:s + 1])
             t2 = "".join(chars[s:s + 2])
-            if self.trie_.has_keys_with_prefix(self.key_(t1)) and not self.trie_.has_keys_with_prefix(self.key_(t2)):
+            if self.hasPrefix_(t1) and not self.hasPrefix_(t2):
                 S = s + 2
         if len(preTks) > 2 and len(preTks[-1][0]) == 1 and len(preTks[-2][0]) == 1 and len(preTks[-3][0]) == 1:
             t1 = preTks[-1][0] + "".join(chars[s:s + 1])
-            if self.trie_.has_keys_with_prefix(self.key_(t1)):
+            if self.hasPrefix_(t1):
                 S = s + 2
     
         for e in range(S, len(chars) + 1):
             t = "".join(chars[s:e])
-            k = self.key_(t)
-            if e > s + 1 and not self.trie_.has_keys_with_prefix(k):
+            if e > s + 1 and not self.hasPrefix_(t):
                 break
-            if k in self.trie_:
+            v = self.word_(t)
+            if v is not None:
                 pretks = copy.deepcopy(preTks)
-                pretks.append((t, self.trie_[k]))
+                pretks.append((t, v))
                 res = max(res, self.dfs_(chars, e, pretks, tkslist, _depth + 1, _memo))
         
         if res > s:
@@ -187,27 +291,109 @@ class RagTokenizer:
             return res
     
         t = "".join(chars[s:s + 1])
-        k = self.key_(t)
         copy_pretks = copy.deepcopy(preTks)
-        if k in self.trie_:
-            copy_pretks.append((t, self.trie_[k]))
-        else:
-            copy_pretks.append((t, (-12, '')))
+        copy_pretks.append((t, self.word_(t) or (-12, '')))
         result = self.dfs_(chars, s + 1, copy_pretks, tkslist, _depth + 1, _memo)
         _memo[state_key] = result
         return result
 
+    def dp_(self, chars, topn=1):
+        """
+        The `topn` best segmentations of `chars` by `score_`, among the same candidates as `dfs_` enumerates,
+        without enumerating them. A state is (end, number of tokens, trailing single char tokens up to 3), the
+        last one because of the rule `dfs_` applies after three single chars. Since frequencies are integers and
+        the rest of `score_` changes by less than 1 between segmentations of as many tokens, a state only
+        keeps its `topn` paths of highest frequency sum, then longest token count.
+        Unlike `dfs_`, it does not give up past 10 tokens.
+        """
+        N = len(chars)
+
+        def value(t):
+            return self.word_(t) or (-12, '')
+
+        # Words of the dictionary starting at each position, as `dfs_` looks them up.
+        words, rep = [], []
+        for s in range(N):
+            if s < N - 4 and chars[s + 1:s + 5] == chars[s] * 4:
+                end = s
+                while end < N and chars[end] == chars[s]:
+                    end += 1
+                rep.append(s + min(10, end - s))
+            else:
+                rep.append(0)
+            ws = []
+            for e in range(s + 1, N + 1):
+                t = chars[s:e]
+                if e > s + 1 and not self.hasPrefix_(t):
+                    break
+                v = self.word_(t)
+                if v is not None:
+                    ws.append((e, v[0]))
+            words.append(ws)
+        prefix = [s + 2 <= N and self.hasPrefix_(chars[s]) and not self.hasPrefix_(chars[s:s + 2]) for s in range(N)]
+        after_singles = [s > 0 and self.hasPrefix_(chars[s - 1:s + 1]) for s in range(N)]
+
+        # states[s][(n, r)]: up to `topn` paths (frequency sum, long token count, token ends) ending at s.
+        states = [dict() for _ in range(N + 1)]
+        states[0][(0, 0)] = [(0, 0, ())]
+
+        def push(e, n, r, F, L, ends):
+            paths = states[e].setdefault((n, r), [])
+            paths.append((F, L, ends))
+            if len(paths) > topn:
+                paths.sort(key=lambda p: (-p[0], -p[1], p[2]))
+                paths.pop()
+
+        for s in range(N):
+            if not states[s]:
+                continue
+            # A path with more tokens and a frequency sum lower by 1 or more than `topn` others can't win.
+            best = {}
+            for (n, r) in sorted(states[s]):
+                paths, fs = states[s][(n, r)], best.get(r, [])
+                if len(fs) == topn:
+                    paths = states[s][(n, r)] = [p for p in paths if fs[-1] < p[0] + 1]
+                best[r] = sorted(fs + [p[0] for p in paths], reverse=True)[:topn]
+            for (n, r), paths in states[s].items():
+                if rep[s]:
+                    nexts = [(rep[s], value(chars[s:rep[s]])[0])]
+                else:
+                    S = s + 2 if prefix[s] or (r >= 3 and after_singles[s]) else s + 1
+                    nexts = [(e, F) for e, F in words[s] if e >= S] or [(s + 1, value(chars[s])[0])]
+                for e, F in nexts:
+                    long = e - s >= 2
+                    for pF, pL, ends in paths:
+                        push(e, n + 1, 0 if long else min(r + 1, 3), pF + F, pL + long, ends + (e,))
+
+        res = []
+        for paths in states[N].values():
+            for _, _, ends in paths:
+                tks = [chars[b:e] for b, e in zip((0,) + ends, ends)]
+                res.append((self.score_([(t, value(t)) for t in tks]), ends))
+        res.sort(key=lambda x: (-x[0][1], x[1]))
+        return [r for r, _ in res[:topn]]
+
+    def segment_(self, chars, topn=1):
+        """
+        The `topn` best segmentations of `chars` as (tokens, score), by the configured segmenter.
+        """
+        if self.SEGMENTER == "dp":
+            return self.dp_(chars, topn)
+        tkslist = []
+        self.dfs_(chars, 0, [], tkslist)
+        return self.sortTks_(tkslist)[:topn]
+
     def freq(self, tk):
-        k = self.key_(tk)
-        if k not in self.trie_:
+        v = self.word_(tk)
+        if v is None:
             return 0
-        return int(math.exp(self.trie_[k][0]) * self.DENOMINATOR + 0.5)
+        return int(math.exp(v[0]) * self.DENOMINATOR + 0.5)
 
     def tag(self, tk):
-        k = self.key_(tk)
-        if k not in self.trie_:
+        v = self.word_(tk)
+        if v is None:
             return ""
-        return self.trie_[k][1]
+        return v[1]
 
     def score_(self, tfts):
         B = 30
@@ -252,19 +438,15 @@ class RagTokenizer:
         while s < len(line):
             e = s + 1
             t = line[s:e]
-            while e < len(line) and self.trie_.has_keys_with_prefix(
-                    self.key_(t)):
+            while e < len(line) and self.hasPrefix_(t):
                 e += 1
                 t = line[s:e]
 
-            while e - 1 > s and self.key_(t) not in self.trie_:
+            while e - 1 > s and self.word_(t) is None:
                 e -= 1
                 t = line[s:e]
 
-            if self.key_(t) in self.trie_:
-                res.append((t, self.trie_[self.key_(t)]))
-            else:
-                res.append((t, (0, '')))
+            res.append((t, self.word_(t) or (0, '')))
 
             s = e
 
@@ -276,25 +458,59 @@ class RagTokenizer:
         while s >= 0:
             e = s + 1
             t = line[s:e]
-            while s > 0 and self.trie_.has_keys_with_prefix(self.rkey_(t)):
+            while s > 0 and self.hasSuffix_(t):
                 s -= 1
                 t = line[s:e]
 
-            while s + 1 < e and self.key_(t) not in self.trie_:
+            while s + 1 < e and self.word_(t) is None:
                 s += 1
                 t = line[s:e]
 
-            if self.key_(t) in self.trie_:
-                res.append((t, self.trie_[self.key_(t)]))
-            else:
-                res.append((t, (0, '')))
+            res.append((t, self.word_(t) or (0, '')))
 
             s -= 1
 
         return self.score_(res[::-1])
 
+    def stem_(self, t):
+        return self.stemmer.stem(self.lemmatizer.lemmatize(t))
+
+    def english_word_(self, t):
+        if not self.english_seeded:
+            self.seedEnglish_(TOKENIZER_ENGLISH_WORDS)
+        return self.cached_(self.english_cache, t, self.stem_)
+
+    def seedEnglish_(self, fnm):
+        """
+        Fills the English cache with the words of `fnm`, one per line by decreasing frequency, each optionally
+        followed by its stem. Words beyond the size of the cache are ignored.
+        """
+        with self.cache_lock:
+            if self.english_seeded:
+                return
+            self.english_seeded = True
+        if self.english_cache is None:
+            return
+        fnm = os.path.join(get_project_base_directory(), fnm)
+        stems = []
+        try:
+            with open(fnm, "r", encoding="utf-8") as f:
+                for line in f:
+                    if len(stems) >= self.english_cache.maxsize:
+                        break
+                    arr = line.split()
+                    if arr:
+                        stems.append((arr[0], arr[1] if len(arr) > 1 else self.stem_(arr[0])))
+        except Exception:
+            logging.exception(f"[HUQIE]:Fail to load English words {fnm}")
+        # The most frequent words are inserted last, to be evicted last.
+        with self.cache_lock:
+            for t, stem in reversed(stems):
+                self.english_cache[t] = stem
+        logging.info(f"[HUQIE]:Loaded {len(stems)} English words from {fnm}")
+
     def english_normalize_(self, tks):
-        return [self.stemmer.stem(self.lemmatizer.lemmatize(t)) if re.match(r"[a-zA-Z_-]+$", t) else t for t in tks]
+        return [self.english_word_(t) if re.match(r"[a-zA-Z_-]+$", t) else t for t in tks]
 
     def _split_by_lang(self, line):
         txt_lang_pairs = []
@@ -320,15 +536,19 @@ class RagTokenizer:
         return txt_lang_pairs
 
     def tokenize(self, line):
-        line = re.sub(r"\W+", " ", line)
-        line = self._strQ2B(line).lower()
-        line = self._tradi2simp(line)
-
-        arr = self._split_by_lang(line)
+        # Normalization and segmentation never cross a non-word character, so every run of word characters is
+        # tokenized on its own, once while it stays in the cache.
+        res = [self.cached_(self.span_cache, span, self.tokenize_span_) for span in re.split(r"\W+", line) if span]
+        res = self.merge_(" ".join(res))
+        logging.debug("[TKS] {}".format(res))
+        return res
+
+    def tokenize_span_(self, line):
+        arr = self._split_by_lang(self.normalize(line))
         res = []
         for L,lang in arr:
             if not lang:
-                res.extend([self.stemmer.stem(self.lemmatizer.lemmatize(t)) for t in word_tokenize(L)])
+                res.extend([self.english_word_(t) for t in word_tokenize(L)])
                 continue
             if len(L) < 2 or re.match(
                     r"[a-z\.-]+$", L) or re.match(r"[0-9\.-]+$", L):
@@ -367,9 +587,7 @@ class RagTokenizer:
                     j += 1
                     continue
                 # backward tokens from_i to i are different from forward tokens from _j to j.
-                tkslist = []
-                self.dfs_("".join(tks[_j:j]), 0, [], tkslist)
-                res.append(" ".join(self.sortTks_(tkslist)[0][0]))
+                res.append(" ".join(self.segment_("".join(tks[_j:j]))[0][0]))
 
                 same = 1
                 while i + same < len(tks1) and j + same < len(tks) and tks1[i + same] == tks[j + same]:
@@ -383,13 +601,9 @@ class RagTokenizer:
             if _i < len(tks1):
                 assert _j < len(tks)
                 assert "".join(tks1[_i:]) == "".join(tks[_j:])
-                tkslist = []
-                self.dfs_("".join(tks[_j:]), 0, [], tkslist)
-                res.append(" ".join(self.sortTks_(tkslist)[0][0]))
+                res.append(" ".join(self.segment_("".join(tks[_j:]))[0][0]))
 
-        res = " ".join(res)
-        logging.debug("[TKS] {}".format(self.merge_(res)))
-        return self.merge_(res)
+        return " ".join(res)
 
     def fine_grained_tokenize(self, tks):
         tks = tks.split()
@@ -400,36 +614,42 @@ class RagTokenizer:
                 res.extend(tk.split("/"))
             return " ".join(res)
 
-        res = []
-        for tk in tks:
-            if len(tk) < 3 or re.match(r"[0-9,\.-]+$", tk):
-                res.append(tk)
-                continue
-            tkslist = []
-            if len(tk) > 10:
-                tkslist.append(tk)
-            else:
-                self.dfs_(tk, 0, [], tkslist)
-            if len(tkslist) < 2:
-                res.append(tk)
-                continue
-            stk = self.sortTks_(tkslist)[1][0]
-            if len(stk) == len(tk):
-                stk = tk
-            else:
-                if re.match(r"[a-z\.-]+$", tk):
-                    for t in stk:
-                        if len(t) < 3:
-                            stk = tk
-                            break
-                    else:
-                        stk = " ".join(stk)
+        return " ".join([self.cached_(self.fine_cache, tk, self.fine_grained_token_) for tk in tks])
+
+    def fine_grained_token_(self, tk):
+        if len(tk) < 3 or len(tk) > 10 or re.match(r"[0-9,\.-]+$", tk):
+            return self.english_normalize_([tk])[0]
+        tkslist = self.segment_(tk, topn=2)
+        if len(tkslist) < 2:
+            return self.english_normalize_([tk])[0]
+        stk = tkslist[1][0]
+        if len(stk) == len(tk):
+            stk = tk
+        else:
+            if re.match(r"[a-z\.-]+$", tk):
+                for t in stk:
+                    if len(t) < 3:
+                        stk = tk
+                        break
                 else:
                     stk = " ".join(stk)
+            else:
+                stk = " ".join(stk)
 
-            res.append(stk)
+        return self.english_normalize_([stk])[0]
 
-        return " ".join(self.english_normalize_(res))
+    def tokenize_many(self, texts, fine_grained=True):
+        """
+        (coarse tokens, fine-grained tokens or None if not `fine_grained`) of each text. Texts repeated in the
+        batch are tokenized once, the runs of words and the tokens they share with others, or with earlier calls,
+        are served from the caches.
+        """
+        done = {}
+        for txt in texts:
+            if txt not in done:
+                tks = self.tokenize(txt)
+                done[txt] = (tks, self.fine_grained_tokenize(tks) if fine_grained else None)
+        return [done[txt] for txt in texts]
 
 
 def is_chinese(s):
@@ -467,12 +687,14 @@ def naiveQie(txt):
 tokenizer = RagTokenizer()
 tokenize = tokenizer.tokenize
 fine_grained_tokenize = tokenizer.fine_grained_tokenize
+tokenize_many = tokenizer.tokenize_many
 tag = tokenizer.tag
 freq = tokenizer.freq
 loadUserDict = tokenizer.loadUserDict
 addUserDict = tokenizer.addUserDict
 tradi2simp = tokenizer._tradi2simp
 strQ2B = tokenizer._strQ2B
+normalize = tokenizer.normalize
 
 if __name__ == '__main__':
     tknzr = RagTokenizer(debug=True)
@@ -13,26 +13,100 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 #
+import json
 import logging
 import re
 import math
+import threading
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from itertools import chain, repeat
 
-from rag.settings import TAG_FLD, PAGERANK_FLD
+import xxhash
+from cachetools import TTLCache
+
+from rag.settings import TAG_FLD, PAGERANK_FLD, RERANK_CACHE_TTL, SEARCH_SPECULATIVE_RELAX, \
+    SEARCH_SPECULATIVE_EMPTY_RATE, RETRIEVAL_WINDOW_CACHE_TTL, RETRIEVAL_WINDOW_CACHE_SIZE, RERANK_CASCADE_TOP_N
 from rag.utils import rmSpace, get_float
 from rag.nlp import rag_tokenizer, query
 import numpy as np
-from rag.utils.doc_store_conn import DocStoreConnection, MatchDenseExpr, FusionExpr, OrderByExpr
+from rag.utils.doc_store_conn import DocStoreConnection, MatchDenseExpr, FusionExpr, OrderByExpr, rank_features
+from rag.utils.latency import Spans, span
+from rag.utils.redis_conn import REDIS_CONN
 
 
 def index_name(uid): return f"ragflow_{uid}"
 
 
+def model_name(mdl):
+    if mdl is None:
+        return ""
+    return f"{getattr(mdl, 'tenant_id', '')}/{getattr(mdl, 'llm_name', '') or mdl.__class__.__name__}"
+
+
+def rerank_cache_key(mdlnm, question):
+    hasher = xxhash.xxh64()
+    hasher.update(str(mdlnm).encode("utf-8"))
+    hasher.update(str(question).encode("utf-8"))
+    return "rerank_" + hasher.hexdigest()
+
+
+def rerank_cache_field(chunk_id, txt):
+    return f"{chunk_id}_{xxhash.xxh64(txt.encode('utf-8')).hexdigest()}"
+
+
+def get_rerank_cache(mdlnm, question, fields: list[str]) -> list[float | None]:
+    if RERANK_CACHE_TTL <= 0 or not fields:
+        return [None] * len(fields)
+    return [None if v is None else float(v) for v in REDIS_CONN.hmget(rerank_cache_key(mdlnm, question), fields)]
+
+
+def set_rerank_cache(mdlnm, question, scores: dict[str, float]):
+    if RERANK_CACHE_TTL <= 0 or not scores:
+        return
+    REDIS_CONN.hset(rerank_cache_key(mdlnm, question), scores, RERANK_CACHE_TTL)
+
+
+def retrieval_window_key(*params) -> str:
+    return xxhash.xxh64(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class EmptyHitTracker:
+    """
+    Exponentially decayed rate of zero-hit strict queries per knowledge base.
+    """
+
+    def __init__(self, alpha=0.1, min_samples=5):
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def record(self, kb_ids: list[str], empty: bool):
+        with self.lock:
+            for kb_id in kb_ids:
+                rate, n = self.stats.get(kb_id, (0.0, 0))
+                self.stats[kb_id] = (rate + self.alpha * (float(empty) - rate), n + 1)
+
+    def rate(self, kb_ids: list[str]) -> float:
+        with self.lock:
+            stats = [self.stats[kb_id] for kb_id in kb_ids if kb_id in self.stats]
+        stats = [rate for rate, n in stats if n >= self.min_samples]
+        if not stats:
+            return 0.0
+        return sum(stats) / len(stats)
+
+
 class Dealer:
     def __init__(self, dataStore: DocStoreConnection):
         self.qryr = query.FulltextQueryer()
         self.dataStore = dataStore
+        self.emptyHits = EmptyHitTracker()
+        self.speculateExecutor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="relaxed_search")
+        # Ranked candidate windows of recent retrievals, so that other pages of them skip search and rerank.
+        self.windows = TTLCache(maxsize=RETRIEVAL_WINDOW_CACHE_SIZE, ttl=max(RETRIEVAL_WINDOW_CACHE_TTL, 1))
+        self.windowsLock = threading.Lock()
 
     @dataclass
     class SearchResult:
@@ -45,8 +119,17 @@ class Dealer:
         keywords: list[str] | None = None
         group_docs: list[list] | None = None
 
+    SEARCH_FIELDS = ["docnm_kwd", "content_ltks", "kb_id", "img_id", "title_tks", "important_kwd", "position_int",
+                     "doc_id", "page_num_int", "top_int", "create_timestamp_flt", "knowledge_graph_kwd",
+                     "question_kwd", "question_tks", "doc_type_kwd",
+                     "available_int", "content_with_weight", PAGERANK_FLD, TAG_FLD]
+
     def get_vector(self, txt, emb_mdl, topk=10, similarity=0.1):
         qv, _ = emb_mdl.encode_queries(txt)
+        return self.vector_expr(qv, topk, similarity)
+
+    @staticmethod
+    def vector_expr(qv, topk=10, similarity=0.1):
         shape = np.array(qv).shape
         if len(shape) > 1:
             raise Exception(
@@ -70,8 +153,12 @@ class Dealer:
                kb_ids: list[str],
                emb_mdl=None,
                highlight=False,
-               rank_feature: dict | None = None
+               rank_feature: dict | None = None,
+               exact_total: bool = True
                ):
+        """
+        Without `exact_total`, the doc store stops counting matches past this page and the total is a lower bound.
+        """
         filters = self.get_filters(req)
         orderBy = OrderByExpr()
 
@@ -79,22 +166,21 @@ class Dealer:
         topk = int(req.get("topk", 1024))
         ps = int(req.get("size", topk))
         offset, limit = pg * ps, ps
+        trackTotalHits = True if exact_total else offset + limit
 
-        src = req.get("fields",
-                      ["docnm_kwd", "content_ltks", "kb_id", "img_id", "title_tks", "important_kwd", "position_int",
-                       "doc_id", "page_num_int", "top_int", "create_timestamp_flt", "knowledge_graph_kwd",
-                       "question_kwd", "question_tks", "doc_type_kwd",
-                       "available_int", "content_with_weight", PAGERANK_FLD, TAG_FLD])
-        kwds = set([])
+        src = req.get("fields", list(self.SEARCH_FIELDS))
 
         qst = req.get("question", "")
         q_vec = []
+        keywords = []
         if not qst:
             if req.get("sort"):
                 orderBy.asc("page_num_int")
                 orderBy.asc("top_int")
                 orderBy.desc("create_timestamp_flt")
-            res = self.dataStore.search(src, [], filters, [], orderBy, offset, limit, idx_names, kb_ids)
+            with span("search"):
+                res = self.dataStore.search(src, [], filters, [], orderBy, offset, limit, idx_names, kb_ids,
+                                            trackTotalHits=trackTotalHits)
             total = self.dataStore.getTotal(res)
             logging.debug("Dealer.search TOTAL: {}".format(total))
         else:
@@ -102,47 +188,144 @@ class Dealer:
             matchText, keywords = self.qryr.question(qst, min_match=0.3)
             if emb_mdl is None:
                 matchExprs = [matchText]
-                res = self.dataStore.search(src, highlightFields, filters, matchExprs, orderBy, offset, limit,
-                                            idx_names, kb_ids, rank_feature=rank_feature)
+                with span("search"):
+                    res = self.dataStore.search(src, highlightFields, filters, matchExprs, orderBy, offset, limit,
+                                                idx_names, kb_ids, rank_feature=rank_feature,
+                                                trackTotalHits=trackTotalHits)
                 total = self.dataStore.getTotal(res)
                 logging.debug("Dealer.search TOTAL: {}".format(total))
             else:
-                matchDense = self.get_vector(qst, emb_mdl, topk, req.get("similarity", 0.1))
+                with span("embedding"):
+                    matchDense = self.get_vector(qst, emb_mdl, topk, req.get("similarity", 0.1))
                 q_vec = matchDense.embedding_data
                 src.append(f"q_{len(q_vec)}_vec")
 
                 fusionExpr = FusionExpr("weighted_sum", topk, {"weights": "0.05, 0.95"})
                 matchExprs = [matchText, matchDense, fusionExpr]
 
-                res = self.dataStore.search(src, highlightFields, filters, matchExprs, orderBy, offset, limit,
-                                            idx_names, kb_ids, rank_feature=rank_feature)
+                def relaxed_search(relaxedFilters, relaxedExprs):
+                    # Not timed as a span, the speculative one runs in another thread than the request.
+                    return self.dataStore.search(src, highlightFields, relaxedFilters, relaxedExprs, orderBy, offset,
+                                                 limit, idx_names, kb_ids, rank_feature=rank_feature,
+                                                 trackTotalHits=trackTotalHits)
+
+                def relaxed_args():
+                    return self.relaxed_query(qst, filters, matchDense, fusionExpr)
+
+                # Where strict queries are often empty, don't wait for them before issuing the relaxed one.
+                relaxed = None
+                if SEARCH_SPECULATIVE_RELAX and not filters.get("doc_id") \
+                        and self.emptyHits.rate(kb_ids) >= SEARCH_SPECULATIVE_EMPTY_RATE:
+                    relaxed = self.speculateExecutor.submit(relaxed_search, *relaxed_args())
+
+                with span("search"):
+                    res = self.dataStore.search(src, highlightFields, filters, matchExprs, orderBy, offset, limit,
+                                                idx_names, kb_ids, rank_feature=rank_feature,
+                                                trackTotalHits=trackTotalHits)
                 total = self.dataStore.getTotal(res)
                 logging.debug("Dealer.search TOTAL: {}".format(total))
+                self.emptyHits.record(kb_ids, total == 0)
 
                 # If result is empty, try again with lower min_match
                 if total == 0:
                     if filters.get("doc_id"):
-                        res = self.dataStore.search(src, [], filters, [], orderBy, offset, limit, idx_names, kb_ids)
+                        with span("search"):
+                            res = self.dataStore.search(src, [], filters, [], orderBy, offset, limit, idx_names, kb_ids,
+                                                        trackTotalHits=trackTotalHits)
                         total = self.dataStore.getTotal(res)
                     else:
-                        matchText, _ = self.qryr.question(qst, min_match=0.1)
-                        filters.pop("doc_id", None)
-                        matchDense.extra_options["similarity"] = 0.17
-                        res = self.dataStore.search(src, highlightFields, filters, [matchText, matchDense, fusionExpr],
-                                                    orderBy, offset, limit, idx_names, kb_ids, rank_feature=rank_feature)
+                        with span("relaxed_search"):
+                            res = relaxed.result() if relaxed else relaxed_search(*relaxed_args())
                         total = self.dataStore.getTotal(res)
                         logging.debug("Dealer.search 2 TOTAL: {}".format(total))
-
-            for k in keywords:
-                kwds.add(k)
-                for kk in rag_tokenizer.fine_grained_tokenize(k).split():
-                    if len(kk) < 2:
-                        continue
-                    if kk in kwds:
-                        continue
-                    kwds.add(kk)
+                elif relaxed:
+                    relaxed.cancel()
 
         logging.debug(f"TOTAL: {total}")
+        return self._search_result(res, total, src, q_vec, keywords)
+
+    def batch_search(self, reqs: list[dict], idx_names: str | list[str],
+                     kb_ids: list[str],
+                     q_vecs: list | np.ndarray,
+                     highlight=False,
+                     rank_features: list[dict | None] | None = None,
+                     exact_total: bool = True
+                     ) -> list:
+        """
+        Hybrid search of several questions whose vectors are already encoded.
+        The strict queries go out as one multi-search, then the relaxed fallbacks of the empty ones as another.
+        """
+        highlightFields = ["content_ltks", "title_tks"] if highlight else []
+        if rank_features is None:
+            rank_features = [None] * len(reqs)
+        plans, searches = [], []
+        for req, qv, rank_feature in zip(reqs, q_vecs, rank_features):
+            filters = self.get_filters(req)
+            pg = int(req.get("page", 1)) - 1
+            topk = int(req.get("topk", 1024))
+            ps = int(req.get("size", topk))
+            src = list(req.get("fields", self.SEARCH_FIELDS))
+            qst = req["question"]
+
+            matchText, keywords = self.qryr.question(qst, min_match=0.3)
+            matchDense = self.vector_expr(qv, topk, req.get("similarity", 0.1))
+            src.append(f"q_{len(matchDense.embedding_data)}_vec")
+            fusionExpr = FusionExpr("weighted_sum", topk, {"weights": "0.05, 0.95"})
+            search = {"selectFields": src, "highlightFields": highlightFields, "condition": filters,
+                      "matchExprs": [matchText, matchDense, fusionExpr], "orderBy": OrderByExpr(),
+                      "offset": pg * ps, "limit": ps, "indexNames": idx_names, "knowledgebaseIds": kb_ids,
+                      "rank_feature": rank_feature, "trackTotalHits": True if exact_total else (pg + 1) * ps}
+            plans.append((qst, search, keywords))
+            searches.append(search)
+
+        with span("search"):
+            results = self.dataStore.multiSearch(searches)
+        totals = [self.dataStore.getTotal(res) for res in results]
+        for total in totals:
+            self.emptyHits.record(kb_ids, total == 0)
+
+        # If result is empty, try again with lower min_match
+        empty = [i for i, total in enumerate(totals) if total == 0]
+        relaxed = []
+        for i in empty:
+            qst, search, _ = plans[i]
+            filters = search["condition"]
+            if filters.get("doc_id"):
+                relaxed.append({**search, "highlightFields": [], "matchExprs": [], "rank_feature": None})
+                continue
+            _, matchDense, fusionExpr = search["matchExprs"]
+            relaxedFilters, relaxedExprs = self.relaxed_query(qst, filters, matchDense, fusionExpr)
+            relaxed.append({**search, "condition": relaxedFilters, "matchExprs": relaxedExprs})
+        with span("relaxed_search"):
+            relaxedResults = self.dataStore.multiSearch(relaxed)
+        for i, res in zip(empty, relaxedResults):
+            results[i] = res
+            totals[i] = self.dataStore.getTotal(res)
+            logging.debug("Dealer.batch_search 2 TOTAL: {}".format(totals[i]))
+
+        return [self._search_result(res, total, search["selectFields"], search["matchExprs"][1].embedding_data, keywords)
+                for res, total, (_, search, keywords) in zip(results, totals, plans)]
+
+    def relaxed_query(self, qst, filters, matchDense, fusionExpr):
+        # Connectors annotate the filters and match expressions in place, so the relaxed query gets its own.
+        relaxedText, _ = self.qryr.question(qst, min_match=0.1)
+        relaxedDense = MatchDenseExpr(matchDense.vector_column_name, matchDense.embedding_data,
+                                      matchDense.embedding_data_type, matchDense.distance_type,
+                                      matchDense.topn, {**matchDense.extra_options, "similarity": 0.17})
+        relaxedFilters = {k: v for k, v in filters.items() if k != "doc_id"}
+        return relaxedFilters, [relaxedText, relaxedDense, fusionExpr]
+
+    def _search_result(self, res, total, src, q_vec, keywords):
+        kwds = set([])
+        for k in keywords:
+            kwds.add(k)
+            for kk in rag_tokenizer.fine_grained_tokenize(k).split():
+                if len(kk) < 2:
+                    continue
+                if kk in kwds:
+                    continue
+                kwds.add(kk)
+
         ids = self.dataStore.getChunkIds(res)
         keywords = list(kwds)
         highlight = self.dataStore.getHighlight(res, keywords, "content_with_weight")
@@ -214,23 +397,8 @@ class Dealer:
 
         chunks_tks = [rag_tokenizer.tokenize(self.qryr.rmWWW(ck)).split()
                       for ck in chunks]
-        cites = {}
-        thr = 0.63
-        while thr > 0.3 and len(cites.keys()) == 0 and pieces_ and chunks_tks:
-            for i, a in enumerate(pieces_):
-                sim, tksim, vtsim = self.qryr.hybrid_similarity(ans_v[i],
-                                                                chunk_v,
-                                                                rag_tokenizer.tokenize(
-                                                                    self.qryr.rmWWW(pieces_[i])).split(),
-                                                                chunks_tks,
-                                                                tkweight, vtweight)
-                mx = np.max(sim) * 0.99
-                logging.debug("{} SIM: {}".format(pieces_[i], mx))
-                if mx < thr:
-                    continue
-                cites[idx[i]] = list(
-                    set([str(ii) for ii in range(len(chunk_v)) if sim[ii] > mx]))[:4]
-            thr *= 0.8
+        cites = {idx[i]: c for i, c in self.citation_candidates(pieces_, ans_v, chunks_tks, chunk_v,
+                                                               tkweight, vtweight).items()}
 
         res = ""
         seted = set([])
@@ -250,32 +418,46 @@ class Dealer:
 
         return res, seted
 
+    def citation_candidates(self, pieces, ans_v, chunks_tks, chunk_v, tkweight=0.1, vtweight=0.9):
+        """
+        Chunks to cite per answer piece. Every piece is scored against every chunk once,
+        the descending thresholds only pick from that matrix.
+        """
+        if not pieces or not chunks_tks:
+            return {}
+        pieces_tks = [rag_tokenizer.tokenize(self.qryr.rmWWW(p)).split() for p in pieces]
+        sim, _, _ = self.qryr.hybrid_similarity_matrix(ans_v, chunk_v, pieces_tks, chunks_tks, tkweight, vtweight)
+        mx = np.max(sim, axis=1) * 0.99
+        logging.debug("{} SIM: {}".format(pieces, mx))
+        cites = {}
+        thr = 0.63
+        while thr > 0.3 and len(cites.keys()) == 0:
+            for i in np.flatnonzero(mx >= thr):
+                cites[int(i)] = list(
+                    set([str(ii) for ii in np.flatnonzero(sim[i] > mx[i])]))[:4]
+            thr *= 0.8
+        return cites
+
     def _rank_feature_scores(self, query_rfea, search_res):
         ## For rank feature(tag_fea) scores.
-        rank_fea = []
-        pageranks = []
-        for chunk_id in search_res.ids:
-            pageranks.append(search_res.field[chunk_id].get(PAGERANK_FLD, 0))
-        pageranks = np.array(pageranks, dtype=float)
-
+        n = len(search_res.ids)
+        pageranks = np.array([search_res.field[chunk_id].get(PAGERANK_FLD) or 0 for chunk_id in search_res.ids], dtype=float)
         if not query_rfea:
-            return np.array([0 for _ in range(len(search_res.ids))]) + pageranks
-
-        q_denor = np.sqrt(np.sum([s*s for t,s in query_rfea.items() if t != PAGERANK_FLD]))
-        for i in search_res.ids:
-            nor, denor = 0, 0
-            if not search_res.field[i].get(TAG_FLD):
-                rank_fea.append(0)
-                continue
-            for t, sc in eval(search_res.field[i].get(TAG_FLD, "{}")).items():
-                if t in query_rfea:
-                    nor += query_rfea[t] * sc
-                denor += sc * sc
-            if denor == 0:
-                rank_fea.append(0)
-            else:
-                rank_fea.append(nor/np.sqrt(denor)/q_denor)
-        return np.array(rank_fea)*10. + pageranks
+            return pageranks
+
+        q_denor = np.sqrt(np.sum([s*s for t, s in query_rfea.items() if t != PAGERANK_FLD]))
+        # Flatten the tags of all candidates into parallel arrays, then reduce them per candidate.
+        feas = [search_res.field[chunk_id].get(TAG_FLD) for chunk_id in search_res.ids]
+        feas = [f if isinstance(f, dict) else rank_features(f) for f in feas]
+        lens = np.fromiter((len(f) for f in feas), dtype=np.int64, count=n)
+        total = int(lens.sum())
+        rows = np.repeat(np.arange(n), lens)
+        scs = np.fromiter(chain.from_iterable(f.values() for f in feas), dtype=float, count=total)
+        qws = np.fromiter(map(query_rfea.get, chain.from_iterable(feas), repeat(0)), dtype=float, count=total)
+        nor = np.bincount(rows, weights=qws * scs, minlength=n)
+        denor = np.sqrt(np.bincount(rows, weights=scs * scs, minlength=n)) * q_denor
+        rank_fea = np.divide(nor, denor, out=np.zeros(n), where=denor > 0)
+        return rank_fea*10. + pageranks
 
     def rerank(self, sres, query, tkweight=0.3,
                vtweight=0.7, cfield="content_ltks",
@@ -316,6 +498,25 @@ class Dealer:
 
         return sim + rank_fea, tksim, vtsim
 
+    def _rerank_model_similarity(self, rerank_mdl, query, chunk_ids, texts):
+        """
+        Scores are cached per (model, query, chunk id, text hash), only misses are sent to the rerank model.
+        Models min-max normalizing the scores of every call are always sent the whole list, uncached.
+        """
+        if texts and getattr(getattr(rerank_mdl, "mdl", rerank_mdl), "normalizes_per_call", False):
+            sim, _ = rerank_mdl.similarity(query, texts)
+            return np.array(sim, dtype=float)
+        mdlnm = model_name(rerank_mdl)
+        fields = [rerank_cache_field(cid, txt) for cid, txt in zip(chunk_ids, texts)]
+        scores = get_rerank_cache(mdlnm, query, fields)
+        missed = [i for i, sc in enumerate(scores) if sc is None]
+        if missed:
+            sim, _ = rerank_mdl.similarity(query, [texts[i] for i in missed])
+            for i, sc in zip(missed, sim):
+                scores[i] = float(sc)
+            set_rerank_cache(mdlnm, query, {fields[i]: scores[i] for i in missed})
+        return np.array(scores, dtype=float)
+
     def rerank_by_model(self, rerank_mdl, sres, query, tkweight=0.3,
                         vtweight=0.7, cfield="content_ltks",
                         rank_feature: dict | None = None):
@@ -333,12 +534,29 @@ class Dealer:
             ins_tw.append(tks)
 
         tksim = self.qryr.token_similarity(keywords, ins_tw)
-        vtsim, _ = rerank_mdl.similarity(query, [rmSpace(" ".join(tks)) for tks in ins_tw])
+        vtsim = self._rerank_model_similarity(rerank_mdl, query, sres.ids, [rmSpace(" ".join(tks)) for tks in ins_tw])
         ## For rank feature(tag_fea) scores.
         rank_fea = self._rank_feature_scores(rank_feature, sres)
 
         return tkweight * (np.array(tksim)+rank_fea) + vtweight * vtsim, tksim, vtsim
 
+    def cascade_rerank(self, rerank_mdl, sres, query, top_n: int, tkweight=0.3,
+                       vtweight=0.7, rank_feature: dict | None = None):
+        """
+        Scores all candidates with `rerank`, then only the `top_n` best of them with `rerank_by_model`.
+        Returns the scores and the ranking: the shortlist by model scores, then the rest by first stage scores.
+        """
+        sim, tsim, vsim = self.rerank(sres, query, tkweight, vtweight, rank_feature=rank_feature)
+        sim, tsim, vsim = np.array(sim, dtype=float), np.array(tsim, dtype=float), np.array(vsim, dtype=float)
+        order = np.argsort(sim * -1, kind="stable")
+        head, tail = order[:top_n], order[top_n:]
+        shortlist = self.SearchResult(total=len(head), ids=[sres.ids[i] for i in head],
+                                      query_vector=sres.query_vector, field=sres.field, highlight=sres.highlight,
+                                      keywords=sres.keywords)
+        sim[head], tsim[head], vsim[head] = self.rerank_by_model(rerank_mdl, shortlist, query, tkweight, vtweight,
+                                                                 rank_feature=rank_feature)
+        return sim, tsim, vsim, np.concatenate([head[np.argsort(sim[head] * -1, kind="stable")], tail])
+
     def hybrid_similarity(self, ans_embd, ins_embd, ans, inst):
         return self.qryr.hybrid_similarity(ans_embd,
                                            ins_embd,
@@ -348,67 +566,157 @@ class Dealer:
     def retrieval(self, question, embd_mdl, tenant_ids, kb_ids, page, page_size, similarity_threshold=0.2,
                   vector_similarity_weight=0.3, top=1024, doc_ids=None, aggs=True,
                   rerank_mdl=None, highlight=False,
-                  rank_feature: dict | None = {PAGERANK_FLD: 10}):
+                  rank_feature: dict | None = {PAGERANK_FLD: 10}, rerank_top_n: int | None = None):
         ranks = {"total": 0, "chunks": [], "doc_aggs": {}}
         if not question:
             return ranks
 
-        RERANK_LIMIT = 64
-        RERANK_LIMIT = int(RERANK_LIMIT//page_size + ((RERANK_LIMIT%page_size)/(page_size*1.) + 0.5)) * page_size if page_size>1 else 1
-        if RERANK_LIMIT < 1: ## when page_size is very large the RERANK_LIMIT will be 0.
-            RERANK_LIMIT = 1
-        req = {"kb_ids": kb_ids, "doc_ids": doc_ids, "page": math.ceil(page_size*page/RERANK_LIMIT), "size": RERANK_LIMIT,
-               "question": question, "vector": True, "topk": top,
-               "similarity": similarity_threshold,
-               "available_int": 1}
+        req = self.retrieval_req(question, kb_ids, page, page_size, similarity_threshold, top, doc_ids)
+
+        if isinstance(tenant_ids, str):
+            tenant_ids = tenant_ids.split(",")
 
+        # Pages of one window share the search and rerank, `req` tells which window a page falls in.
+        key = retrieval_window_key(question, model_name(embd_mdl), sorted(tenant_ids), sorted(kb_ids), doc_ids,
+                                   req["page"], req["size"], similarity_threshold, vector_similarity_weight, top,
+                                   model_name(rerank_mdl), highlight, rank_feature, rerank_top_n)
+        with Spans("retrieval") as spans:
+            window = self.get_window(key)
+            if window is None:
+                # The total reported is that of ranked chunks, the doc store's only tells if anything matched.
+                sres = self.search(req, [index_name(tid) for tid in tenant_ids],
+                                   kb_ids, embd_mdl, highlight, rank_feature=rank_feature, exact_total=False)
+                with spans.span("rerank"):
+                    window = self.rank_window(sres, question, similarity_threshold, vector_similarity_weight,
+                                              doc_ids, rerank_mdl, highlight, rank_feature, rerank_top_n)
+                self.set_window(key, kb_ids, doc_ids, window)
+            else:
+                spans.add("window_cache_hit", 0.)
+
+            return self.window_page(window, page, page_size, doc_ids, key)
+
+    def retrieval_by_cursor(self, cursor: str, kb_ids: list[str]) -> dict | None:
+        """
+        The page a `next_cursor` of `retrieval` points to, None once its window expired or isn't for `kb_ids`.
+        """
+        key, _, page = cursor.partition(".")
+        try:
+            page, page_size = [int(v) for v in page.split(".")]
+        except ValueError:
+            return None
+        window = self.get_window(key)
+        if window is None or window["kb_ids"] != sorted(kb_ids) or page < 1 or page_size < 1:
+            return None
+        return self.window_page(window, page, page_size, window["doc_ids"], key)
+
+    def get_window(self, key: str) -> dict | None:
+        if RETRIEVAL_WINDOW_CACHE_TTL <= 0:
+            return None
+        with self.windowsLock:
+            return self.windows.get(key)
+
+    def set_window(self, key: str, kb_ids: list[str], doc_ids, window: dict):
+        if RETRIEVAL_WINDOW_CACHE_TTL <= 0:
+            return
+        with self.windowsLock:
+            self.windows[key] = {**window, "kb_ids": sorted(kb_ids), "doc_ids": doc_ids}
+
+    def batch_retrieval(self, questions: list[str], embd_mdl, tenant_ids, kb_ids, page, page_size,
+                        similarity_threshold=0.2, vector_similarity_weight=0.3, top=1024, doc_ids=None, aggs=True,
+                        rerank_mdl=None, highlight=False,
+                        rank_feature: dict | list[dict | None] | None = {PAGERANK_FLD: 10},
+                        rerank_top_n: int | None = None) -> list[dict]:
+        """
+        `retrieval` for several questions at once: one batched query encoding and one multi-search,
+        then each question is reranked on its own candidates. `rank_feature` may be given per question.
+        """
+        rank_features = rank_feature if isinstance(rank_feature, list) else [rank_feature] * len(questions)
+        results = [{"total": 0, "chunks": [], "doc_aggs": {}} for _ in questions]
+        todo = [i for i, question in enumerate(questions) if question]
+        if not todo:
+            return results
 
         if isinstance(tenant_ids, str):
             tenant_ids = tenant_ids.split(",")
 
-        sres = self.search(req, [index_name(tid) for tid in tenant_ids],
-                           kb_ids, embd_mdl, highlight, rank_feature=rank_feature)
+        with Spans("batch_retrieval") as spans:
+            with spans.span("embedding"):
+                q_vecs, _ = embd_mdl.encode_queries_batch([questions[i] for i in todo])
+            reqs = [self.retrieval_req(questions[i], kb_ids, page, page_size, similarity_threshold, top, doc_ids)
+                    for i in todo]
+            sress = self.batch_search(reqs, [index_name(tid) for tid in tenant_ids], kb_ids, q_vecs, highlight,
+                                      rank_features=[rank_features[i] for i in todo], exact_total=False)
+            with spans.span("rerank"):
+                for i, sres in zip(todo, sress):
+                    results[i] = self.rank_retrieval(sres, questions[i], page, page_size, similarity_threshold,
+                                                     vector_similarity_weight, doc_ids, aggs, rerank_mdl, highlight,
+                                                     rank_features[i], rerank_top_n)
+        return results
 
-        if rerank_mdl and sres.total > 0:
-            sim, tsim, vsim = self.rerank_by_model(rerank_mdl,
-                                                   sres, question, 1 - vector_similarity_weight,
-                                                   vector_similarity_weight,
-                                                   rank_feature=rank_feature)
+    @staticmethod
+    def retrieval_req(question, kb_ids, page, page_size, similarity_threshold, top, doc_ids=None):
+        RERANK_LIMIT = 64
+        RERANK_LIMIT = int(RERANK_LIMIT//page_size + ((RERANK_LIMIT%page_size)/(page_size*1.) + 0.5)) * page_size if page_size>1 else 1
+        if RERANK_LIMIT < 1: ## when page_size is very large the RERANK_LIMIT will be 0.
+            RERANK_LIMIT = 1
+        return {"kb_ids": kb_ids, "doc_ids": doc_ids, "page": math.ceil(page_size*page/RERANK_LIMIT), "size": RERANK_LIMIT,
+                "question": question, "vector": True, "topk": top,
+                "similarity": similarity_threshold,
+                "available_int": 1}
+
+    def rank_retrieval(self, sres, question, page, page_size, similarity_threshold=0.2,
+                       vector_similarity_weight=0.3, doc_ids=None, aggs=True, rerank_mdl=None, highlight=False,
+                       rank_feature: dict | None = {PAGERANK_FLD: 10}, rerank_top_n: int | None = None):
+        window = self.rank_window(sres, question, similarity_threshold, vector_similarity_weight, doc_ids,
+                                  rerank_mdl, highlight, rank_feature, rerank_top_n)
+        return self.window_page(window, page, page_size, doc_ids)
+
+    def rank_window(self, sres, question, similarity_threshold=0.2, vector_similarity_weight=0.3, doc_ids=None,
+                    rerank_mdl=None, highlight=False, rank_feature: dict | None = {PAGERANK_FLD: 10},
+                    rerank_top_n: int | None = None) -> dict:
+        """
+        Reranks the searched candidates and returns those above the threshold, best first, with their total.
+        With `rerank_top_n` (RERANK_CASCADE_TOP_N if None) above 0, only that many go to the rerank model: the
+        threshold and the total then hold model scores for those and first stage scores for the others.
+        """
+        window = {"total": 0, "chunks": []}
+        top_n = RERANK_CASCADE_TOP_N if rerank_top_n is None else rerank_top_n
+        if rerank_mdl and sres.total > 0 and 0 < top_n < len(sres.ids):
+            sim, tsim, vsim, idx = self.cascade_rerank(rerank_mdl, sres, question, top_n,
+                                                       1 - vector_similarity_weight, vector_similarity_weight,
+                                                       rank_feature=rank_feature)
         else:
-            sim, tsim, vsim = self.rerank(
-                sres, question, 1 - vector_similarity_weight, vector_similarity_weight,
-                rank_feature=rank_feature)
-        # Already paginated in search function
-        idx = np.argsort(sim * -1)[(page - 1) * page_size:page * page_size]
-
+            if rerank_mdl and sres.total > 0:
+                sim, tsim, vsim = self.rerank_by_model(rerank_mdl,
+                                                       sres, question, 1 - vector_similarity_weight,
+                                                       vector_similarity_weight,
+                                                       rank_feature=rank_feature)
+            else:
+                sim, tsim, vsim = self.rerank(
+                    sres, question, 1 - vector_similarity_weight, vector_similarity_weight,
+                    rank_feature=rank_feature)
+            idx = np.argsort(sim * -1)
 
         dim = len(sres.query_vector)
         vector_column = f"q_{dim}_vec"
         zero_vector = [0.0] * dim
         if doc_ids:
             similarity_threshold = 0
-            page_size = 30
         sim_np = np.array(sim)
         filtered_count = (sim_np >= similarity_threshold).sum()    
-        ranks["total"] = int(filtered_count) # Convert from np.int64 to Python int otherwise JSON serializable error
+        window["total"] = int(filtered_count) # Convert from np.int64 to Python int otherwise JSON serializable error
         for i in idx:
             if sim[i] < similarity_threshold:
-                break
-            if len(ranks["chunks"]) >= page_size:
-                if aggs:
-                    continue
-                break
+                # Only a cascade ranks a score below the threshold ahead of one above it.
+                continue
             id = sres.ids[i]
             chunk = sres.field[id]
-            dnm = chunk.get("docnm_kwd", "")
-            did = chunk.get("doc_id", "")
-            position_int = chunk.get("position_int", [])
             d = {
                 "chunk_id": id,
                 "content_ltks": chunk["content_ltks"],
                 "content_with_weight": chunk["content_with_weight"],
-                "doc_id": did,
-                "docnm_kwd": dnm,
+                "doc_id": chunk.get("doc_id", ""),
+                "docnm_kwd": chunk.get("docnm_kwd", ""),
                 "kb_id": chunk["kb_id"],
                 "important_kwd": chunk.get("important_kwd", []),
                 "image_id": chunk.get("img_id", ""),
@@ -416,7 +724,7 @@ class Dealer:
                 "vector_similarity": vsim[i],
                 "term_similarity": tsim[i],
                 "vector": chunk.get(vector_column, zero_vector),
-                "positions": position_int,
+                "positions": chunk.get("position_int", []),
                 "doc_type_kwd": chunk.get("doc_type_kwd", "")
             }
             if highlight and sres.highlight:
@@ -424,17 +732,33 @@ class Dealer:
                     d["highlight"] = rmSpace(sres.highlight[id])
                 else:
                     d["highlight"] = d["content_with_weight"]
+            window["chunks"].append(d)
+        return window
+
+    @staticmethod
+    def window_page(window: dict, page, page_size, doc_ids=None, key: str | None = None) -> dict:
+        """
+        Page `page` of a ranked window, with a `next_cursor` while the window holds more chunks.
+        """
+        ranks = {"total": window["total"], "chunks": [], "doc_aggs": {}}
+        chunks = window["chunks"][(page - 1) * page_size:page * page_size]
+        if doc_ids:
+            chunks = chunks[:30]
+        for ck in chunks:
+            # Callers own the chunks of a page, the cached window's vectors are not handed out.
+            d = {**ck, "vector": list(ck["vector"]) if isinstance(ck["vector"], list) else ck["vector"]}
             ranks["chunks"].append(d)
+            dnm = d["docnm_kwd"]
             if dnm not in ranks["doc_aggs"]:
-                ranks["doc_aggs"][dnm] = {"doc_id": did, "count": 0}
+                ranks["doc_aggs"][dnm] = {"doc_id": d["doc_id"], "count": 0}
             ranks["doc_aggs"][dnm]["count"] += 1
         ranks["doc_aggs"] = [{"doc_name": k,
                               "doc_id": v["doc_id"],
                               "count": v["count"]} for k,
                                                        v in sorted(ranks["doc_aggs"].items(),
                                                                    key=lambda x: x[1]["count"] * -1)]
-        ranks["chunks"] = ranks["chunks"][:page_size]
-
+        if key and RETRIEVAL_WINDOW_CACHE_TTL > 0 and len(window["chunks"]) > page * page_size:
+            ranks["next_cursor"] = f"{key}.{page + 1}.{page_size}"
         return ranks
 
     def sql_retrieval(self, sql, fetch_size=128, format="json"):
@@ -445,19 +769,22 @@ class Dealer:
                    kb_ids: list[str], max_count=1024,
                    offset=0,
                    fields=["docnm_kwd", "content_with_weight", "img_id"]):
-        condition = {"doc_id": doc_id}
-        res = []
-        bs = 128
-        for p in range(offset, max_count, bs):
-            es_res = self.dataStore.search(fields, [], condition, [], OrderByExpr(), p, bs, index_name(tenant_id),
-                                           kb_ids)
-            dict_chunks = self.dataStore.getFields(es_res, fields)
+        # Rows `offset` to `max_count` of the document, read with the engine's scan instead of deeper and
+        # deeper pages.
+        res, skip = [], offset
+        if max_count <= offset:
+            return res
+        for batch in self.dataStore.scan(fields, {"doc_id": doc_id}, index_name(tenant_id), kb_ids,
+                                         batchSize=min(max_count - offset, 1024)):
+            dict_chunks = self.dataStore.getFields(batch, fields)
             for id, doc in dict_chunks.items():
+                if skip > 0:
+                    skip -= 1
+                    continue
                 doc["id"] = id
-            if dict_chunks:
-                res.extend(dict_chunks.values())
-            if len(dict_chunks.values()) < bs:
-                break
+                res.append(doc)
+                if len(res) >= max_count - offset:
+                    return res
         return res
 
     def all_tags(self, tenant_id: str, kb_ids: list[str], S=1000):
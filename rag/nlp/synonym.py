@@ -14,27 +14,91 @@
 #  limitations under the License.
 #
 
+import argparse
 import logging
 import json
 import os
 import time
 import re
+import threading
+from cachetools import LRUCache
 from nltk.corpus import wordnet
 from api.utils.file_utils import get_project_base_directory
 
+# The custom dictionary in Redis, its version, and the channel its new versions are announced on.
+REDIS_DICTIONARY_KEY = "kevin_synonyms"
+REDIS_VERSION_KEY = "kevin_synonyms_version"
+REDIS_CHANNEL = "kevin_synonyms_updates"
+RESUBSCRIBE_DELAY = 5
+
+
+def wordnet_synonyms(tk):
+    res = dict.fromkeys(re.sub("_", " ", syn.name().split(".")[0]) for syn in wordnet.synsets(tk))
+    return [t for t in res if t and t != tk]
+
+
+def compile_custom(dictionary):
+    """
+    The custom dictionary with its keys normalized as they are looked up and its values as lists.
+    """
+    res = {}
+    for k, v in dictionary.items():
+        res[re.sub(r"[ \t]+", " ", k.lower())] = [v] if isinstance(v, str) else list(v)
+    return res
+
+
+def compile_table(path, vocab=None):
+    """
+    Writes the WordNet synonyms of every single English word of WordNet, and of the words of `vocab`, along
+    with the custom dictionary, to `path`. Other words, inflected forms among them, are looked up in WordNet.
+    """
+    words = {w for w in wordnet.all_lemma_names() if re.match(r"[a-z]+$", w)}
+    words.update(w for w in vocab or [] if re.match(r"[a-z]+$", w))
+    table = {"wordnet": {}, "custom": {}}
+    for w in sorted(words):
+        syns = wordnet_synonyms(w)
+        if syns:
+            table["wordnet"][w] = syns
+    try:
+        custom = os.path.join(get_project_base_directory(), "rag/res", "synonym.json")
+        table["custom"] = compile_custom(json.load(open(custom, 'r')))
+    except Exception:
+        logging.warning("Missing synonym.json")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(table, f, ensure_ascii=False)
+    os.replace(tmp, path)
+    return table
+
 
 class Dealer:
     def __init__(self, redis=None):
 
-        self.lookup_num = 100000000
-        self.load_tm = time.time() - 1000000
         self.dictionary = None
-        path = os.path.join(get_project_base_directory(), "rag/res", "synonym.json")
+        # English words and their WordNet synonyms, None to look them up in WordNet.
+        self.wordnet = None
+        # Bumped whenever the dictionary is reloaded so callers can drop results derived from it.
+        self.version = 0
+        # Version of the dictionary last loaded from Redis.
+        self.redis_version = 0
+        self.cache = LRUCache(maxsize=65536)
+        self.cache_lock = threading.Lock()
+        res = os.path.join(get_project_base_directory(), "rag/res")
+        path, table_path = os.path.join(res, "synonym.json"), os.path.join(res, "synonym_table.json")
         try:
-            self.dictionary = json.load(open(path, 'r'))
+            table = json.load(open(table_path, 'r'))
+            self.wordnet = table["wordnet"]
+            self.dictionary = table["custom"]
         except Exception:
-            logging.warning("Missing synonym.json")
-            self.dictionary = {}
+            logging.warning("Missing synonym_table.json, WordNet is looked up at query time. "
+                            "Compile it with `python -m rag.nlp.synonym`.")
+        if self.dictionary is None or (os.path.exists(path) and os.path.exists(table_path) and
+                                       os.path.getmtime(path) > os.path.getmtime(table_path)):
+            try:
+                self.dictionary = compile_custom(json.load(open(path, 'r')))
+            except Exception:
+                logging.warning("Missing synonym.json")
+                self.dictionary = self.dictionary or {}
 
         if not redis:
             logging.warning(
@@ -43,42 +107,84 @@ class Dealer:
             logging.warning("Fail to load synonym")
 
         self.redis = redis
-        self.load()
+        if redis:
+            threading.Thread(target=self.listen_, name="synonym_listener", daemon=True).start()
 
     def load(self):
+        """
+        Loads the custom dictionary from Redis.
+        """
         if not self.redis:
             return
-
-        if self.lookup_num < 100:
-            return
-        tm = time.time()
-        if tm - self.load_tm < 3600:
-            return
-
-        self.load_tm = time.time()
-        self.lookup_num = 0
-        d = self.redis.get("kevin_synonyms")
+        version = int(self.redis.get(REDIS_VERSION_KEY) or 0)
+        d = self.redis.get(REDIS_DICTIONARY_KEY)
         if not d:
             return
         try:
-            d = json.loads(d)
-            self.dictionary = d
+            d = compile_custom(json.loads(d))
+            with self.cache_lock:
+                self.dictionary = d
+                self.redis_version = version
+                self.cache.clear()
+                self.version += 1
+            logging.info(f"Synonym dictionary version {version} is loaded")
         except Exception as e:
             logging.error("Fail to load synonym!" + str(e))
 
+    def listen_(self):
+        while True:
+            try:
+                pubsub = self.redis.pubsub()
+                pubsub.subscribe(REDIS_CHANNEL)
+                # Versions published while not subscribed are caught up with.
+                self.load()
+                for msg in pubsub.listen():
+                    if msg["type"] == "message" and int(msg["data"]) > self.redis_version:
+                        self.load()
+            except Exception:
+                logging.exception("Synonym listener lost its Redis connection")
+            time.sleep(RESUBSCRIBE_DELAY)
+
+    @staticmethod
+    def publish(redis, dictionary):
+        """
+        Stores the custom dictionary in Redis and announces its version to the Dealers listening.
+        """
+        redis.set(REDIS_DICTIONARY_KEY, json.dumps(dictionary, ensure_ascii=False), None)
+        version = redis.incr(REDIS_VERSION_KEY)
+        redis.publish(REDIS_CHANNEL, version)
+        return version
+
     def lookup(self, tk, topn=8):
+        with self.cache_lock:
+            res = self.cache.get((tk, topn))
+            version = self.version
+        if res is None:
+            res = self._lookup(tk, topn)
+            with self.cache_lock:
+                if version == self.version:
+                    self.cache[(tk, topn)] = res
+        return list(res)
+
+    def _lookup(self, tk, topn):
         if re.match(r"[a-z]+$", tk):
-            res = list(set([re.sub("_", " ", syn.name().split(".")[0]) for syn in wordnet.synsets(tk)]) - set([tk]))
-            return [t for t in res if t]
+            # The table is keyed by lemmas, WordNet also resolves inflected forms such as "went".
+            if self.wordnet is not None and tk in self.wordnet:
+                return self.wordnet[tk]
+            return wordnet_synonyms(tk)
 
-        self.lookup_num += 1
-        self.load()
-        res = self.dictionary.get(re.sub(r"[ \t]+", " ", tk.lower()), [])
-        if isinstance(res, str):
-            res = [res]
-        return res[:topn]
+        return self.dictionary.get(re.sub(r"[ \t]+", " ", tk.lower()), [])[:topn]
 
 
 if __name__ == '__main__':
-    dl = Dealer()
-    print(dl.dictionary)
+    parser = argparse.ArgumentParser(description="Compiles rag/res/synonym_table.json")
+    parser.add_argument("--output", default=os.path.join(get_project_base_directory(), "rag/res", "synonym_table.json"))
+    parser.add_argument("--vocab", default="", help="file of English words to add, one per line")
+    args = parser.parse_args()
+    vocab = []
+    if args.vocab:
+        with open(args.vocab, encoding="utf-8") as f:
+            vocab = [line.strip().lower() for line in f]
+    st = time.time()
+    table = compile_table(args.output, vocab)
+    print(f"{len(table['wordnet'])} English words, {len(table['custom'])} custom entries in {time.time() - st:.1f}s")
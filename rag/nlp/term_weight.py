@@ -19,12 +19,16 @@ import math
 import json
 import re
 import os
+import threading
 import numpy as np
 from rag.nlp import rag_tokenizer
 from api.utils.file_utils import get_project_base_directory
 
 
 class Dealer:
+    # Tokens of the packed weights, which start over past it.
+    VOCAB_SIZE = 262144
+
     def __init__(self):
         self.stop_words = set(["请问",
                                "您",
@@ -89,6 +93,13 @@ class Dealer:
         except Exception:
             logging.warning("Load term.freq FAIL!")
 
+        # Ids of the tokens weighted so far and their unnormalized weights. They depend on the dictionaries
+        # above and on the tokenizer dictionary, and are dropped when the tokenizer's version changes.
+        self.token_ids = {}
+        self.token_weights = np.empty(1024)
+        self.token_version = rag_tokenizer.tokenizer.version
+        self.token_lock = threading.Lock()
+
     def pretoken(self, txt, num=False, stpwd=True):
         patt = [
             r"[~—\t @#%!<>,\.\?\":;'\{\}\[\]_=\(\)\|，。？》•●○↓《；‘’：“”【¥ 】…￥！、·（）×`&\\/「」\\]"
@@ -159,7 +170,10 @@ class Dealer:
                 tks.append(t)
         return tks
 
-    def weights(self, tks, preprocess=True):
+    def weight_(self, t):
+        """
+        Unnormalized weight of the token `t`.
+        """
         def skill(t):
             if t not in self.sk:
                 return 1
@@ -222,23 +236,60 @@ class Dealer:
 
         def idf(s, N): return math.log10(10 + ((N - s + 0.5) / (s + 0.5)))
 
-        tw = []
-        if not preprocess:
-            idf1 = np.array([idf(freq(t), 10000000) for t in tks])
-            idf2 = np.array([idf(df(t), 1000000000) for t in tks])
-            wts = (0.3 * idf1 + 0.7 * idf2) * \
-                np.array([ner(t) * postag(t) for t in tks])
-            wts = [s for s in wts]
-            tw = list(zip(tks, wts))
+        return (0.3 * idf(freq(t), 10000000) + 0.7 * idf(df(t), 1000000000)) * (ner(t) * postag(t))
+
+    def sync_(self):
+        # Called with token_lock held.
+        if self.token_version != rag_tokenizer.tokenizer.version:
+            self.token_version = rag_tokenizer.tokenizer.version
+            self.token_ids, self.token_weights = {}, np.empty(1024)
+
+    def token_weights_(self, tks):
+        """
+        Unnormalized weights of the tokens `tks` as an array. Tokens are weighted once and given an id, the
+        weights of ids are packed in one array.
+        """
+        with self.token_lock:
+            self.sync_()
+            missing = [t for t in dict.fromkeys(tks) if t not in self.token_ids]
+            if not missing:
+                return self.token_weights[[self.token_ids[t] for t in tks]]
+            version = self.token_version
+        wts = {t: self.weight_(t) for t in missing}
+        with self.token_lock:
+            self.sync_()
+            if version != self.token_version:
+                wts = {}
+            # Another thread may have started over since, so the tokens absent now are looked up again.
+            uniq = list(dict.fromkeys(tks))
+            absent = [t for t in uniq if t not in self.token_ids]
+            if len(self.token_ids) + len(absent) > self.VOCAB_SIZE:
+                wts.update((t, self.token_weights[self.token_ids[t]]) for t in uniq if t in self.token_ids)
+                self.token_ids, self.token_weights = {}, np.empty(max(1024, len(uniq)))
+                absent = uniq
+            for t in absent:
+                i = len(self.token_ids)
+                if i == len(self.token_weights):
+                    self.token_weights = np.concatenate([self.token_weights, np.empty(i)])
+                self.token_weights[i] = wts[t] if t in wts else self.weight_(t)
+                self.token_ids[t] = i
+            return self.token_weights[[self.token_ids[t] for t in tks]]
+
+    def weights(self, tks, preprocess=True):
+        return self.weights_many([tks], preprocess)[0]
+
+    def weights_many(self, tkss, preprocess=True):
+        """
+        `weights` of each token list of `tkss`, with the tokens of all of them looked up at once.
+        """
+        if preprocess:
+            tkss = [[t for tk in tks for t in self.tokenMerge(self.pretoken(tk, True))] for tks in tkss]
         else:
-            for tk in tks:
-                tt = self.tokenMerge(self.pretoken(tk, True))
-                idf1 = np.array([idf(freq(t), 10000000) for t in tt])
-                idf2 = np.array([idf(df(t), 1000000000) for t in tt])
-                wts = (0.3 * idf1 + 0.7 * idf2) * \
-                    np.array([ner(t) * postag(t) for t in tt])
-                wts = [s for s in wts]
-                tw.extend(zip(tt, wts))
-
-        S = np.sum([s for _, s in tw])
-        return [(t, s / S) for t, s in tw]
+            tkss = [list(tks) for tks in tkss]
+        wts = self.token_weights_([t for tks in tkss for t in tks])
+        res, s = [], 0
+        for tks in tkss:
+            w = wts[s:s + len(tks)]
+            s += len(tks)
+            res.append(list(zip(tks, (w / np.sum(w)).tolist())) if tks else [])
+        return res
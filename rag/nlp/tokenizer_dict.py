@@ -0,0 +1,153 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Word dictionaries of RagTokenizer: a word's (log frequency, tag), whether a word starts or ends some word.
+
+`DatrieDict` is the datrie the dictionary text files are loaded into, words can be added to it. `MmapDict` is
+the same dictionary compiled into a file which is memory-mapped read-only: opening it reads nothing, and
+the processes using it share its pages through the page cache instead of each holding a copy on its heap.
+"""
+import codecs
+import json
+import mmap
+import os
+import struct
+from bisect import bisect_left
+
+MAGIC = b"RAGDICT1"
+HEADER = struct.Struct("<8sQQQ")
+NO_TAG = 0xFFFFFFFF
+
+
+def key(line: str) -> str:
+    return str(line.lower().encode("utf-8"))[2:-1]
+
+
+def rkey(line: str) -> str:
+    return str(("DD" + (line[::-1].lower())).encode("utf-8"))[2:-1]
+
+
+class DatrieDict:
+    def __init__(self, trie):
+        self.trie = trie
+
+    def get(self, word: str) -> tuple[int, str] | None:
+        k = key(word)
+        return self.trie[k] if k in self.trie else None
+
+    def has_prefix(self, word: str) -> bool:
+        return self.trie.has_keys_with_prefix(key(word))
+
+    def has_suffix(self, word: str) -> bool:
+        return self.trie.has_keys_with_prefix(rkey(word))
+
+    def words(self) -> dict[str, tuple[int, str]]:
+        res = {}
+        for k, v in self.trie.items():
+            # Keys of the backward lookups are marked by a leading "DD", words are lowercased.
+            if k.startswith("DD"):
+                continue
+            res[codecs.escape_decode(k)[0].decode("utf-8")] = v
+        return res
+
+
+def _levels(keys) -> tuple[list[int], list[int], dict[str, int]]:
+    """
+    Trie of `keys` with its nodes numbered level by level in key order, so that the children of a node are
+    the nodes from first[node] to first[node + 1] and sorted by their char, chars[node].
+    """
+    first, chars, index = [], [0], {"": 0}
+    level, keys, depth = [""], list(keys), 0
+    while level:
+        depth += 1
+        keys = [k for k in keys if len(k) >= depth]
+        nxt = sorted({k[:depth] for k in keys})
+        base, j = len(chars), 0
+        for p in level:
+            first.append(base + j)
+            while j < len(nxt) and nxt[j][:-1] == p:
+                j += 1
+        for k in nxt:
+            index[k] = len(chars)
+            chars.append(ord(k[-1]))
+        level = nxt
+    first.append(len(chars))
+    return first, chars, index
+
+
+def _pack(fmt: str, values: list[int]) -> bytes:
+    return struct.pack(f"<{len(values)}{fmt}", *values)
+
+
+class MmapDict:
+    @staticmethod
+    def compile(words: dict[str, tuple[int, str]], path: str):
+        """
+        Writes the dictionary of lowercased words to `path`, atomically.
+        """
+        tags = sorted({tag for _, tag in words.values()})
+        tag_ids = {tag: i for i, tag in enumerate(tags)}
+        f_first, f_chars, index = _levels(words.keys())
+        freqs, tag_of = [0] * len(f_chars), [NO_TAG] * len(f_chars)
+        for word, (freq, tag) in words.items():
+            freqs[index[word]], tag_of[index[word]] = freq, tag_ids[tag]
+        b_first, b_chars, _ = _levels(w[::-1] for w in words.keys())
+        tags_json = json.dumps(tags, ensure_ascii=False).encode("utf-8")
+
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(f_chars), len(b_chars), len(tags_json)))
+            for fmt, values in [("I", f_first), ("I", f_chars), ("i", freqs), ("I", tag_of), ("I", b_first),
+                                ("I", b_chars)]:
+                f.write(_pack(fmt, values))
+            f.write(tags_json)
+        os.replace(tmp, path)
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n_fwd, n_bwd, tags_len = HEADER.unpack_from(self.mm)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a compiled dictionary")
+        mv, off = memoryview(self.mm), HEADER.size
+        sections = []
+        for fmt, n in [("I", n_fwd + 1), ("I", n_fwd), ("i", n_fwd), ("I", n_fwd), ("I", n_bwd + 1), ("I", n_bwd)]:
+            sections.append(mv[off:off + 4 * n].cast(fmt))
+            off += 4 * n
+        self.f_first, self.f_chars, self.freqs, self.tag_of, self.b_first, self.b_chars = sections
+        self.tags = json.loads(bytes(mv[off:off + tags_len]).decode("utf-8"))
+
+    @staticmethod
+    def _walk(first, chars, word: str) -> int:
+        node = 0
+        for ch in word:
+            c, lo, hi = ord(ch), first[node], first[node + 1]
+            node = bisect_left(chars, c, lo, hi)
+            if node == hi or chars[node] != c:
+                return -1
+        return node
+
+    def get(self, word: str) -> tuple[int, str] | None:
+        node = self._walk(self.f_first, self.f_chars, word.lower())
+        if node < 0 or self.tag_of[node] == NO_TAG:
+            return None
+        return self.freqs[node], self.tags[self.tag_of[node]]
+
+    def has_prefix(self, word: str) -> bool:
+        return self._walk(self.f_first, self.f_chars, word.lower()) >= 0
+
+    def has_suffix(self, word: str) -> bool:
+        return self._walk(self.b_first, self.b_chars, word[::-1].lower()) >= 0
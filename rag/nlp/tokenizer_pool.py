@@ -0,0 +1,105 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Tokenization of large batches of text on several cores, for ingestion.
+
+Tokenizing is pure Python and holds the GIL, so the chunk builders of a task executor share one core for it.
+With TOKENIZER_WORKERS > 0, `tokenize_many` sends large batches to worker processes in parts and returns the
+tokens in order. The workers fork from a server process that loaded the tokenizer dictionary, see
+`rag.nlp.tokenizer_preload`, sharing it instead of loading one each. Where forkserver is not available they are
+spawned and each loads its own.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from rag.nlp import rag_tokenizer
+from rag.settings import TOKENIZER_WORKERS, TOKENIZER_POOL_MIN_CHARS, TOKENIZER_POOL_BATCH_CHARS
+
+
+def _tokenize_batch(texts: list[str], fine_grained: bool) -> list[tuple[str, str | None]]:
+    return rag_tokenizer.tokenize_many(texts, fine_grained)
+
+
+class TokenizerPool:
+    def __init__(self, workers: int, min_chars: int, batch_chars: int):
+        self.workers = workers
+        self.min_chars = min_chars
+        self.batch_chars = batch_chars
+        self.executor = None
+        self.lock = threading.Lock()
+        # Parts in flight across all callers, a caller waits for one to finish before sending more.
+        self.slots = threading.BoundedSemaphore(max(workers, 1) * 2)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self.lock:
+            if self.executor is None:
+                if "forkserver" in multiprocessing.get_all_start_methods():
+                    ctx = multiprocessing.get_context("forkserver")
+                    ctx.set_forkserver_preload(["rag.nlp.tokenizer_preload"])
+                else:
+                    ctx = multiprocessing.get_context("spawn")
+                self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx)
+            return self.executor
+
+    def _reset(self, executor: ProcessPoolExecutor):
+        with self.lock:
+            if self.executor is executor:
+                self.executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def tokenize_many(self, texts: list[str], fine_grained: bool = True) -> list[tuple[str, str | None]]:
+        """
+        `RagTokenizer.tokenize_many`, in the worker processes if there are any and the batch is large enough.
+        """
+        if self.workers <= 0 or sum(len(t) for t in texts) < self.min_chars:
+            return rag_tokenizer.tokenize_many(texts, fine_grained)
+        parts, part, size = [], [], 0
+        for txt in texts:
+            part.append(txt)
+            size += len(txt)
+            if size >= self.batch_chars:
+                parts.append(part)
+                part, size = [], 0
+        if part:
+            parts.append(part)
+
+        executor = self._executor()
+        try:
+            futures = []
+            for part in parts:
+                self.slots.acquire()
+                try:
+                    future = executor.submit(_tokenize_batch, part, fine_grained)
+                except BaseException:
+                    self.slots.release()
+                    raise
+                future.add_done_callback(lambda _: self.slots.release())
+                futures.append(future)
+            res = []
+            for future in futures:
+                res.extend(future.result())
+            return res
+        except BrokenProcessPool:
+            logging.exception("Tokenizer pool is broken, tokenize in process and restart it on the next batch")
+            self._reset(executor)
+            return rag_tokenizer.tokenize_many(texts, fine_grained)
+
+
+TOKENIZER_POOL = TokenizerPool(TOKENIZER_WORKERS, TOKENIZER_POOL_MIN_CHARS, TOKENIZER_POOL_BATCH_CHARS)
+tokenize_many = TOKENIZER_POOL.tokenize_many
@@ -0,0 +1,22 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Preloaded by the forkserver of `rag.nlp.tokenizer_pool`: loads the tokenizer dictionary, which is otherwise
+opened on first lookup, so the workers forked from it share its pages.
+"""
+from rag.nlp import rag_tokenizer
+
+rag_tokenizer.tokenizer.load_()
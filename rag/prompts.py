@@ -24,7 +24,7 @@ import json_repair
 from api import settings
 from api.db import LLMType
 from rag.settings import TAG_FLD
-from rag.utils import encoder, num_tokens_from_string
+from rag.utils import num_tokens_from_string, token_count, truncate
 
 
 def chunks_format(reference):
@@ -65,13 +65,7 @@ def llm_id2llm_type(llm_id):
 def message_fit_in(msg, max_length=4000):
     def count():
         nonlocal msg
-        tks_cnts = []
-        for m in msg:
-            tks_cnts.append({"role": m["role"], "count": num_tokens_from_string(m["content"])})
-        total = 0
-        for m in tks_cnts:
-            total += m["count"]
-        return total
+        return sum(token_count.count_many([m["content"] for m in msg]))
 
     c = count()
     if c < max_length:
@@ -89,12 +83,12 @@ def message_fit_in(msg, max_length=4000):
     ll2 = num_tokens_from_string(msg_[-1]["content"])
     if ll / (ll + ll2) > 0.8:
         m = msg_[0]["content"]
-        m = encoder.decode(encoder.encode(m)[: max_length - ll2])
+        m = truncate(m, max_length - ll2)
         msg[0]["content"] = m
         return max_length, msg
 
     m = msg_[-1]["content"]
-    m = encoder.decode(encoder.encode(m)[: max_length - ll2])
+    m = truncate(m, max_length - ll2)
     msg[-1]["content"] = m
     return max_length, msg
 
@@ -105,8 +99,8 @@ def kb_prompt(kbinfos, max_tokens):
     knowledges = [ck["content_with_weight"] for ck in kbinfos["chunks"]]
     used_token_count = 0
     chunks_num = 0
-    for i, c in enumerate(knowledges):
-        used_token_count += num_tokens_from_string(c)
+    for i, n in enumerate(token_count.count_many(knowledges)):
+        used_token_count += n
         chunks_num += 1
         if max_tokens * 0.97 < used_token_count:
             knowledges = knowledges[:i]
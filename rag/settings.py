@@ -32,6 +32,7 @@ S3 = {}
 MINIO = {}
 OSS = {}
 OS = {}
+LOCAL = {}
 
 # Initialize the selected configuration data based on environment variables to solve the problem of initialization errors due to lack of configuration
 if DOC_ENGINE == 'elasticsearch':
@@ -40,6 +41,8 @@ elif DOC_ENGINE == 'opensearch':
     OS = get_base_config("os", {})
 elif DOC_ENGINE == 'infinity':
     INFINITY = get_base_config("infinity", {"uri": "infinity:23817"})
+elif DOC_ENGINE == 'local':
+    LOCAL = get_base_config("local", {"path": os.path.join(get_project_base_directory(), "data", "doc_store")})
 
 if STORAGE_IMPL_TYPE in ['AZURE_SPN', 'AZURE_SAS']:
     AZURE = get_base_config("azure", {})
@@ -56,6 +59,45 @@ except Exception:
     REDIS = {}
     pass
 DOC_MAXIMUM_SIZE = int(os.environ.get("MAX_CONTENT_LENGTH", 128 * 1024 * 1024))
+DOC_STORE_SEARCH_PARALLELISM = int(os.environ.get("DOC_STORE_SEARCH_PARALLELISM", 8))
+# Seconds to keep rerank model scores of (query, chunk) pairs, 0 disables the cache.
+RERANK_CACHE_TTL = int(os.environ.get("RERANK_CACHE_TTL", 3600))
+# Issue the relaxed fallback query concurrently with the strict one for knowledge bases whose
+# empty-hit rate reaches SEARCH_SPECULATIVE_EMPTY_RATE.
+SEARCH_SPECULATIVE_RELAX = str(os.environ.get("SEARCH_SPECULATIVE_RELAX", "true")).lower() == "true"
+SEARCH_SPECULATIVE_EMPTY_RATE = float(os.environ.get("SEARCH_SPECULATIVE_EMPTY_RATE", 0.3))
+# Seconds to keep the reranked candidate window of a retrieval for its other pages and cursors, 0 disables it.
+RETRIEVAL_WINDOW_CACHE_TTL = int(os.environ.get("RETRIEVAL_WINDOW_CACHE_TTL", 300))
+RETRIEVAL_WINDOW_CACHE_SIZE = int(os.environ.get("RETRIEVAL_WINDOW_CACHE_SIZE", 128))
+# With a rerank model, send only this many of the best candidates by token and vector similarity to it,
+# the others keep their first stage scores. 0 sends all of them. The similarity threshold and the total then
+# apply to rerank model scores for those sent and to first stage scores for the others.
+RERANK_CASCADE_TOP_N = int(os.environ.get("RERANK_CASCADE_TOP_N", 0))
+# Chat and retrieval requests taking longer than this many milliseconds are logged with their per-stage timing,
+# 0 disables the slow request log.
+SLOW_REQUEST_THRESHOLD_MS = float(os.environ.get("SLOW_REQUEST_THRESHOLD_MS", 10000))
+# How RagTokenizer segments the spans its forward and backward maximum matchings disagree on:
+# "dfs" enumerates the segmentations, "dp" finds the best ones by dynamic programming in polynomial time.
+TOKENIZER_SEGMENTER = os.environ.get("TOKENIZER_SEGMENTER", "dfs").lower()
+# Characters of tokens RagTokenizer keeps per cache, of the runs of words it tokenized and of the fine-grained
+# tokens of coarse ones, 0 disables the caches.
+TOKENIZER_CACHE_SIZE = int(os.environ.get("TOKENIZER_CACHE_SIZE", 2 * 1024 * 1024))
+# Worker processes tokenizing chunks during ingestion, 0 tokenizes in the calling thread. Batches of fewer than
+# TOKENIZER_POOL_MIN_CHARS characters stay in process, larger ones are sent in parts of TOKENIZER_POOL_BATCH_CHARS.
+TOKENIZER_WORKERS = int(os.environ.get("TOKENIZER_WORKERS", 0))
+TOKENIZER_POOL_MIN_CHARS = int(os.environ.get("TOKENIZER_POOL_MIN_CHARS", 16384))
+TOKENIZER_POOL_BATCH_CHARS = int(os.environ.get("TOKENIZER_POOL_BATCH_CHARS", 32768))
+# Whether RagTokenizer compiles its default dictionary next to it, to huqie.txt.dict, and memory-maps that file
+# instead of loading the datrie in every process.
+TOKENIZER_DICT_MMAP = str(os.environ.get("TOKENIZER_DICT_MMAP", "true")).lower() == "true"
+# English words RagTokenizer keeps the lemmatized stem of, 0 disables the cache. TOKENIZER_ENGLISH_WORDS is a file of
+# words by decreasing frequency, optionally each followed by its stem, to fill the cache with on first use.
+TOKENIZER_ENGLISH_CACHE_SIZE = int(os.environ.get("TOKENIZER_ENGLISH_CACHE_SIZE", 65536))
+TOKENIZER_ENGLISH_WORDS = os.environ.get("TOKENIZER_ENGLISH_WORDS", "")
+# Characters of the strings whose token counts are cached, 0 disables the cache, and threads encoding the
+# uncached strings of a batch.
+TOKEN_COUNT_CACHE_SIZE = int(os.environ.get("TOKEN_COUNT_CACHE_SIZE", 4 * 1024 * 1024))
+TOKEN_COUNT_THREADS = int(os.environ.get("TOKEN_COUNT_THREADS", 4))
 
 SVR_QUEUE_NAME = "rag_flow_svr_queue"
 SVR_CONSUMER_GROUP_NAME = "rag_flow_svr_task_broker"
@@ -56,10 +56,11 @@ from api.versions import get_ragflow_version
 from api.db.db_models import close_connection
 from rag.app import laws, paper, presentation, manual, qa, table, book, resume, picture, naive, one, audio, \
     email, tag
-from rag.nlp import search, rag_tokenizer
+from rag.nlp import search, rag_tokenizer, tokenizer_pool
 from rag.raptor import RecursiveAbstractiveProcessing4TreeOrganizedRetrieval as Raptor
 from rag.settings import DOC_MAXIMUM_SIZE, SVR_CONSUMER_GROUP_NAME, get_svr_queue_name, get_svr_queue_names, print_rag_settings, TAG_FLD, PAGERANK_FLD
-from rag.utils import num_tokens_from_string, truncate
+from rag.utils import token_count, truncate
+from rag.utils.doc_store_conn import DEFAULT_VECTOR_PRECISION
 from rag.utils.redis_conn import REDIS_CONN, RedisDistributedLock
 from rag.utils.storage_factory import STORAGE_IMPL
 from graphrag.utils import chat_limiter
@@ -323,11 +324,16 @@ async def build_chunks(task, progress_callback):
                 set_llm_cache(chat_mdl.llm_name, d["content_with_weight"], cached, "keywords", {"topn": topn})
             if cached:
                 d["important_kwd"] = cached.split(",")
-                d["important_tks"] = rag_tokenizer.tokenize(" ".join(d["important_kwd"]))
+                keyword_docs.append(d)
             return
+        keyword_docs = []
         async with trio.open_nursery() as nursery:
             for d in docs:
                 nursery.start_soon(doc_keyword_extraction, chat_mdl, d, task["parser_config"]["auto_keywords"])
+        tks = await trio.to_thread.run_sync(lambda: tokenizer_pool.tokenize_many(
+            [" ".join(d["important_kwd"]) for d in keyword_docs], fine_grained=False))
+        for d, (important_tks, _) in zip(keyword_docs, tks):
+            d["important_tks"] = important_tks
         progress_callback(msg="Keywords generation {} chunks completed in {:.2f}s".format(len(docs), timer() - st))
 
     if task["parser_config"].get("auto_questions", 0):
@@ -343,10 +349,15 @@ async def build_chunks(task, progress_callback):
                 set_llm_cache(chat_mdl.llm_name, d["content_with_weight"], cached, "question", {"topn": topn})
             if cached:
                 d["question_kwd"] = cached.split("\n")
-                d["question_tks"] = rag_tokenizer.tokenize("\n".join(d["question_kwd"]))
+                question_docs.append(d)
+        question_docs = []
         async with trio.open_nursery() as nursery:
             for d in docs:
                 nursery.start_soon(doc_question_proposal, chat_mdl, d, task["parser_config"]["auto_questions"])
+        tks = await trio.to_thread.run_sync(lambda: tokenizer_pool.tokenize_many(
+            ["\n".join(d["question_kwd"]) for d in question_docs], fine_grained=False))
+        for d, (question_tks, _) in zip(question_docs, tks):
+            d["question_tks"] = question_tks
         progress_callback(msg="Question generation {} chunks completed in {:.2f}s".format(len(docs), timer() - st))
 
     if task["kb_parser_config"].get("tag_kb_ids", []):
@@ -400,7 +411,8 @@ async def build_chunks(task, progress_callback):
 
 def init_kb(row, vector_size: int):
     idxnm = search.index_name(row["tenant_id"])
-    return settings.docStoreConn.createIdx(idxnm, row.get("kb_id", ""), vector_size)
+    vector_precision = (row.get("kb_parser_config") or {}).get("vector_precision", DEFAULT_VECTOR_PRECISION)
+    return settings.docStoreConn.createIdx(idxnm, row.get("kb_id", ""), vector_size, vector_precision)
 
 
 async def embedding(docs, mdl, parser_config=None, callback=None):
@@ -474,18 +486,17 @@ async def run_raptor(row, chat_mdl, embd_mdl, vector_size, callback=None):
     if row["pagerank"]:
         doc[PAGERANK_FLD] = int(row["pagerank"])
     res = []
-    tk_count = 0
-    for content, vctr in chunks[original_length:]:
+    tks = await trio.to_thread.run_sync(lambda: tokenizer_pool.tokenize_many([c for c, _ in chunks[original_length:]]))
+    for (content, vctr), (ltks, sm_ltks) in zip(chunks[original_length:], tks):
         d = copy.deepcopy(doc)
         d["id"] = xxhash.xxh64((content + str(d["doc_id"])).encode("utf-8")).hexdigest()
         d["create_time"] = str(datetime.now()).replace("T", " ")[:19]
         d["create_timestamp_flt"] = datetime.now().timestamp()
         d[vctr_nm] = vctr.tolist()
         d["content_with_weight"] = content
-        d["content_ltks"] = rag_tokenizer.tokenize(content)
-        d["content_sm_ltks"] = rag_tokenizer.fine_grained_tokenize(d["content_ltks"])
+        d["content_ltks"], d["content_sm_ltks"] = ltks, sm_ltks
         res.append(d)
-        tk_count += num_tokens_from_string(content)
+    tk_count = sum(token_count.count_many([c for c, _ in chunks[original_length:]]))
     return res, tk_count
 
 
@@ -592,7 +603,8 @@ async def do_handle_task(task):
             raise
 
     for b in range(0, len(chunks), es_bulk_size):
-        doc_store_result = await trio.to_thread.run_sync(lambda: settings.docStoreConn.insert(chunks[b:b + es_bulk_size], search.index_name(task_tenant_id), task_dataset_id))
+        doc_store_result = await trio.to_thread.run_sync(lambda: settings.docStoreConn.insert(chunks[b:b + es_bulk_size], search.index_name(task_tenant_id), task_dataset_id,
+                                                                                              task["kb_parser_config"].get("vector_precision", DEFAULT_VECTOR_PRECISION)))
         task_canceled = TaskService.do_cancel(task_id)
         if task_canceled:
             progress_callback(-1, msg="Task has been canceled.")
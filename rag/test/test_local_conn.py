@@ -0,0 +1,199 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import pytest
+
+from rag import settings
+from rag.utils import local_conn
+from rag.utils.doc_store_conn import MatchTextExpr
+from rag.utils.local_conn import LocalConnection, LocalIndex, condition_filter, minimum_should_match, parse_query
+
+INDEX = "ragflow_tenant"
+KB = "kb"
+
+
+@pytest.fixture(scope="module")
+def conn(tmp_path_factory):
+    # LocalConnection is a singleton per process, the first path given to it is kept.
+    settings.LOCAL = {"path": str(tmp_path_factory.mktemp("doc_store"))}
+    conn = LocalConnection()
+    conn.createIdx(INDEX, KB, 4)
+    return conn
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    return str(tmp_path)
+
+
+def rows(n, start=0):
+    return [{"id": f"c{i}", "kb_id": KB, "content_ltks": f"word{i} common"} for i in range(start, start + n)]
+
+
+class TestParseQuery:
+    @pytest.mark.p1
+    def test_terms_and_boosts(self):
+        assert parse_query("foo^0.5 bar") == [[(("foo",), 0.5, 0)], [(("bar",), 1.0, 0)]]
+
+    @pytest.mark.p1
+    def test_group_is_one_clause(self):
+        assert parse_query("(foo^0.5 OR bar^0.5) baz") == [
+            [(("foo",), 0.5, 0), (("bar",), 0.5, 0)],
+            [(("baz",), 1.0, 0)],
+        ]
+
+    @pytest.mark.p1
+    def test_group_boost_multiplies(self):
+        assert parse_query('("a b"^0.4 OR c^0.6)^2') == [[(("a", "b"), 0.8, 0), (("c",), 1.2, 0)]]
+
+    @pytest.mark.p1
+    def test_phrase_slop_and_boost(self):
+        assert parse_query('("new york"~2)^1.5') == [[(("new", "york"), 1.5, 2)]]
+        assert parse_query('"new york"~2^1.5') == [[(("new", "york"), 1.5, 2)]]
+
+    @pytest.mark.p2
+    def test_escapes_and_case(self):
+        assert parse_query(r"C\+\+ x\:y") == [[(("c++",), 1.0, 0)], [(("x:y",), 1.0, 0)]]
+
+    @pytest.mark.p2
+    def test_empty_leaves_are_dropped(self):
+        assert parse_query('"" () OR AND') == []
+
+
+class TestMinimumShouldMatch:
+    @pytest.mark.p1
+    @pytest.mark.parametrize(
+        "value, expected",
+        [(0.3, 3), (0.0, 1), ("30%", 3), ("3", 3), (3, 3), (20, 10), (0, 1), (1.0, 10)],
+    )
+    def test_values(self, value, expected):
+        assert minimum_should_match(value, 10) == expected
+
+
+class TestConditionFilter:
+    @pytest.mark.p1
+    def test_equality_and_lists(self):
+        test = condition_filter({"doc_id": ["d1", "d2"], "kb_id": "kb"})
+        assert test({"doc_id": "d1", "kb_id": "kb"})
+        assert not test({"doc_id": "d3", "kb_id": "kb"})
+        assert test({"doc_id": "d2", "kb_id": ["other", "kb"]})
+
+    @pytest.mark.p1
+    def test_available_int(self):
+        available, unavailable = condition_filter({"available_int": 1}), condition_filter({"available_int": 0})
+        assert available({}) and available({"available_int": 1})
+        assert not available({"available_int": 0})
+        assert unavailable({"available_int": 0})
+        assert not unavailable({}) and not unavailable({"available_int": 1})
+
+    @pytest.mark.p2
+    def test_exists_and_must_not(self):
+        assert condition_filter({"exists": "q_4_vec"})({"q_4_vec": [0.0]})
+        assert not condition_filter({"exists": "q_4_vec"})({})
+        assert condition_filter({"must_not": {"exists": "tag_kwd"}})({})
+        assert not condition_filter({"must_not": {"exists": "tag_kwd"}})({"tag_kwd": ["a"]})
+
+    @pytest.mark.p2
+    def test_empty_values_are_ignored(self):
+        assert condition_filter({"doc_id": [], "kb_id": ""})({"doc_id": "d1"})
+
+    @pytest.mark.p3
+    def test_invalid_value_type(self):
+        with pytest.raises(Exception):
+            condition_filter({"doc_id": 1.5})
+
+
+class TestUpdate:
+    @pytest.mark.p1
+    def test_add_and_remove(self, conn):
+        conn.insert([{"id": "u1", "important_kwd": ["a"], "q_4_vec": [1, 0, 0, 0]}], INDEX, KB)
+        assert conn.update({"id": "u1"}, {"add": {"important_kwd": " b "}}, INDEX, KB)
+        assert conn.get("u1", INDEX, [KB])["important_kwd"] == ["a", "b"]
+        assert conn.update({"id": "u1"}, {"remove": {"important_kwd": "a"}}, INDEX, KB)
+        assert conn.get("u1", INDEX, [KB])["important_kwd"] == ["b"]
+        assert conn.update({"id": "u1"}, {"remove": "important_kwd"}, INDEX, KB)
+        assert "important_kwd" not in conn.get("u1", INDEX, [KB])
+
+    @pytest.mark.p1
+    def test_single_and_bulk_values(self, conn):
+        conn.insert([{"id": "u2", "doc_id": "d", "content_ltks": "x", "available_int": 1},
+                     {"id": "u3", "doc_id": "d", "content_ltks": "y", "available_int": 1}], INDEX, KB)
+        # A bulk update skips empty values except available_int, a single one sets them.
+        assert conn.update({"doc_id": "d"}, {"content_ltks": "", "available_int": 0}, INDEX, KB)
+        assert conn.get("u2", INDEX, [KB])["content_ltks"] == "x"
+        assert conn.get("u3", INDEX, [KB])["available_int"] == 0
+        assert conn.update({"id": "u2"}, {"content_ltks": ""}, INDEX, KB)
+        assert conn.get("u2", INDEX, [KB])["content_ltks"] == ""
+
+    @pytest.mark.p2
+    def test_vectors_and_missing_rows(self, conn):
+        conn.insert([{"id": "u4", "q_4_vec": [1, 0, 0, 0]}], INDEX, KB)
+        assert conn.update({"id": "u4"}, {"q_4_vec": [0, 1, 0, 0]}, INDEX, KB)
+        assert conn.get("u4", INDEX, [KB])["q_4_vec"] == [0.0, 1.0, 0.0, 0.0]
+        assert not conn.update({"id": "missing"}, {"content_ltks": "z"}, INDEX, KB)
+        assert not conn.update({"id": "u4"}, {"content_ltks": "z"}, INDEX, "other_kb")
+
+
+class TestJournal:
+    @pytest.mark.p1
+    def test_writes_are_seen_by_another_index(self, index_path):
+        a, b = LocalIndex(index_path), LocalIndex(index_path)
+        with a.writing():
+            a.write("put", rows(3))
+        with b.reading():
+            assert sorted(b.rows) == ["c0", "c1", "c2"]
+        with b.writing():
+            b.write("delete", ["c1"])
+            b.write("put", [{"id": "c0", "kb_id": KB, "content_ltks": "changed"}])
+        with a.reading():
+            assert sorted(a.rows) == ["c0", "c2"]
+            assert a.rows["c0"]["content_ltks"] == "changed"
+            assert a.match_text(MatchTextExpr(["content_ltks"], "word1", 10)) == {}
+            assert list(a.match_text(MatchTextExpr(["content_ltks"], "changed", 10))) == ["c0"]
+
+    @pytest.mark.p1
+    def test_compaction_is_seen_by_another_index(self, index_path):
+        a, b = LocalIndex(index_path), LocalIndex(index_path)
+        with a.writing():
+            a.write("put", rows(4))
+        with b.reading():
+            assert len(b.rows) == 4
+        with a.writing():
+            a.write("delete", ["c0"])
+            a.compact()
+        with b.reading():
+            assert sorted(b.rows) == ["c1", "c2", "c3"]
+        with b.writing():
+            b.write("put", rows(1, start=4))
+        with a.reading():
+            assert sorted(a.rows) == ["c1", "c2", "c3", "c4"]
+        with LocalIndex(index_path).reading() as c:
+            assert sorted(c.rows) == ["c1", "c2", "c3", "c4"]
+            assert c.journalRecords == 1
+
+    @pytest.mark.p2
+    def test_journal_is_compacted_when_long(self, index_path, monkeypatch):
+        monkeypatch.setattr(local_conn, "COMPACT_MIN_RECORDS", 4)
+        a = LocalIndex(index_path)
+        for i in range(6):
+            with a.writing():
+                a.write("put", [{"id": "c0", "kb_id": KB, "content_ltks": f"version{i} common"}])
+        # The fifth record folded the journal into the snapshot, only the sixth is left in it.
+        assert a.snapshotStat is not None and a.journalRecords == 1
+        with LocalIndex(index_path).reading() as b:
+            assert list(b.rows) == ["c0"]
+            assert b.rows["c0"]["content_ltks"] == "version5 common"
+            assert list(b.match_text(MatchTextExpr(["content_ltks"], "version5", 10))) == ["c0"]
+            assert b.match_text(MatchTextExpr(["content_ltks"], "version4", 10)) == {}
@@ -81,19 +81,6 @@ os.environ["TIKTOKEN_CACHE_DIR"] = tiktoken_cache_dir
 encoder = tiktoken.get_encoding("cl100k_base")
 
 
-def num_tokens_from_string(string: str) -> int:
-    """Returns the number of tokens in a text string."""
-    try:
-        return len(encoder.encode(string))
-    except Exception:
-        return 0
-
-
-def truncate(string: str, max_len: int) -> str:
-    """Returns truncated text if the length of text exceed max_len."""
-    return encoder.decode(encoder.encode(string)[:max_len])
-
-  
 def clean_markdown_block(text):
     text = re.sub(r'^\s*```markdown\s*\n?', '', text)
     text = re.sub(r'\n?\s*```\s*$', '', text)
@@ -108,3 +95,6 @@ def get_float(v):
     except Exception:
         return float('-inf')
 
+
+# Token counting is in rag.utils.token_count, which uses `encoder` above.
+from rag.utils.token_count import count as num_tokens_from_string, truncate  # noqa: E402, F401
@@ -14,14 +14,87 @@
 #  limitations under the License.
 #
 
+import ast
+import json
+import re
+import threading
 from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 import numpy as np
+from cachetools import LRUCache, cached
+
+from rag.settings import DOC_STORE_SEARCH_PARALLELISM
 
 DEFAULT_MATCH_VECTOR_TOPN = 10
 DEFAULT_MATCH_SPARSE_TOPN = 10
 VEC = list | np.ndarray
 
+# Storage precision of the dense vector column. Engines that can't honour a precision fall back to float32.
+VECTOR_PRECISIONS = ("float32", "float16", "int8")
+DEFAULT_VECTOR_PRECISION = "float32"
+
+
+def quantize_int8(vec: VEC) -> list[int]:
+    """
+    Symmetric per-vector int8 quantization. The scale is dropped since cosine similarity is scale invariant.
+    """
+    arr = np.asarray(vec, dtype=np.float32)
+    mx = float(np.max(np.abs(arr))) if arr.size else 0.0
+    if mx == 0.0:
+        return [0] * arr.size
+    return np.clip(np.rint(arr * (127.0 / mx)), -127, 127).astype(np.int8).tolist()
+
+
+# A keyword is highlighted only as a whole word, i.e. between these separators.
+HIGHLIGHT_SEPARATORS = r"[ .?/'\"\(\)!,:;-]"
+
+
+@cached(cache=LRUCache(maxsize=1024), key=lambda keywords: frozenset(keywords), lock=threading.Lock())
+def highlight_pattern(keywords) -> re.Pattern | None:
+    """
+    One compiled alternation of all keywords of a query, longest first so phrases win over their words.
+    """
+    kwds = sorted(set([k for k in keywords if k]), key=lambda k: (-len(k), k))
+    if not kwds:
+        return None
+    return re.compile(r"(?<!%s)(?:%s)(?=%s)" % (
+        HIGHLIGHT_SEPARATORS.replace("[", "[^", 1), "|".join(re.escape(k) for k in kwds), HIGHLIGHT_SEPARATORS),
+        flags=re.IGNORECASE)
+
+
+def highlight(txt: str, keywords: list[str]) -> str:
+    """
+    Wraps the keywords found in `txt` with <em></em> in a single pass and returns the highlighted sentences joined by "...".
+    """
+    patt = highlight_pattern(keywords)
+    if not patt or not txt:
+        return ""
+    txt, n = patt.subn(r"<em>\g<0></em>", re.sub(r"[\r\n]", " ", txt))
+    if not n:
+        return ""
+    return "...".join([t for t in re.split(r"[.?!;\n]", txt) if t.find("<em>") >= 0])
+
+
+def rank_features(v) -> dict:
+    """
+    Tag/rank features (`*_feas` fields) as a native dict of feature => weight.
+    Connectors return dicts; strings are JSON (Infinity columns) or the Python repr of older results.
+    """
+    if isinstance(v, dict):
+        return v
+    if not v or not isinstance(v, str):
+        return {}
+    try:
+        v = json.loads(v)
+    except ValueError:
+        try:
+            v = ast.literal_eval(v)
+        except (ValueError, SyntaxError):
+            return {}
+    return v if isinstance(v, dict) else {}
+
 
 @dataclass
 class SparseVector:
@@ -165,9 +238,10 @@ class DocStoreConnection(ABC):
     """
 
     @abstractmethod
-    def createIdx(self, indexName: str, knowledgebaseId: str, vectorSize: int):
+    def createIdx(self, indexName: str, knowledgebaseId: str, vectorSize: int,
+                  vectorPrecision: str = DEFAULT_VECTOR_PRECISION):
         """
-        Create an index with given name
+        Create an index with given name. `vectorPrecision` is one of VECTOR_PRECISIONS.
         """
         raise NotImplementedError("Not implemented")
 
@@ -201,13 +275,45 @@ class DocStoreConnection(ABC):
             indexNames: str|list[str],
             knowledgebaseIds: list[str],
             aggFields: list[str] = [],
-            rank_feature: dict | None = None
+            rank_feature: dict | None = None,
+            trackTotalHits: bool | int = True
     ):
         """
         Search with given conjunctive equivalent filtering condition and return all fields of matched documents
+        An int `trackTotalHits` lets the engine stop counting matches there, the total is then a lower bound.
         """
         raise NotImplementedError("Not implemented")
 
+    def multiSearch(self, searches: list[dict]) -> list:
+        """
+        Run several searches, each given as the keyword arguments of `search`, and return their results in order.
+        Engines without a native multi-search run them concurrently.
+        """
+        if len(searches) <= 1:
+            return [self.search(**search) for search in searches]
+        with ThreadPoolExecutor(max_workers=min(len(searches), DOC_STORE_SEARCH_PARALLELISM)) as pool:
+            return list(pool.map(lambda search: self.search(**search), searches))
+
+    def scan(self, selectFields: list[str], condition: dict, indexNames: str | list[str], knowledgebaseIds: list[str],
+             batchSize: int = 1024) -> Iterator[object]:
+        """
+        Iterate over all rows matching the condition, in no particular order, one search result per batch of
+        `batchSize` rows to read with getFields/getChunkIds. Engines resume each batch after the last row of the
+        previous one, so that a whole scan stays linear where paging with offsets gets quadratic.
+        This fallback pages with offsets, for engines where those are cheap.
+        """
+        offset = 0
+        while True:
+            res = self.search(selectFields, [], dict(condition), [], OrderByExpr(), offset, batchSize, indexNames,
+                              knowledgebaseIds)
+            n = len(self.getChunkIds(res))
+            if n == 0:
+                return
+            yield res
+            if n < batchSize:
+                return
+            offset += batchSize
+
     @abstractmethod
     def get(self, chunkId: str, indexName: str, knowledgebaseIds: list[str]) -> dict | None:
         """
@@ -216,9 +322,10 @@ class DocStoreConnection(ABC):
         raise NotImplementedError("Not implemented")
 
     @abstractmethod
-    def insert(self, rows: list[dict], indexName: str, knowledgebaseId: str = None) -> list[str]:
+    def insert(self, rows: list[dict], indexName: str, knowledgebaseId: str = None,
+               vectorPrecision: str = DEFAULT_VECTOR_PRECISION) -> list[str]:
         """
-        Update or insert a bulk of rows
+        Update or insert a bulk of rows. `vectorPrecision` is that of the index, if the engine has to create it.
         """
         raise NotImplementedError("Not implemented")
 
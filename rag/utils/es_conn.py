@@ -21,6 +21,7 @@ import time
 import os
 
 import copy
+from collections.abc import Iterator
 from elasticsearch import Elasticsearch, NotFoundError
 from elasticsearch_dsl import UpdateByQuery, Q, Search, Index
 from elastic_transport import ConnectionTimeout
@@ -29,10 +30,12 @@ from rag.settings import TAG_FLD, PAGERANK_FLD
 from rag.utils import singleton, get_float
 from api.utils.file_utils import get_project_base_directory
 from rag.utils.doc_store_conn import DocStoreConnection, MatchExpr, OrderByExpr, MatchTextExpr, MatchDenseExpr, \
-    FusionExpr
+    FusionExpr, DEFAULT_VECTOR_PRECISION, highlight
 from rag.nlp import is_english, rag_tokenizer
 
 ATTEMPT_TIME = 2
+# How long a point in time of `scan` lives between two batches.
+SCAN_KEEP_ALIVE = "5m"
 
 logger = logging.getLogger('ragflow.es_conn')
 
@@ -91,14 +94,41 @@ class ESConnection(DocStoreConnection):
     Table operations
     """
 
-    def createIdx(self, indexName: str, knowledgebaseId: str, vectorSize: int):
+    def _vector_mapping(self, vectorSize: int, vectorPrecision: str) -> dict | None:
+        """
+        Explicit mapping of `q_{vectorSize}_vec` for a compact precision, None to keep the dynamic template.
+        """
+        if vectorPrecision == "int8":
+            return {"type": "dense_vector", "index": True, "similarity": "cosine", "dims": vectorSize,
+                    "index_options": {"type": "int8_hnsw"}}
+        if vectorPrecision == "float16":
+            logger.warning("Elasticsearch doesn't support float16 dense vectors, fall back to float32.")
+        return None
+
+    def createIdx(self, indexName: str, knowledgebaseId: str, vectorSize: int,
+                  vectorPrecision: str = DEFAULT_VECTOR_PRECISION):
+        vector_mapping = self._vector_mapping(vectorSize, vectorPrecision)
+        vector_name = f"q_{vectorSize}_vec"
         if self.indexExist(indexName, knowledgebaseId):
+            if not vector_mapping:
+                return True
+            # All knowledge bases of a tenant share one index, so the first one mapping the vector field decides its precision.
+            try:
+                if self.es.indices.get_field_mapping(index=indexName, fields=vector_name).get(indexName, {}).get("mappings"):
+                    return True
+                return self.es.indices.put_mapping(index=indexName, properties={vector_name: vector_mapping})
+            except Exception:
+                logger.exception("ESConnection.createIndex error %s" % (indexName))
             return True
         try:
             from elasticsearch.client import IndicesClient
+            mappings = self.mapping["mappings"]
+            if vector_mapping:
+                mappings = copy.deepcopy(mappings)
+                mappings["properties"][vector_name] = vector_mapping
             return IndicesClient(self.es).create(index=indexName,
                                                  settings=self.mapping["settings"],
-                                                 mappings=self.mapping["mappings"])
+                                                 mappings=mappings)
         except Exception:
             logger.exception("ESConnection.createIndex error %s" % (indexName))
 
@@ -140,11 +170,129 @@ class ESConnection(DocStoreConnection):
             indexNames: str | list[str],
             knowledgebaseIds: list[str],
             aggFields: list[str] = [],
-            rank_feature: dict | None = None
+            rank_feature: dict | None = None,
+            trackTotalHits: bool | int = True
     ):
         """
         Refers to https://www.elastic.co/guide/en/elasticsearch/reference/current/query-dsl.html
         """
+        indexNames, q = self._search_body(selectFields, highlightFields, condition, matchExprs, orderBy, offset,
+                                          limit, indexNames, knowledgebaseIds, aggFields, rank_feature)
+        logger.debug(f"ESConnection.search {str(indexNames)} query: " + json.dumps(q))
+
+        for i in range(ATTEMPT_TIME):
+            try:
+                #print(json.dumps(q, ensure_ascii=False))
+                res = self.es.search(index=indexNames,
+                                     body=q,
+                                     timeout="600s",
+                                     # search_type="dfs_query_then_fetch",
+                                     track_total_hits=trackTotalHits,
+                                     _source=True)
+                if str(res.get("timed_out", "")).lower() == "true":
+                    raise Exception("Es Timeout.")
+                logger.debug(f"ESConnection.search {str(indexNames)} res: " + str(res))
+                return res
+            except Exception as e:
+                logger.exception(f"ESConnection.search {str(indexNames)} query: " + str(q))
+                if str(e).find("Timeout") > 0:
+                    continue
+                raise e
+        logger.error("ESConnection.search timeout for 3 times!")
+        raise Exception("ESConnection.search timeout.")
+
+    def multiSearch(self, searches: list[dict]) -> list:
+        """
+        Runs several searches in one `_msearch` round-trip.
+        Refers to https://www.elastic.co/guide/en/elasticsearch/reference/current/search-multi-search.html
+        """
+        if not searches:
+            return []
+        body = []
+        for search in searches:
+            search = dict(search)
+            trackTotalHits = search.pop("trackTotalHits", True)
+            indexNames, q = self._search_body(**search)
+            body.append({"index": ",".join(indexNames)})
+            body.append({**q, "timeout": "600s", "track_total_hits": trackTotalHits, "_source": True})
+        logger.debug(f"ESConnection.multiSearch {len(searches)} searches")
+
+        for i in range(ATTEMPT_TIME):
+            try:
+                res = self.es.msearch(searches=body)
+                responses = res["responses"]
+                for r in responses:
+                    if "error" in r:
+                        raise Exception(f"ESConnection.multiSearch error: {r['error']}")
+                    if str(r.get("timed_out", "")).lower() == "true":
+                        raise Exception("Es Timeout.")
+                return responses
+            except Exception as e:
+                logger.exception(f"ESConnection.multiSearch {len(searches)} searches")
+                if str(e).find("Timeout") > 0:
+                    continue
+                raise e
+        logger.error("ESConnection.multiSearch timeout for 3 times!")
+        raise Exception("ESConnection.multiSearch timeout.")
+
+    def scan(self, selectFields: list[str], condition: dict, indexNames: str | list[str], knowledgebaseIds: list[str],
+             batchSize: int = 1024) -> Iterator[object]:
+        """
+        Point in time with `search_after`, in index order.
+        Refers to https://www.elastic.co/guide/en/elasticsearch/reference/current/paginate-search-results.html#search-after
+        """
+        indexNames, q = self._search_body(selectFields, [], dict(condition), [], OrderByExpr(), 0, 0, indexNames,
+                                          knowledgebaseIds)
+        try:
+            pit = self.es.open_point_in_time(index=indexNames, keep_alive=SCAN_KEEP_ALIVE)["id"]
+        except NotFoundError:
+            return
+        try:
+            q = {**q, "size": batchSize, "sort": [{"_shard_doc": "asc"}]}
+            while True:
+                res = self._scan_page({**q, "pit": {"id": pit, "keep_alive": SCAN_KEEP_ALIVE}})
+                pit = res.get("pit_id", pit)
+                hits = res["hits"]["hits"]
+                if not hits:
+                    return
+                yield res
+                if len(hits) < batchSize:
+                    return
+                q["search_after"] = hits[-1]["sort"]
+        finally:
+            try:
+                self.es.close_point_in_time(id=pit)
+            except Exception:
+                logger.warning("ESConnection.scan failed to close its point in time")
+
+    def _scan_page(self, q: dict) -> dict:
+        for i in range(ATTEMPT_TIME):
+            try:
+                res = self.es.search(body=q, timeout="600s", track_total_hits=False, _source=True)
+                if str(res.get("timed_out", "")).lower() == "true":
+                    raise Exception("Es Timeout.")
+                return res
+            except Exception as e:
+                logger.exception("ESConnection.scan query: " + str(q))
+                if str(e).find("Timeout") > 0:
+                    continue
+                raise e
+        logger.error("ESConnection.scan timeout for 3 times!")
+        raise Exception("ESConnection.scan timeout.")
+
+    def _search_body(
+            self, selectFields: list[str],
+            highlightFields: list[str],
+            condition: dict,
+            matchExprs: list[MatchExpr],
+            orderBy: OrderByExpr,
+            offset: int,
+            limit: int,
+            indexNames: str | list[str],
+            knowledgebaseIds: list[str],
+            aggFields: list[str] = [],
+            rank_feature: dict | None = None
+    ) -> tuple[list[str], dict]:
         if isinstance(indexNames, str):
             indexNames = indexNames.split(",")
         assert isinstance(indexNames, list) and len(indexNames) > 0
@@ -233,29 +381,7 @@ class ESConnection(DocStoreConnection):
 
         if limit > 0:
             s = s[offset:offset + limit]
-        q = s.to_dict()
-        logger.debug(f"ESConnection.search {str(indexNames)} query: " + json.dumps(q))
-
-        for i in range(ATTEMPT_TIME):
-            try:
-                #print(json.dumps(q, ensure_ascii=False))
-                res = self.es.search(index=indexNames,
-                                     body=q,
-                                     timeout="600s",
-                                     # search_type="dfs_query_then_fetch",
-                                     track_total_hits=True,
-                                     _source=True)
-                if str(res.get("timed_out", "")).lower() == "true":
-                    raise Exception("Es Timeout.")
-                logger.debug(f"ESConnection.search {str(indexNames)} res: " + str(res))
-                return res
-            except Exception as e:
-                logger.exception(f"ESConnection.search {str(indexNames)} query: " + str(q))
-                if str(e).find("Timeout") > 0:
-                    continue
-                raise e
-        logger.error("ESConnection.search timeout for 3 times!")
-        raise Exception("ESConnection.search timeout.")
+        return indexNames, s.to_dict()
 
     def get(self, chunkId: str, indexName: str, knowledgebaseIds: list[str]) -> dict | None:
         for i in range(ATTEMPT_TIME):
@@ -277,7 +403,8 @@ class ESConnection(DocStoreConnection):
         logger.error("ESConnection.get timeout for 3 times!")
         raise Exception("ESConnection.get timeout.")
 
-    def insert(self, documents: list[dict], indexName: str, knowledgebaseId: str = None) -> list[str]:
+    def insert(self, documents: list[dict], indexName: str, knowledgebaseId: str = None,
+               vectorPrecision: str = DEFAULT_VECTOR_PRECISION) -> list[str]:
         # Refers to https://www.elastic.co/guide/en/elasticsearch/reference/current/docs-bulk.html
         operations = []
         for d in documents:
@@ -483,6 +610,9 @@ class ESConnection(DocStoreConnection):
                 if isinstance(v, list):
                     m[n] = v
                     continue
+                if isinstance(v, dict) or re.search(r"_feas?$", n):
+                    # Rank features are scored numerically, keep them native instead of repr strings.
+                    continue
                 if not isinstance(v, str):
                     m[n] = str(m[n])
                 # if n.find("tks") > 0:
@@ -503,17 +633,8 @@ class ESConnection(DocStoreConnection):
                 ans[d["_id"]] = txt
                 continue
 
-            txt = d["_source"][fieldnm]
-            txt = re.sub(r"[\r\n]", " ", txt, flags=re.IGNORECASE | re.MULTILINE)
-            txts = []
-            for t in re.split(r"[.?!;\n]", txt):
-                for w in keywords:
-                    t = re.sub(r"(^|[ .?/'\"\(\)!,:;-])(%s)([ .?/'\"\(\)!,:;-])" % re.escape(w), r"\1<em>\2</em>\3", t,
-                               flags=re.IGNORECASE | re.MULTILINE)
-                if not re.search(r"<em>[^<>]+</em>", t, flags=re.IGNORECASE | re.MULTILINE):
-                    continue
-                txts.append(t)
-            ans[d["_id"]] = "...".join(txts) if txts else "...".join([a for a in list(hlts.items())[0][1]])
+            txt = highlight(d["_source"][fieldnm], keywords)
+            ans[d["_id"]] = txt if txt else "...".join([a for a in list(hlts.items())[0][1]])
 
         return ans
 
@@ -20,6 +20,11 @@ import re
 import json
 import time
 import copy
+import heapq
+import itertools
+from collections import defaultdict
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 import infinity
 from infinity.common import ConflictType, InfinityException, SortType
 from infinity.index import IndexInfo, IndexType
@@ -28,6 +33,7 @@ from infinity.errors import ErrorCode
 from rag import settings
 from rag.settings import PAGERANK_FLD
 from rag.utils import singleton
+import numpy as np
 import pandas as pd
 from api.utils.file_utils import get_project_base_directory
 
@@ -38,6 +44,10 @@ from rag.utils.doc_store_conn import (
     MatchDenseExpr,
     FusionExpr,
     OrderByExpr,
+    DEFAULT_VECTOR_PRECISION,
+    quantize_int8,
+    highlight,
+    rank_features,
 )
 
 logger = logging.getLogger('ragflow.infinity_conn')
@@ -108,6 +118,10 @@ def equivalent_condition_to_str(condition: dict, table_instance=None) -> str | N
     return " AND ".join(cond) if cond else "1=1"
 
 
+# Maps VECTOR_PRECISIONS to Infinity embedding element types
+VECTOR_ELEMENT_TYPES = {"float32": "float", "float16": "float16", "int8": "int8"}
+
+
 def concat_dataframes(df_list: list[pd.DataFrame], selectFields: list[str]) -> pd.DataFrame:
     df_list2 = [df for df in df_list if not df.empty]
     if df_list2:
@@ -124,6 +138,31 @@ def concat_dataframes(df_list: list[pd.DataFrame], selectFields: list[str]) -> p
     return pd.DataFrame(columns=schema)
 
 
+def merge_dataframes_topk(df_list: list[pd.DataFrame], selectFields: list[str], score_column: str, limit: int) -> pd.DataFrame:
+    """
+    K-way merge of per-table results on score + pagerank, only the global top `limit` rows are materialized.
+    """
+    heads = []
+    for t, df in enumerate(df_list):
+        if df.empty:
+            continue
+        sums = (df[score_column].fillna(0) + df[PAGERANK_FLD].fillna(0)).to_numpy(dtype=float)
+        heads.append([(-sums[i], t, i) for i in np.argsort(-sums, kind="stable")])
+    picked = list(itertools.islice(heapq.merge(*heads), max(limit, 0)))
+    if not picked:
+        return concat_dataframes([], selectFields)
+
+    rows = defaultdict(list)
+    for rank, (_, t, i) in enumerate(picked):
+        rows[t].append((i, rank))
+    parts, ranks = [], []
+    for t, lst in rows.items():
+        parts.append(df_list[t].iloc[[i for i, _ in lst]])
+        ranks.extend([rank for _, rank in lst])
+    res = pd.concat(parts, axis=0, ignore_index=True)
+    return res.iloc[np.argsort(ranks)].reset_index(drop=True)
+
+
 @singleton
 class InfinityConnection(DocStoreConnection):
     def __init__(self):
@@ -133,6 +172,10 @@ class InfinityConnection(DocStoreConnection):
             host, port = infinity_uri.split(":")
             infinity_uri = infinity.common.NetworkAddress(host, int(port))
         self.connPool = None
+        # table name -> {embedding column name: element type}
+        self.embeddingTypes = {}
+        # Bounded fan-out over the tables of a multi-KB search, each worker takes its own pooled connection.
+        self.searchExecutor = ThreadPoolExecutor(max_workers=settings.DOC_STORE_SEARCH_PARALLELISM)
         logger.info(f"Use Infinity {infinity_uri} as the doc engine.")
         for _ in range(24):
             try:
@@ -191,6 +234,16 @@ class InfinityConnection(DocStoreConnection):
                     ConflictType.Ignore,
                 )
 
+    def _embedding_types(self, table_name: str, table_instance) -> dict[str, str]:
+        if table_name not in self.embeddingTypes:
+            types = {}
+            for n, ty, _, _ in table_instance.show_columns().rows():
+                r = re.search(r"Embedding\(([a-z0-9]+),[0-9]+\)", ty)
+                if r:
+                    types[n] = r.group(1)
+            self.embeddingTypes[table_name] = types
+        return self.embeddingTypes[table_name]
+
     """
     Database operations
     """
@@ -216,7 +269,8 @@ class InfinityConnection(DocStoreConnection):
     Table operations
     """
 
-    def createIdx(self, indexName: str, knowledgebaseId: str, vectorSize: int):
+    def createIdx(self, indexName: str, knowledgebaseId: str, vectorSize: int,
+                  vectorPrecision: str = DEFAULT_VECTOR_PRECISION):
         table_name = f"{indexName}_{knowledgebaseId}"
         inf_conn = self.connPool.get_conn()
         inf_db = inf_conn.create_database(self.dbName, ConflictType.Ignore)
@@ -228,7 +282,8 @@ class InfinityConnection(DocStoreConnection):
             raise Exception(f"Mapping file not found at {fp_mapping}")
         schema = json.load(open(fp_mapping))
         vector_name = f"q_{vectorSize}_vec"
-        schema[vector_name] = {"type": f"vector,{vectorSize},float"}
+        element_type = VECTOR_ELEMENT_TYPES.get(vectorPrecision, "float")
+        schema[vector_name] = {"type": f"vector,{vectorSize},{element_type}"}
         inf_table = inf_db.create_table(
             table_name,
             schema,
@@ -243,7 +298,8 @@ class InfinityConnection(DocStoreConnection):
                     "M": "16",
                     "ef_construction": "50",
                     "metric": "cosine",
-                    "encode": "lvq",
+                    # LVQ only applies to float32 embeddings, compact element types are indexed as is.
+                    "encode": "lvq" if element_type == "float" else "plain",
                 },
             ),
             ConflictType.Ignore,
@@ -260,7 +316,7 @@ class InfinityConnection(DocStoreConnection):
             )
         self.connPool.release_conn(inf_conn)
         logger.info(
-            f"INFINITY created table {table_name}, vector size {vectorSize}"
+            f"INFINITY created table {table_name}, vector size {vectorSize}, vector precision {vectorPrecision}"
         )
 
     def deleteIdx(self, indexName: str, knowledgebaseId: str):
@@ -269,6 +325,7 @@ class InfinityConnection(DocStoreConnection):
         db_instance = inf_conn.get_database(self.dbName)
         db_instance.drop_table(table_name, ConflictType.Ignore)
         self.connPool.release_conn(inf_conn)
+        self.embeddingTypes.pop(table_name, None)
         logger.info(f"INFINITY dropped table {table_name}")
 
     def indexExist(self, indexName: str, knowledgebaseId: str) -> bool:
@@ -298,10 +355,12 @@ class InfinityConnection(DocStoreConnection):
             indexNames: str | list[str],
             knowledgebaseIds: list[str],
             aggFields: list[str] = [],
-            rank_feature: dict | None = None
+            rank_feature: dict | None = None,
+            trackTotalHits: bool | int = True
     ) -> tuple[pd.DataFrame, int]:
         """
         TODO: Infinity doesn't provide highlight
+        Unless `trackTotalHits` is True, the total of a first page is the number of rows returned instead of all matching ones.
         """
         if isinstance(indexNames, str):
             indexNames = indexNames.split(",")
@@ -381,16 +440,13 @@ class InfinityConnection(DocStoreConnection):
                 else:
                     order_by_expr_list.append((order_field[0], SortType.Desc))
 
-        total_hits_count = 0
-        # Scatter search tables and gather the results
-        for indexName in indexNames:
-            for knowledgebaseId in knowledgebaseIds:
-                table_name = f"{indexName}_{knowledgebaseId}"
+        def search_table(table_name: str):
+            table_conn = self.connPool.get_conn()
+            try:
                 try:
-                    table_instance = db_instance.get_table(table_name)
+                    table_instance = table_conn.get_database(self.dbName).get_table(table_name)
                 except Exception:
-                    continue
-                table_list.append(table_name)
+                    return None
                 builder = table_instance.output(output)
                 if len(matchExprs) > 0:
                     for matchExpr in matchExprs:
@@ -403,10 +459,16 @@ class InfinityConnection(DocStoreConnection):
                                 matchExpr.extra_options.copy(),
                             )
                         elif isinstance(matchExpr, MatchDenseExpr):
+                            embedding_data, embedding_data_type = matchExpr.embedding_data, matchExpr.embedding_data_type
+                            element_type = self._embedding_types(table_name, table_instance).get(matchExpr.vector_column_name)
+                            if element_type == "int8":
+                                embedding_data, embedding_data_type = quantize_int8(embedding_data), "int8"
+                            elif element_type == "float16":
+                                embedding_data_type = "float16"
                             builder = builder.match_dense(
                                 matchExpr.vector_column_name,
-                                matchExpr.embedding_data,
-                                matchExpr.embedding_data_type,
+                                embedding_data,
+                                embedding_data_type,
                                 matchExpr.distance_type,
                                 matchExpr.topn,
                                 matchExpr.extra_options.copy(),
@@ -421,20 +483,77 @@ class InfinityConnection(DocStoreConnection):
                 if orderBy.fields:
                     builder.sort(order_by_expr_list)
                 builder.offset(offset).limit(limit)
+                # Past the first page no row returned doesn't mean no match, count those.
+                if trackTotalHits is not True and offset == 0:
+                    kb_res, _ = builder.to_df()
+                    logger.debug(f"INFINITY search table: {str(table_name)}, result: {str(kb_res)}")
+                    return kb_res, len(kb_res)
                 kb_res, extra_result = builder.option({"total_hits_count": True}).to_df()
-                if extra_result:
-                    total_hits_count += int(extra_result["total_hits_count"])
                 logger.debug(f"INFINITY search table: {str(table_name)}, result: {str(kb_res)}")
-                df_list.append(kb_res)
+                return kb_res, int(extra_result["total_hits_count"]) if extra_result else 0
+            finally:
+                self.connPool.release_conn(table_conn)
+
         self.connPool.release_conn(inf_conn)
-        res = concat_dataframes(df_list, output)
+        # Scatter search tables in parallel and gather the results, latency tracks the slowest table.
+        table_names = [f"{indexName}_{knowledgebaseId}" for indexName in indexNames for knowledgebaseId in knowledgebaseIds]
+        if len(table_names) > 1:
+            results = list(self.searchExecutor.map(search_table, table_names))
+        else:
+            results = [search_table(table_name) for table_name in table_names]
+        total_hits_count = 0
+        for table_name, r in zip(table_names, results):
+            if r is None:
+                continue
+            table_list.append(table_name)
+            df_list.append(r[0])
+            total_hits_count += r[1]
         if matchExprs:
-            res['Sum'] = res[score_column] + res[PAGERANK_FLD]
-            res = res.sort_values(by='Sum', ascending=False).reset_index(drop=True).drop(columns=['Sum'])
-            res = res.head(limit)
+            res = merge_dataframes_topk(df_list, output, score_column, limit)
+        else:
+            res = concat_dataframes(df_list, output)
         logger.debug(f"INFINITY search final result: {str(res)}")
         return res, total_hits_count
 
+    def scan(self, selectFields: list[str], condition: dict, indexNames: str | list[str], knowledgebaseIds: list[str],
+             batchSize: int = 1024) -> Iterator[object]:
+        """
+        Keyset scan of the table of each knowledge base in turn: every batch is the next `batchSize` rows by id.
+        """
+        if isinstance(indexNames, str):
+            indexNames = indexNames.split(",")
+        output = selectFields.copy()
+        if "id" not in output:
+            output.append("id")
+        for table_name in [f"{indexName}_{knowledgebaseId}" for indexName in indexNames for knowledgebaseId in knowledgebaseIds]:
+            filter_cond, last_id = None, None
+            while True:
+                # No pooled connection is held while the caller works on a batch.
+                inf_conn = self.connPool.get_conn()
+                try:
+                    try:
+                        table_instance = inf_conn.get_database(self.dbName).get_table(table_name)
+                    except Exception:
+                        break
+                    if condition and filter_cond is None:
+                        filter_cond = equivalent_condition_to_str(condition, table_instance)
+                    conds = [f"({filter_cond})"] if filter_cond else []
+                    if last_id is not None:
+                        conds.append("id > '{}'".format(last_id.replace("'", "''")))
+                    builder = table_instance.output(output)
+                    if conds:
+                        builder = builder.filter(" AND ".join(conds))
+                    kb_res, _ = builder.sort([["id", SortType.Asc]]).limit(batchSize).to_df()
+                    logger.debug(f"INFINITY scan table: {str(table_name)}, rows: {len(kb_res)}")
+                finally:
+                    self.connPool.release_conn(inf_conn)
+                if kb_res.empty:
+                    break
+                yield kb_res, len(kb_res)
+                if len(kb_res) < batchSize:
+                    break
+                last_id = str(kb_res["id"].iloc[-1])
+
     def get(
             self, chunkId: str, indexName: str, knowledgebaseIds: list[str]
     ) -> dict | None:
@@ -462,7 +581,8 @@ class InfinityConnection(DocStoreConnection):
         return res_fields.get(chunkId, None)
 
     def insert(
-            self, documents: list[dict], indexName: str, knowledgebaseId: str = None
+            self, documents: list[dict], indexName: str, knowledgebaseId: str = None,
+            vectorPrecision: str = DEFAULT_VECTOR_PRECISION
     ) -> list[str]:
         inf_conn = self.connPool.get_conn()
         db_instance = inf_conn.get_database(self.dbName)
@@ -482,17 +602,18 @@ class InfinityConnection(DocStoreConnection):
                     break
             if vector_size == 0:
                 raise ValueError("Cannot infer vector size from documents")
-            self.createIdx(indexName, knowledgebaseId, vector_size)
+            self.createIdx(indexName, knowledgebaseId, vector_size, vectorPrecision)
             table_instance = db_instance.get_table(table_name)
 
         # embedding fields can't have a default value....
         embedding_clmns = []
         clmns = table_instance.show_columns().rows()
         for n, ty, _, _ in clmns:
-            r = re.search(r"Embedding\([a-z]+,([0-9]+)\)", ty)
+            r = re.search(r"Embedding\([a-z0-9]+,([0-9]+)\)", ty)
             if not r:
                 continue
             embedding_clmns.append((n, int(r.group(1))))
+        int8_clmns = [n for n, ty in self._embedding_types(table_name, table_instance).items() if ty == "int8"]
 
         docs = copy.deepcopy(documents)
         for d in docs:
@@ -519,6 +640,9 @@ class InfinityConnection(DocStoreConnection):
                 else:
                     d[k] = v
 
+            for n in int8_clmns:
+                if n in d:
+                    d[n] = quantize_int8(d[n])
             for n, vs in embedding_clmns:
                 if n in d:
                     continue
@@ -673,6 +797,8 @@ class InfinityConnection(DocStoreConnection):
                 res2[column] = res2[column].apply(to_position_int)
             elif k in ["page_num_int", "top_int"]:
                 res2[column] = res2[column].apply(lambda v:[int(hex_val, 16) for hex_val in v.split('_')] if v else [])
+            elif re.search(r"_feas$", k):
+                res2[column] = res2[column].apply(rank_features)
             else:
                 pass
         for column in none_columns:
@@ -690,24 +816,7 @@ class InfinityConnection(DocStoreConnection):
             return {}
         for i in range(num_rows):
             id = column_id[i]
-            txt = res[fieldnm][i]
-            txt = re.sub(r"[\r\n]", " ", txt, flags=re.IGNORECASE | re.MULTILINE)
-            txts = []
-            for t in re.split(r"[.?!;\n]", txt):
-                for w in keywords:
-                    t = re.sub(
-                        r"(^|[ .?/'\"\(\)!,:;-])(%s)([ .?/'\"\(\)!,:;-])"
-                        % re.escape(w),
-                        r"\1<em>\2</em>\3",
-                        t,
-                        flags=re.IGNORECASE | re.MULTILINE,
-                    )
-                if not re.search(
-                        r"<em>[^<>]+</em>", t, flags=re.IGNORECASE | re.MULTILINE
-                ):
-                    continue
-                txts.append(t)
-            ans[id] = "...".join(txts)
+            ans[id] = highlight(res[fieldnm][i], keywords)
         return ans
 
     def getAggregation(self, res: tuple[pd.DataFrame, int] | pd.DataFrame, fieldnm: str):
@@ -0,0 +1,165 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Per-stage latency of chat and retrieval requests.
+
+A request opens `Spans`, its stages are timed with `span(stage)` wherever they run, including inside
+helpers that don't know about the request. When the request ends, every stage goes to a process-wide
+histogram and the whole breakdown to the slow request log if it took longer than SLOW_REQUEST_THRESHOLD_MS.
+Spans nest: those of a retrieval inside a chat are also reported as `retrieval.<stage>` of the chat.
+"""
+import json
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from timeit import default_timer as timer
+
+from rag.settings import SLOW_REQUEST_THRESHOLD_MS
+
+# Upper bounds in milliseconds, the last bucket holds everything slower.
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+_current: ContextVar["Spans | None"] = ContextVar("latency_spans", default=None)
+
+
+class StageHistograms:
+    def __init__(self, buckets=BUCKETS_MS):
+        self.buckets = buckets
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def observe(self, name: str, stage: str, ms: float):
+        with self.lock:
+            st = self.stats.get((name, stage))
+            if st is None:
+                st = self.stats[(name, stage)] = {"count": 0, "sum": 0., "max": 0., "buckets": [0] * (len(self.buckets) + 1)}
+            st["count"] += 1
+            st["sum"] += ms
+            st["max"] = max(st["max"], ms)
+            st["buckets"][bisect_left(self.buckets, ms)] += 1
+
+    def snapshot(self) -> dict:
+        """
+        {request: {stage: {count, sum_ms, max_ms, p50_ms, p95_ms, p99_ms, buckets: {le: count}}}}
+        """
+        with self.lock:
+            stats = {k: {**v, "buckets": list(v["buckets"])} for k, v in self.stats.items()}
+        res = {}
+        for (name, stage), st in sorted(stats.items()):
+            bounds = [*self.buckets, "+Inf"]
+            res.setdefault(name, {})[stage] = {
+                "count": st["count"],
+                "sum_ms": round(st["sum"], 1),
+                "max_ms": round(st["max"], 1),
+                **{f"p{q}_ms": self.quantile(st, q / 100.) for q in (50, 95, 99)},
+                "buckets": {str(b): c for b, c in zip(bounds, st["buckets"])},
+            }
+        return res
+
+    def quantile(self, st: dict, q: float) -> float:
+        # Upper bound of the bucket holding the quantile, the observed maximum for the last one.
+        rank, seen = q * st["count"], 0
+        for bound, c in zip(self.buckets, st["buckets"]):
+            seen += c
+            if seen >= rank:
+                return float(min(bound, round(st["max"], 1)))
+        return round(st["max"], 1)
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+
+
+LATENCY_HISTOGRAMS = StageHistograms()
+
+
+class Spans:
+    """
+    Wall time in milliseconds per stage of one request, a stage timed several times adds up.
+    `root` spans are never nested into the spans of the thread's previous request, should it leak.
+    """
+
+    def __init__(self, name: str, root: bool = False):
+        self.name = name
+        self.root = root
+        self.stages = {}
+        self.start = timer()
+        self.parent = None
+        self._token = None
+
+    def __enter__(self):
+        self.parent = None if self.root else _current.get()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # Generators may be closed from another context than the one they started in.
+            _current.set(self.parent)
+        # A closed generator is a client that went away, e.g. during a streamed answer.
+        self.finish(error="aborted" if exc_type is GeneratorExit else exc_type.__name__ if exc_type else None)
+        return False
+
+    def add(self, stage: str, ms: float):
+        self.stages[stage] = self.stages.get(stage, 0.) + ms
+
+    @contextmanager
+    def span(self, stage: str):
+        st = timer()
+        try:
+            yield
+        finally:
+            self.add(stage, (timer() - st) * 1000)
+
+    def elapsed(self) -> float:
+        return (timer() - self.start) * 1000
+
+    def summary(self) -> dict:
+        return {"total": round(self.elapsed(), 1), **{k: round(v, 1) for k, v in self.stages.items()}}
+
+    def finish(self, error: str | None = None):
+        total = self.elapsed()
+        for stage, ms in self.stages.items():
+            LATENCY_HISTOGRAMS.observe(self.name, stage, ms)
+        LATENCY_HISTOGRAMS.observe(self.name, "total", total)
+        if self.parent is not None:
+            for stage, ms in self.stages.items():
+                self.parent.add(f"{self.name}.{stage}", ms)
+        elif 0 < SLOW_REQUEST_THRESHOLD_MS <= total:
+            logging.warning("Slow {} request {:.1f}ms: {}".format(
+                self.name, total, json.dumps({**self.summary(), **({"error": error} if error else {})},
+                                             ensure_ascii=False)))
+
+
+@contextmanager
+def span(stage: str):
+    """
+    Times `stage` into the innermost request's spans, does nothing outside of any request.
+    """
+    spans = _current.get()
+    if spans is None:
+        yield
+        return
+    with spans.span(stage):
+        yield
+
+
+def current_spans() -> "Spans | None":
+    return _current.get()
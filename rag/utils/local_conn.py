@@ -0,0 +1,769 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Embedded doc engine running inside the RAGFlow processes, for single-node and test deployments.
+
+Like Elasticsearch there is one index per tenant. An index is kept in memory as its rows, a BM25
+inverted index of the tokenized fields and a flat numpy matrix per vector column. On disk it is a
+snapshot plus an append-only journal of upserted rows and deleted ids, which is how the API server
+and the task executors of one box see each other's writes.
+"""
+import fcntl
+import logging
+import math
+import os
+import pickle
+import re
+import shutil
+import threading
+from collections import Counter, defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import numpy as np
+
+from rag import settings
+from rag.settings import TAG_FLD, PAGERANK_FLD
+from rag.utils import singleton, get_float
+from rag.utils.doc_store_conn import DocStoreConnection, MatchExpr, OrderByExpr, MatchTextExpr, MatchDenseExpr, \
+    FusionExpr, DEFAULT_VECTOR_PRECISION, highlight
+
+logger = logging.getLogger('ragflow.local_conn')
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Size of a search without limit, the same as Elasticsearch's default.
+DEFAULT_SIZE = 10
+# The journal is folded into the snapshot once it holds more records than this or than the index has rows.
+COMPACT_MIN_RECORDS = 1024
+
+SNAPSHOT_FILE = "snapshot.pkl"
+JOURNAL_FILE = "journal.pkl"
+LOCK_FILE = "lock"
+
+TEXT_FIELD = re.compile(r"_(l?tks|kwd)$")
+VECTOR_FIELD = re.compile(r"^q_[0-9]+_vec$")
+QUERY_TOKEN = re.compile(r'"[^"]*"|[()]|[^\s()"]+')
+
+
+def field_tokens(fld: str, v) -> list[str]:
+    if v is None:
+        return []
+    if isinstance(v, list):
+        return [str(t).lower() for t in v if t is not None and str(t)]
+    if fld.endswith("_kwd"):
+        return [str(v).lower()] if str(v) else []
+    return str(v).lower().split()
+
+
+def field_terms(fld: str, tks: list[str]) -> Counter:
+    """
+    Term frequencies of a field, with the adjacent token pairs of tokenized text so phrases are looked up directly.
+    """
+    terms = Counter(tks)
+    if not fld.endswith("_kwd"):
+        terms.update(" ".join(p) for p in zip(tks, tks[1:]))
+    return terms
+
+
+def parse_query(txt: str) -> list[list[tuple[tuple[str, ...], float, int]]]:
+    """
+    Flattens the query_string built by `FulltextQueryer` into its top-level clauses.
+    Each clause is a list of (tokens, weight, slop) leaves, the weight being the product of all enclosing boosts.
+    """
+    toks = QUERY_TOKEN.findall(txt)
+
+    def modifiers(i, leaves):
+        while i < len(toks) and toks[i][0] in "^~":
+            # A slop and a boost may follow each other, as in "new york"~2^1.5.
+            for m in re.finditer(r"([\^~])([0-9.]+)", toks[i]):
+                if m.group(1) == "^":
+                    leaves = [(t, w * get_float(m.group(2)), s) for t, w, s in leaves]
+                else:
+                    leaves = [(t, w, int(get_float(m.group(2)))) for t, w, s in leaves]
+            i += 1
+        return i, leaves
+
+    def group(i):
+        clauses = []
+        while i < len(toks):
+            t = toks[i]
+            i += 1
+            if t == ")":
+                break
+            if t in ("OR", "AND") or t[0] in "^~":
+                continue
+            if t == "(":
+                sub, i = group(i)
+                leaves = [leaf for clause in sub for leaf in clause]
+            elif t[0] == '"':
+                leaves = [(tuple(re.sub(r"\\(.)", r"\1", t[1:-1]).lower().split()), 1.0, 0)]
+            else:
+                term, _, boost = re.sub(r"\\(.)", r"\1", t).partition("^")
+                term, _, slop = term.partition("~")
+                leaves = [((term.lower(),), get_float(boost) if boost else 1.0, 0)]
+            i, leaves = modifiers(i, leaves)
+            leaves = [leaf for leaf in leaves if leaf[0] and all(leaf[0])]
+            if leaves:
+                clauses.append(leaves)
+        return clauses, i
+
+    return group(0)[0]
+
+
+def minimum_should_match(v, n: int) -> int:
+    """
+    Number of top-level clauses to match, given a ratio, a percentage string or a count.
+    """
+    if isinstance(v, str) and v.endswith("%"):
+        v = get_float(v[:-1]) / 100.
+    elif isinstance(v, str):
+        v = int(get_float(v))
+    if isinstance(v, float):
+        v = int(n * v)
+    return max(1, min(n, v))
+
+
+def condition_filter(condition: dict):
+    """
+    Predicate of rows satisfying the conjunctive equivalent condition, with the semantics of ESConnection.
+    """
+    tests = []
+    for k, v in condition.items():
+        if k == "available_int":
+            if v == 0:
+                tests.append(lambda row: row.get("available_int") is not None and get_float(row["available_int"]) < 1)
+            else:
+                tests.append(lambda row: row.get("available_int") is None or get_float(row["available_int"]) >= 1)
+            continue
+        if k == "exists":
+            tests.append(lambda row, f=v: row.get(f) is not None)
+            continue
+        if k == "must_not":
+            if isinstance(v, dict) and "exists" in v:
+                tests.append(lambda row, f=v["exists"]: row.get(f) is None)
+            continue
+        if not v:
+            continue
+        if isinstance(v, list):
+            vs = set(v)
+        elif isinstance(v, str) or isinstance(v, int):
+            vs = {v}
+        else:
+            raise Exception(
+                f"Condition `{str(k)}={str(v)}` value type is {str(type(v))}, expected to be int, str or list.")
+
+        def test(row, k=k, vs=vs):
+            rv = row.get(k)
+            if isinstance(rv, list):
+                return any(x in vs for x in rv)
+            return rv in vs
+        tests.append(test)
+    return lambda row: all(t(row) for t in tests)
+
+
+class LocalIndex:
+    """
+    One index in memory, synchronized with its snapshot and journal files.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.RLock()
+        self.snapshotStat = None
+        self.journalInode = None
+        self.journalOffset = 0
+        self.journalRecords = 0
+        self._reset()
+
+    def _reset(self):
+        self.rows: dict[str, dict] = {}
+        # Rows are numbered by slot for the numpy scoring, slots of deleted rows stay empty until reloaded.
+        self.slots: dict[str, int] = {}
+        self.slotIds: list[str | None] = []
+        self.postings = defaultdict(lambda: defaultdict(dict))  # field => term => {slot: tf}
+        self.lengths = defaultdict(lambda: np.zeros(0, dtype=np.float32))  # field => token count by slot
+        self.docCount = defaultdict(int)
+        self.lengthSum = defaultdict(int)
+        self.matrices = {}  # vector column => (ids, row normalized matrix), rebuilt after writes
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        with self.lock, open(self._file(LOCK_FILE), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                self.sync()
+                yield self
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def reading(self):
+        return self._locked(False)
+
+    def writing(self):
+        return self._locked(True)
+
+    """
+    Rows and their inverted / vector indexes
+    """
+
+    def _put(self, row: dict):
+        cid = row["id"]
+        if cid in self.rows:
+            self._remove(cid)
+        self.rows[cid] = row
+        slot = self.slots[cid] = len(self.slotIds)
+        self.slotIds.append(cid)
+        for fld, v in row.items():
+            if VECTOR_FIELD.match(fld):
+                self.matrices.pop(fld, None)
+                continue
+            if not TEXT_FIELD.search(fld):
+                continue
+            tks = field_tokens(fld, v)
+            if not tks:
+                continue
+            postings = self.postings[fld]
+            for t, tf in field_terms(fld, tks).items():
+                postings[t][slot] = tf
+            lengths = self.lengths[fld]
+            if len(lengths) <= slot:
+                lengths = self.lengths[fld] = np.concatenate(
+                    [lengths, np.zeros(max(1024, slot + 1, len(lengths)), dtype=np.float32)])
+            lengths[slot] = len(tks)
+            self.docCount[fld] += 1
+            self.lengthSum[fld] += len(tks)
+
+    def _remove(self, cid: str):
+        row = self.rows.pop(cid, None)
+        if not row:
+            return
+        slot = self.slots.pop(cid)
+        self.slotIds[slot] = None
+        for fld, v in row.items():
+            if VECTOR_FIELD.match(fld):
+                self.matrices.pop(fld, None)
+                continue
+            if not TEXT_FIELD.search(fld):
+                continue
+            tks = field_tokens(fld, v)
+            if not tks:
+                continue
+            postings = self.postings[fld]
+            for t in field_terms(fld, tks):
+                postings[t].pop(slot, None)
+                if not postings[t]:
+                    del postings[t]
+            self.lengths[fld][slot] = 0
+            self.docCount[fld] -= 1
+            self.lengthSum[fld] -= len(tks)
+
+    def matrix(self, fld: str) -> tuple[list[str], np.ndarray]:
+        if fld not in self.matrices:
+            ids = [cid for cid, row in self.rows.items() if row.get(fld) is not None]
+            mat = np.vstack([self.rows[cid][fld] for cid in ids]) if ids else np.zeros((0, 0), dtype=np.float32)
+            if ids:
+                norms = np.linalg.norm(mat, axis=1, keepdims=True)
+                mat = mat / np.where(norms == 0, 1, norms)
+            self.matrices[fld] = (ids, mat)
+        return self.matrices[fld]
+
+    """
+    Persistence
+    """
+
+    @staticmethod
+    def _stat(fnm: str):
+        try:
+            st = os.stat(fnm)
+            return st.st_ino, st.st_mtime_ns, st.st_size
+        except FileNotFoundError:
+            return None
+
+    def _apply(self, op: str, payload: list):
+        if op == "put":
+            for row in payload:
+                self._put(row)
+        elif op == "delete":
+            for cid in payload:
+                self._remove(cid)
+
+    def sync(self):
+        """
+        Catches up with what other processes wrote since the last call.
+        """
+        snapshot = self._stat(self._file(SNAPSHOT_FILE))
+        if snapshot != self.snapshotStat:
+            self._reset()
+            if snapshot:
+                with open(self._file(SNAPSHOT_FILE), "rb") as f:
+                    self._apply("put", list(pickle.load(f).values()))
+            self.snapshotStat = snapshot
+            self.journalInode, self.journalOffset, self.journalRecords = None, 0, 0
+
+        journal = self._stat(self._file(JOURNAL_FILE))
+        if not journal:
+            return
+        if journal[0] != self.journalInode or journal[2] < self.journalOffset:
+            # Compacted by another process, its records are all in the snapshot loaded above.
+            self.journalInode, self.journalOffset, self.journalRecords = journal[0], 0, 0
+        if journal[2] == self.journalOffset:
+            return
+        with open(self._file(JOURNAL_FILE), "rb") as f:
+            f.seek(self.journalOffset)
+            while True:
+                try:
+                    op, payload = pickle.load(f)
+                except EOFError:
+                    break
+                self._apply(op, payload)
+                self.journalOffset = f.tell()
+                self.journalRecords += 1
+
+    def write(self, op: str, payload: list):
+        """
+        Applies and journals upserted rows or deleted ids. Callers hold `writing()`.
+        Records are whole rows, so replaying one twice is harmless.
+        """
+        if not payload:
+            return
+        self._apply(op, payload)
+        with open(self._file(JOURNAL_FILE), "ab") as f:
+            pickle.dump((op, payload), f, protocol=pickle.HIGHEST_PROTOCOL)
+            self.journalOffset = f.tell()
+        self.journalInode = self._stat(self._file(JOURNAL_FILE))[0]
+        self.journalRecords += 1
+        if self.journalRecords > max(COMPACT_MIN_RECORDS, len(self.rows)):
+            self.compact()
+
+    def compact(self):
+        if len(self.slotIds) > 2 * len(self.rows):
+            rows = self.rows
+            self._reset()
+            self._apply("put", list(rows.values()))
+        tmp = self._file(SNAPSHOT_FILE + ".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(self.rows, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._file(SNAPSHOT_FILE))
+        tmp = self._file(JOURNAL_FILE + ".tmp")
+        open(tmp, "wb").close()
+        os.replace(tmp, self._file(JOURNAL_FILE))
+        self.snapshotStat = self._stat(self._file(SNAPSHOT_FILE))
+        self.journalInode, self.journalOffset, self.journalRecords = self._stat(self._file(JOURNAL_FILE))[0], 0, 0
+
+    """
+    Scoring
+    """
+
+    def _bm25(self, fld: str, tk: str) -> np.ndarray | None:
+        """
+        BM25 of a term in a field for every slot, None if no row has it.
+        """
+        postings = self.postings.get(fld, {}).get(tk)
+        if not postings:
+            return None
+        slots = np.fromiter(postings.keys(), dtype=np.int64, count=len(postings))
+        tf = np.fromiter(postings.values(), dtype=np.float32, count=len(postings))
+        n = self.docCount[fld]
+        idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+        dl = self.lengths[fld][slots] / (self.lengthSum[fld] / n)
+        scores = np.zeros(len(self.slotIds), dtype=np.float32)
+        scores[slots] = idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * dl))
+        return scores
+
+    def _leaf(self, fld: str, tks: tuple[str, ...], slop: int) -> np.ndarray | None:
+        """
+        Sum of the terms' BM25 over the rows having all of them, adjacent ones unless the phrase has a slop.
+        """
+        scores = None
+        for tk in tks:
+            sc = self._bm25(fld, tk)
+            if sc is None:
+                return None
+            scores = sc if scores is None else np.where(scores * sc > 0, scores + sc, 0)
+        if len(tks) > 1 and slop == 0 and not fld.endswith("_kwd"):
+            for pair in zip(tks, tks[1:]):
+                sc = self._bm25(fld, " ".join(pair))
+                if sc is None:
+                    return None
+                scores = np.where(sc > 0, scores, 0)
+        return scores
+
+    def match_text(self, m: MatchTextExpr) -> dict[str, float]:
+        """
+        query_string of type best_fields: every leaf scores the max of its boosted per-field BM25,
+        and a row has to match `minimum_should_match` of the top-level clauses.
+        """
+        fields = []
+        for f in m.fields:
+            fld, _, boost = f.partition("^")
+            fields.append((fld, get_float(boost) if boost else 1.0))
+        clauses = parse_query(m.matching_text)
+        scores = np.zeros(len(self.slotIds), dtype=np.float32)
+        matched = np.zeros(len(self.slotIds), dtype=np.int32)
+        for clause in clauses:
+            hit = np.zeros(len(self.slotIds), dtype=bool)
+            for tks, weight, slop in clause:
+                best = None
+                for fld, boost in fields:
+                    sc = self._leaf(fld, tks, slop)
+                    if sc is not None:
+                        best = sc * boost if best is None else np.maximum(best, sc * boost)
+                if best is not None:
+                    scores += best * weight
+                    hit |= best > 0
+            matched += hit
+        msm = minimum_should_match(m.extra_options.get("minimum_should_match", 0.0), len(clauses))
+        return {self.slotIds[slot]: float(scores[slot]) for slot in np.flatnonzero(matched >= msm)}
+
+    def match_dense(self, m: MatchDenseExpr, test, candidates: set | None = None) -> dict[str, float]:
+        """
+        Flat cosine k-NN over the rows passing `test` (and within `candidates` if given).
+        """
+        ids, mat = self.matrix(m.vector_column_name)
+        if not ids:
+            return {}
+        qv = np.asarray(m.embedding_data, dtype=np.float32)
+        qv = qv / (np.linalg.norm(qv) or 1)
+        sims = mat @ qv
+        similarity = get_float(m.extra_options.get("similarity", 0.0))
+        res = {}
+        for j in np.argsort(-sims):
+            if sims[j] < similarity:
+                break
+            cid = ids[j]
+            if candidates is not None and cid not in candidates:
+                continue
+            if not test(self.rows[cid]):
+                continue
+            res[cid] = float(sims[j])
+            if len(res) >= m.topn:
+                break
+        return res
+
+
+@singleton
+class LocalConnection(DocStoreConnection):
+    def __init__(self):
+        self.path = settings.LOCAL["path"]
+        os.makedirs(self.path, exist_ok=True)
+        self.indices: dict[str, LocalIndex] = {}
+        self.lock = threading.Lock()
+        logger.info(f"Use the embedded doc engine at {self.path}.")
+
+    def _index(self, indexName: str) -> LocalIndex | None:
+        path = os.path.join(self.path, indexName)
+        with self.lock:
+            if not os.path.isdir(path):
+                # It may have been deleted by another process.
+                self.indices.pop(indexName, None)
+                return None
+            if indexName not in self.indices:
+                self.indices[indexName] = LocalIndex(path)
+            return self.indices[indexName]
+
+    """
+    Database operations
+    """
+
+    def dbType(self) -> str:
+        return "local"
+
+    def health(self) -> dict:
+        return {"type": "local", "status": "green", "path": self.path,
+                "indices": len([d for d in os.listdir(self.path) if os.path.isdir(os.path.join(self.path, d))])}
+
+    """
+    Table operations
+    """
+
+    def createIdx(self, indexName: str, knowledgebaseId: str, vectorSize: int,
+                  vectorPrecision: str = DEFAULT_VECTOR_PRECISION):
+        if vectorPrecision != DEFAULT_VECTOR_PRECISION:
+            logger.warning(f"The embedded doc engine keeps {vectorPrecision} vectors as float32.")
+        os.makedirs(os.path.join(self.path, indexName), exist_ok=True)
+        return True
+
+    def deleteIdx(self, indexName: str, knowledgebaseId: str):
+        if len(knowledgebaseId) > 0:
+            # The index need to be alive after any kb deletion since all kb under this tenant are in one index.
+            return
+        with self.lock:
+            self.indices.pop(indexName, None)
+            shutil.rmtree(os.path.join(self.path, indexName), ignore_errors=True)
+
+    def indexExist(self, indexName: str, knowledgebaseId: str = None) -> bool:
+        return os.path.isdir(os.path.join(self.path, indexName))
+
+    """
+    CRUD operations
+    """
+
+    def search(
+            self, selectFields: list[str],
+            highlightFields: list[str],
+            condition: dict,
+            matchExprs: list[MatchExpr],
+            orderBy: OrderByExpr,
+            offset: int,
+            limit: int,
+            indexNames: str | list[str],
+            knowledgebaseIds: list[str],
+            aggFields: list[str] = [],
+            rank_feature: dict | None = None,
+            trackTotalHits: bool | int = True
+    ) -> dict:
+        """
+        Same matching and scoring structure as ESConnection.search: the hybrid query returns the rows matching
+        the text, scored by (1 - vector weight) * BM25 plus (1 + cosine) / 2 of those in the k-NN top n.
+        The total is exact whatever `trackTotalHits`, scoring visits every match anyway.
+        """
+        if isinstance(indexNames, str):
+            indexNames = indexNames.split(",")
+        assert isinstance(indexNames, list) and len(indexNames) > 0
+        assert "_id" not in condition
+        test = condition_filter({**condition, "kb_id": knowledgebaseIds})
+
+        matchText = next((m for m in matchExprs if isinstance(m, MatchTextExpr)), None)
+        matchDense = next((m for m in matchExprs if isinstance(m, MatchDenseExpr)), None)
+        vector_similarity_weight = 0.5
+        for m in matchExprs:
+            if isinstance(m, FusionExpr) and m.method == "weighted_sum" and "weights" in m.fusion_params:
+                vector_similarity_weight = get_float(m.fusion_params["weights"].split(",")[1])
+
+        hits = []
+        for indexName in indexNames:
+            idx = self._index(indexName)
+            if not idx:
+                continue
+            with idx.reading():
+                if matchText:
+                    scores = {cid: sc * (1.0 - vector_similarity_weight)
+                              for cid, sc in idx.match_text(matchText).items() if test(idx.rows[cid])}
+                    if matchDense:
+                        for cid, sim in idx.match_dense(matchDense, test, set(scores.keys())).items():
+                            scores[cid] += (1 + sim) / 2
+                elif matchDense:
+                    scores = {cid: (1 + sim) / 2 for cid, sim in idx.match_dense(matchDense, test).items()}
+                else:
+                    scores = {cid: 0.0 for cid, row in idx.rows.items() if test(row)}
+                if rank_feature and matchExprs:
+                    for cid in scores:
+                        scores[cid] += self._rank_feature_score(idx.rows[cid], rank_feature)
+                hits.extend({"id": cid, "score": sc, "source": idx.rows[cid]} for cid, sc in scores.items())
+
+        if matchExprs:
+            hits.sort(key=lambda h: h["score"], reverse=True)
+        if orderBy and orderBy.fields:
+            hits = self._sort(hits, orderBy)
+
+        aggregations = {}
+        for fld in aggFields:
+            counts = defaultdict(int)
+            for h in hits:
+                v = h["source"].get(fld)
+                for k in (v if isinstance(v, list) else [v]):
+                    if k is not None:
+                        counts[k] += 1
+            aggregations[fld] = sorted(counts.items(), key=lambda kc: (-kc[1], str(kc[0])))
+
+        total = len(hits)
+        hits = hits[offset:offset + limit] if limit > 0 else hits[:DEFAULT_SIZE]
+        return {"total": total, "hits": hits, "aggregations": aggregations, "highlight": bool(highlightFields)}
+
+    def scan(self, selectFields: list[str], condition: dict, indexNames: str | list[str], knowledgebaseIds: list[str],
+             batchSize: int = 1024) -> Iterator[object]:
+        """
+        The matching ids are collected once, then read batch by batch, skipping those deleted meanwhile.
+        """
+        if isinstance(indexNames, str):
+            indexNames = indexNames.split(",")
+        test = condition_filter({**condition, "kb_id": knowledgebaseIds})
+        for indexName in indexNames:
+            idx = self._index(indexName)
+            if not idx:
+                continue
+            with idx.reading():
+                ids = [cid for cid, row in idx.rows.items() if test(row)]
+            for i in range(0, len(ids), batchSize):
+                with idx.reading():
+                    hits = [{"id": cid, "score": 0.0, "source": idx.rows[cid]} for cid in ids[i:i + batchSize]
+                            if cid in idx.rows]
+                if hits:
+                    yield {"total": len(hits), "hits": hits, "aggregations": {}, "highlight": False}
+
+    @staticmethod
+    def _rank_feature_score(row: dict, rank_feature: dict) -> float:
+        tags = row.get(TAG_FLD) or {}
+        score = 0.
+        for fld, sc in rank_feature.items():
+            v = row.get(PAGERANK_FLD) if fld == PAGERANK_FLD else tags.get(fld)
+            score += get_float(v) * sc if v else 0.
+        return score
+
+    @staticmethod
+    def _sort(hits: list[dict], orderBy: OrderByExpr) -> list[dict]:
+        # Stable sorts from the last key to the first, rows missing a field go last as in Elasticsearch.
+        for field, order in reversed(orderBy.fields):
+            present, missing = [], []
+            for h in hits:
+                v = h["source"].get(field)
+                if isinstance(v, list):
+                    v = np.mean([get_float(x) for x in v]) if v else None
+                elif v is not None and (field.endswith("_int") or field.endswith("_flt")):
+                    v = get_float(v)
+                elif v is not None:
+                    v = str(v)
+                (missing if v is None else present).append((v, h))
+            present.sort(key=lambda vh: vh[0], reverse=order == 1)
+            hits = [h for _, h in present] + [h for _, h in missing]
+        return hits
+
+    @staticmethod
+    def _output(row: dict) -> dict:
+        return {k: v.tolist() if isinstance(v, np.ndarray) else v for k, v in row.items()}
+
+    @staticmethod
+    def _input(row: dict) -> dict:
+        return {k: np.asarray(v, dtype=np.float32) if VECTOR_FIELD.match(k) and v is not None else v
+                for k, v in row.items()}
+
+    def get(self, chunkId: str, indexName: str, knowledgebaseIds: list[str]) -> dict | None:
+        idx = self._index(indexName)
+        if not idx:
+            return None
+        with idx.reading():
+            row = idx.rows.get(chunkId)
+        return self._output(row) if row else None
+
+    def insert(self, documents: list[dict], indexName: str, knowledgebaseId: str = None,
+               vectorPrecision: str = DEFAULT_VECTOR_PRECISION) -> list[str]:
+        rows = []
+        for d in documents:
+            assert "_id" not in d
+            assert "id" in d
+            row = self._input(d)
+            row["kb_id"] = knowledgebaseId
+            rows.append(row)
+        idx = self._index(indexName)
+        if not idx:
+            return [f"Index {indexName} doesn't exist."]
+        with idx.writing():
+            idx.write("put", rows)
+        return []
+
+    def update(self, condition: dict, newValue: dict, indexName: str, knowledgebaseId: str) -> bool:
+        idx = self._index(indexName)
+        if not idx:
+            return False
+        condition = {**condition, "kb_id": knowledgebaseId}
+        single = "id" in condition and isinstance(condition["id"], str)
+        test = condition_filter(condition)
+        with idx.writing():
+            if single:
+                row = idx.rows.get(condition["id"])
+                rows = [row] if row and test(row) else []
+                if not rows:
+                    return False
+            else:
+                rows = [row for row in idx.rows.values() if test(row)]
+            idx.write("put", [self._updated(row, newValue, single) for row in rows])
+        return True
+
+    def _updated(self, row: dict, newValue: dict, single: bool) -> dict:
+        row = dict(row)
+        for k, v in self._input(newValue).items():
+            if k == "id":
+                continue
+            if k == "remove":
+                if isinstance(v, str):
+                    row.pop(v, None)
+                elif isinstance(v, dict):
+                    for kk, vv in v.items():
+                        row[kk] = [x for x in (row.get(kk) or []) if x != vv]
+                continue
+            if k == "add":
+                if isinstance(v, dict):
+                    for kk, vv in v.items():
+                        row[kk] = list(row.get(kk) or []) + [vv.strip() if isinstance(vv, str) else vv]
+                continue
+            if not single and not isinstance(v, np.ndarray) and not v and k != "available_int":
+                continue
+            row[k] = v
+        return row
+
+    def delete(self, condition: dict, indexName: str, knowledgebaseId: str) -> int:
+        assert "_id" not in condition
+        idx = self._index(indexName)
+        if not idx:
+            return 0
+        test = condition_filter({**condition, "kb_id": knowledgebaseId})
+        with idx.writing():
+            ids = [cid for cid, row in idx.rows.items() if test(row)]
+            idx.write("delete", ids)
+        return len(ids)
+
+    """
+    Helper functions for search result
+    """
+
+    def getTotal(self, res):
+        return res["total"]
+
+    def getChunkIds(self, res):
+        return [h["id"] for h in res["hits"]]
+
+    def getFields(self, res, fields: list[str]) -> dict[str, dict]:
+        res_fields = {}
+        if not fields:
+            return {}
+        for h in res["hits"]:
+            d = {**h["source"], "id": h["id"], "_score": h["score"]}
+            m = {n: d.get(n) for n in fields if d.get(n) is not None}
+            for n, v in m.items():
+                if isinstance(v, np.ndarray):
+                    m[n] = v.tolist()
+                elif isinstance(v, list) or isinstance(v, dict) or re.search(r"_feas?$", n):
+                    continue
+                elif not isinstance(v, str):
+                    m[n] = str(v)
+            if m:
+                res_fields[h["id"]] = m
+        return res_fields
+
+    def getHighlight(self, res, keywords: list[str], fieldnm: str):
+        if not res["highlight"]:
+            return {}
+        ans = {}
+        for h in res["hits"]:
+            txt = highlight(h["source"].get(fieldnm) or "", keywords)
+            if txt:
+                ans[h["id"]] = txt
+        return ans
+
+    def getAggregation(self, res, fieldnm: str):
+        return res["aggregations"].get(fieldnm, [])
+
+    """
+    SQL
+    """
+
+    def sql(self, sql: str, fetch_size: int, format: str):
+        logger.warning("The embedded doc engine doesn't support SQL.")
+        return None
@@ -21,6 +21,7 @@ import time
 import os
 
 import copy
+from collections.abc import Iterator
 from opensearchpy import OpenSearch, NotFoundError
 from opensearchpy import UpdateByQuery, Q, Search, Index
 from opensearchpy import ConnectionTimeout
@@ -29,10 +30,12 @@ from rag.settings import TAG_FLD, PAGERANK_FLD
 from rag.utils import singleton
 from api.utils.file_utils import get_project_base_directory
 from rag.utils.doc_store_conn import DocStoreConnection, MatchExpr, OrderByExpr, MatchTextExpr, MatchDenseExpr, \
-    FusionExpr
+    FusionExpr, DEFAULT_VECTOR_PRECISION, highlight
 from rag.nlp import is_english, rag_tokenizer
 
 ATTEMPT_TIME = 2
+# How long the scroll of `scan` lives between two batches.
+SCAN_KEEP_ALIVE = "5m"
 
 logger = logging.getLogger('ragflow.opensearch_conn')
 
@@ -91,13 +94,45 @@ class OSConnection(DocStoreConnection):
     Table operations
     """
 
-    def createIdx(self, indexName: str, knowledgebaseId: str, vectorSize: int):
+    def _vector_mapping(self, vectorSize: int, vectorPrecision: str) -> dict | None:
+        """
+        Explicit mapping of `q_{vectorSize}_vec` for a compact precision, None to keep the dynamic template.
+        """
+        if vectorPrecision == "int8":
+            # Lucene scalar quantization, requires OpenSearch 2.16+
+            method = {"name": "hnsw", "engine": "lucene", "space_type": "cosinesimil",
+                      "parameters": {"encoder": {"name": "sq"}}}
+        elif vectorPrecision == "float16":
+            # Faiss fp16 scalar quantization, cosinesimil requires OpenSearch 2.19+
+            method = {"name": "hnsw", "engine": "faiss", "space_type": "cosinesimil",
+                      "parameters": {"encoder": {"name": "sq", "parameters": {"type": "fp16"}}}}
+        else:
+            return None
+        return {"type": "knn_vector", "index": True, "dimension": vectorSize, "method": method}
+
+    def createIdx(self, indexName: str, knowledgebaseId: str, vectorSize: int,
+                  vectorPrecision: str = DEFAULT_VECTOR_PRECISION):
+        vector_mapping = self._vector_mapping(vectorSize, vectorPrecision)
+        vector_name = f"q_{vectorSize}_vec"
         if self.indexExist(indexName, knowledgebaseId):
+            if not vector_mapping:
+                return True
+            # All knowledge bases of a tenant share one index, so the first one mapping the vector field decides its precision.
+            try:
+                if self.os.indices.get_field_mapping(index=indexName, fields=vector_name).get(indexName, {}).get("mappings"):
+                    return True
+                return self.os.indices.put_mapping(index=indexName, body={"properties": {vector_name: vector_mapping}})
+            except Exception:
+                logger.exception("OSConnection.createIndex error %s" % (indexName))
             return True
         try:
             from opensearchpy.client import IndicesClient
+            mapping = self.mapping
+            if vector_mapping:
+                mapping = copy.deepcopy(mapping)
+                mapping["mappings"].setdefault("properties", {})[vector_name] = vector_mapping
             return IndicesClient(self.os).create(index=indexName,
-                                                 body=self.mapping)
+                                                 body=mapping)
         except Exception:
             logger.exception("OSConnection.createIndex error %s" % (indexName))
 
@@ -139,7 +174,8 @@ class OSConnection(DocStoreConnection):
             indexNames: str | list[str],
             knowledgebaseIds: list[str],
             aggFields: list[str] = [],
-            rank_feature: dict | None = None
+            rank_feature: dict | None = None,
+            trackTotalHits: bool | int = True
     ):
         """
         Refers to https://github.com/opensearch-project/opensearch-py/blob/main/guides/dsl.md
@@ -148,27 +184,7 @@ class OSConnection(DocStoreConnection):
         if isinstance(indexNames, str):
             indexNames = indexNames.split(",")
         assert isinstance(indexNames, list) and len(indexNames) > 0
-        assert "_id" not in condition
-
-        bqry = Q("bool", must=[])
-        condition["kb_id"] = knowledgebaseIds
-        for k, v in condition.items():
-            if k == "available_int":
-                if v == 0:
-                    bqry.filter.append(Q("range", available_int={"lt": 1}))
-                else:
-                    bqry.filter.append(
-                        Q("bool", must_not=Q("range", available_int={"lt": 1})))
-                continue
-            if not v:
-                continue
-            if isinstance(v, list):
-                bqry.filter.append(Q("terms", **{k: v}))
-            elif isinstance(v, str) or isinstance(v, int):
-                bqry.filter.append(Q("term", **{k: v}))
-            else:
-                raise Exception(
-                    f"Condition `{str(k)}={str(v)}` value type is {str(type(v))}, expected to be int, str or list.")
+        bqry = self._condition_query(condition, knowledgebaseIds)
 
         s = Search()
         vector_similarity_weight = 0.5
@@ -251,7 +267,7 @@ class OSConnection(DocStoreConnection):
                                      body=q,
                                      timeout=600,
                                      # search_type="dfs_query_then_fetch",
-                                     track_total_hits=True,
+                                     track_total_hits=trackTotalHits,
                                      _source=True)
                 if str(res.get("timed_out", "")).lower() == "true":
                     raise Exception("OpenSearch Timeout.")
@@ -265,6 +281,61 @@ class OSConnection(DocStoreConnection):
         logger.error("OSConnection.search timeout for 3 times!")
         raise Exception("OSConnection.search timeout.")
 
+    @staticmethod
+    def _condition_query(condition: dict, knowledgebaseIds: list[str]):
+        assert "_id" not in condition
+        bqry = Q("bool", must=[])
+        condition["kb_id"] = knowledgebaseIds
+        for k, v in condition.items():
+            if k == "available_int":
+                if v == 0:
+                    bqry.filter.append(Q("range", available_int={"lt": 1}))
+                else:
+                    bqry.filter.append(
+                        Q("bool", must_not=Q("range", available_int={"lt": 1})))
+                continue
+            if not v:
+                continue
+            if isinstance(v, list):
+                bqry.filter.append(Q("terms", **{k: v}))
+            elif isinstance(v, str) or isinstance(v, int):
+                bqry.filter.append(Q("term", **{k: v}))
+            else:
+                raise Exception(
+                    f"Condition `{str(k)}={str(v)}` value type is {str(type(v))}, expected to be int, str or list.")
+        return bqry
+
+    def scan(self, selectFields: list[str], condition: dict, indexNames: str | list[str], knowledgebaseIds: list[str],
+             batchSize: int = 1024) -> Iterator[object]:
+        """
+        Scroll in index order, which resumes each batch where the previous one ended like a point in time does.
+        Refers to https://opensearch.org/docs/latest/search-plugins/searching-data/paginate/#scroll-search
+        """
+        if isinstance(indexNames, str):
+            indexNames = indexNames.split(",")
+        q = Search().query(self._condition_query(dict(condition), knowledgebaseIds)).sort("_doc").to_dict()
+        try:
+            res = self.os.search(index=indexNames, body=q, size=batchSize, scroll=SCAN_KEEP_ALIVE,
+                                 timeout=600, track_total_hits=False, _source=True)
+        except NotFoundError:
+            return
+        scrollId = res.get("_scroll_id")
+        try:
+            while True:
+                hits = res["hits"]["hits"]
+                if not hits:
+                    return
+                yield res
+                if len(hits) < batchSize:
+                    return
+                res = self.os.scroll(scroll_id=scrollId, scroll=SCAN_KEEP_ALIVE)
+                scrollId = res.get("_scroll_id", scrollId)
+        finally:
+            try:
+                self.os.clear_scroll(scroll_id=scrollId)
+            except Exception:
+                logger.warning("OSConnection.scan failed to clear its scroll")
+
     def get(self, chunkId: str, indexName: str, knowledgebaseIds: list[str]) -> dict | None:
         for i in range(ATTEMPT_TIME):
             try:
@@ -285,7 +356,8 @@ class OSConnection(DocStoreConnection):
         logger.error("OSConnection.get timeout for 3 times!")
         raise Exception("OSConnection.get timeout.")
 
-    def insert(self, documents: list[dict], indexName: str, knowledgebaseId: str = None) -> list[str]:
+    def insert(self, documents: list[dict], indexName: str, knowledgebaseId: str = None,
+               vectorPrecision: str = DEFAULT_VECTOR_PRECISION) -> list[str]:
         # Refers to https://opensearch.org/docs/latest/api-reference/document-apis/bulk/
         operations = []
         for d in documents:
@@ -481,6 +553,9 @@ class OSConnection(DocStoreConnection):
                 if isinstance(v, list):
                     m[n] = v
                     continue
+                if isinstance(v, dict) or re.search(r"_feas?$", n):
+                    # Rank features are scored numerically, keep them native instead of repr strings.
+                    continue
                 if not isinstance(v, str):
                     m[n] = str(m[n])
                 # if n.find("tks") > 0:
@@ -501,17 +576,8 @@ class OSConnection(DocStoreConnection):
                 ans[d["_id"]] = txt
                 continue
 
-            txt = d["_source"][fieldnm]
-            txt = re.sub(r"[\r\n]", " ", txt, flags=re.IGNORECASE | re.MULTILINE)
-            txts = []
-            for t in re.split(r"[.?!;\n]", txt):
-                for w in keywords:
-                    t = re.sub(r"(^|[ .?/'\"\(\)!,:;-])(%s)([ .?/'\"\(\)!,:;-])" % re.escape(w), r"\1<em>\2</em>\3", t,
-                               flags=re.IGNORECASE | re.MULTILINE)
-                if not re.search(r"<em>[^<>]+</em>", t, flags=re.IGNORECASE | re.MULTILINE):
-                    continue
-                txts.append(t)
-            ans[d["_id"]] = "...".join(txts) if txts else "...".join([a for a in list(hlts.items())[0][1]])
+            txt = highlight(d["_source"][fieldnm], keywords)
+            ans[d["_id"]] = txt if txt else "...".join([a for a in list(hlts.items())[0][1]])
 
         return ans
 
@@ -159,6 +159,26 @@ class RedisDB:
             self.__open__()
         return None
 
+    def incr(self, key: str):
+        try:
+            return self.REDIS.incr(key)
+        except Exception as e:
+            logging.warning("RedisDB.incr " + str(key) + " got exception: " + str(e))
+            self.__open__()
+        return None
+
+    def publish(self, channel: str, message: str):
+        try:
+            self.REDIS.publish(channel, message)
+            return True
+        except Exception as e:
+            logging.warning("RedisDB.publish " + str(channel) + " got exception: " + str(e))
+            self.__open__()
+        return False
+
+    def pubsub(self):
+        return self.REDIS.pubsub(ignore_subscribe_messages=True)
+
     def zadd(self, key: str, member: str, score: float):
         try:
             self.REDIS.zadd(key, {member: score})
@@ -197,6 +217,30 @@ class RedisDB:
             self.__open__()
         return None
 
+    def hmget(self, key: str, fields: list[str]):
+        if not self.REDIS:
+            return [None] * len(fields)
+        try:
+            return self.REDIS.hmget(key, fields)
+        except Exception as e:
+            logging.warning("RedisDB.hmget " + str(key) + " got exception: " + str(e))
+            self.__open__()
+        return [None] * len(fields)
+
+    def hset(self, key: str, mapping: dict, exp=3600):
+        if not self.REDIS:
+            return False
+        try:
+            pipeline = self.REDIS.pipeline(transaction=False)
+            pipeline.hset(key, mapping=mapping)
+            pipeline.expire(key, exp)
+            pipeline.execute()
+            return True
+        except Exception as e:
+            logging.warning("RedisDB.hset " + str(key) + " got exception: " + str(e))
+            self.__open__()
+        return False
+
     def transaction(self, key, value, exp=3600):
         try:
             pipeline = self.REDIS.pipeline(transaction=True)
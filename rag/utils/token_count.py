@@ -0,0 +1,132 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Token accounting with the cl100k_base encoder of `rag.utils`.
+
+`count` is the number of tokens of a string, remembered in an LRU cache since chunks and prompt parts are
+counted again and again. `count_many` counts a batch, encoding the strings not in the cache in parallel,
+tiktoken releasing the GIL. `approx_count` estimates the count without encoding, for decisions that don't
+need it exact, and `truncate` only encodes what it has to.
+"""
+import re
+import threading
+
+from cachetools import LRUCache
+
+from rag.settings import TOKEN_COUNT_CACHE_SIZE, TOKEN_COUNT_THREADS
+from rag.utils import encoder
+
+# Strings longer than this, or than the whole cache, are counted without being cached.
+CACHE_MAX_CHARS = 65536
+# Batches of fewer characters are encoded in the calling thread, threads cost more than they save.
+BATCH_MIN_CHARS = 8192
+
+# text -> (tokens, characters), sized in characters of the cached strings.
+_cache = LRUCache(maxsize=TOKEN_COUNT_CACHE_SIZE, getsizeof=lambda v: v[1]) if TOKEN_COUNT_CACHE_SIZE > 0 else None
+_lock = threading.Lock()
+
+# Characters cl100k_base encodes in about a token each: CJK, kana, hangul and full-width forms.
+_WIDE = re.compile(r"[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+
+
+def _cacheable(text: str) -> bool:
+    return _cache is not None and len(text) <= min(CACHE_MAX_CHARS, _cache.maxsize)
+
+
+def _encode_count(text: str) -> int:
+    try:
+        return len(encoder.encode(text))
+    except Exception:
+        return 0
+
+
+def count(text: str) -> int:
+    """
+    Number of tokens of `text`, 0 if it can't be encoded, such as with special tokens in it.
+    """
+    if not _cacheable(text):
+        return _encode_count(text)
+    with _lock:
+        v = _cache.get(text)
+    if v is None:
+        v = (_encode_count(text), len(text))
+        with _lock:
+            _cache[text] = v
+    return v[0]
+
+
+def count_many(texts: list[str]) -> list[int]:
+    """
+    `count` of every text, the ones not cached encoded at once on TOKEN_COUNT_THREADS threads.
+    """
+    res, missed = [0] * len(texts), {}
+    with _lock:
+        for i, text in enumerate(texts):
+            v = _cache.get(text) if _cacheable(text) else None
+            if v is None:
+                missed.setdefault(text, []).append(i)
+            else:
+                res[i] = v[0]
+    if not missed:
+        return res
+
+    todo = list(missed.keys())
+    ns = None
+    if TOKEN_COUNT_THREADS > 1 and len(todo) > 1 and sum(len(t) for t in todo) >= BATCH_MIN_CHARS:
+        try:
+            ns = [len(ids) for ids in encoder.encode_batch(todo, num_threads=TOKEN_COUNT_THREADS)]
+        except Exception:
+            # A text that can't be encoded fails the whole batch, it counts 0 on its own.
+            ns = None
+    if ns is None:
+        ns = [_encode_count(t) for t in todo]
+    with _lock:
+        for text, n in zip(todo, ns):
+            for i in missed[text]:
+                res[i] = n
+            if _cacheable(text):
+                _cache[text] = (n, len(text))
+    return res
+
+
+def approx_count(text: str) -> int:
+    """
+    Estimated number of tokens of `text`: a token per CJK character and one per 4 other characters. It is
+    off by tens of percent, for budgets and thresholds that tolerate it.
+    """
+    wide = len(_WIDE.findall(text))
+    return wide + (len(text) - wide + 3) // 4
+
+
+def truncate(text: str, max_len: int) -> str:
+    """
+    The first `max_len` tokens of `text`. Texts known to fit are returned as they are without decoding.
+    """
+    # No token is shorter than a byte, nor a character longer than 4.
+    if len(text) * 4 <= max_len:
+        return text
+    if _cacheable(text):
+        with _lock:
+            v = _cache.get(text)
+        if v is not None and v[0] <= max_len:
+            return text
+    ids = encoder.encode(text)
+    if _cacheable(text):
+        with _lock:
+            _cache[text] = (len(ids), len(text))
+    if len(ids) <= max_len:
+        return text
+    return encoder.decode(ids[:max_len])
@@ -225,6 +225,39 @@ class RAGFlow:
             return chunks
         raise Exception(res.get("message"))
 
+    def batch_retrieve(
+        self,
+        dataset_ids,
+        questions: list[str],
+        document_ids=None,
+        page=1,
+        page_size=30,
+        similarity_threshold=0.2,
+        vector_similarity_weight=0.3,
+        top_k=1024,
+        rerank_id: str | None = None,
+        keyword: bool = False,
+    ):
+        if document_ids is None:
+            document_ids = []
+        data_json = {
+            "page": page,
+            "page_size": page_size,
+            "similarity_threshold": similarity_threshold,
+            "vector_similarity_weight": vector_similarity_weight,
+            "top_k": top_k,
+            "rerank_id": rerank_id,
+            "keyword": keyword,
+            "questions": questions,
+            "dataset_ids": dataset_ids,
+            "document_ids": document_ids,
+        }
+        res = self.post("/retrieval/batch", json=data_json)
+        res = res.json()
+        if res.get("code") == 0:
+            return [[Chunk(self, chunk_data) for chunk_data in ranks.get("chunks")] for ranks in res["data"]]
+        raise Exception(res.get("message"))
+
     def list_agents(self, page: int = 1, page_size: int = 30, orderby: str = "update_time", desc: bool = True, id: str | None = None, title: str | None = None) -> list[Agent]:
         res = self.get(
             "/agents",
@@ -0,0 +1,80 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import pytest
+from common import (
+    INVALID_API_TOKEN,
+    batch_retrieval_chunks,
+    retrieval_chunks,
+)
+from libs.auth import RAGFlowHttpApiAuth
+
+
+@pytest.mark.p1
+class TestAuthorization:
+    @pytest.mark.parametrize(
+        "invalid_auth, expected_code, expected_message",
+        [
+            (None, 0, "`Authorization` can't be empty"),
+            (
+                RAGFlowHttpApiAuth(INVALID_API_TOKEN),
+                109,
+                "Authentication error: API key is invalid!",
+            ),
+        ],
+    )
+    def test_invalid_auth(self, invalid_auth, expected_code, expected_message):
+        res = batch_retrieval_chunks(invalid_auth)
+        assert res["code"] == expected_code
+        assert res["message"] == expected_message
+
+
+class TestChunksBatchRetrieval:
+    @pytest.mark.p1
+    @pytest.mark.parametrize(
+        "payload, expected_code, expected_page_sizes, expected_message",
+        [
+            ({"questions": ["chunk"], "dataset_ids": None}, 0, [4], ""),
+            ({"questions": ["chunk", "chunk"], "dataset_ids": None}, 0, [4, 4], ""),
+            ({"questions": ["chunk", ""], "dataset_ids": None}, 0, [4, 0], ""),
+            ({"questions": ["chunk"], "document_ids": None}, 102, [], "`dataset_ids` is required."),
+            ({"dataset_ids": None}, 102, [], "`questions` should be a non-empty list of strings."),
+            ({"questions": "chunk", "dataset_ids": None}, 102, [], "`questions` should be a non-empty list of strings."),
+            ({"questions": [], "dataset_ids": None}, 102, [], "`questions` should be a non-empty list of strings."),
+        ],
+    )
+    def test_basic_scenarios(self, api_key, add_chunks, payload, expected_code, expected_page_sizes, expected_message):
+        dataset_id, document_id, _ = add_chunks
+        if "dataset_ids" in payload:
+            payload["dataset_ids"] = [dataset_id]
+        if "document_ids" in payload:
+            payload["document_ids"] = [document_id]
+        res = batch_retrieval_chunks(api_key, payload)
+        assert res["code"] == expected_code
+        if expected_code == 0:
+            assert [len(ranks["chunks"]) for ranks in res["data"]] == expected_page_sizes
+        else:
+            assert res["message"] == expected_message
+
+    @pytest.mark.p2
+    def test_matches_single_retrieval(self, api_key, add_chunks):
+        dataset_id, _, _ = add_chunks
+        questions = ["chunk", "test chunk"]
+        res = batch_retrieval_chunks(api_key, {"questions": questions, "dataset_ids": [dataset_id]})
+        assert res["code"] == 0
+        for question, ranks in zip(questions, res["data"]):
+            single = retrieval_chunks(api_key, {"question": question, "dataset_ids": [dataset_id]})
+            assert single["code"] == 0
+            assert [c["id"] for c in ranks["chunks"]] == [c["id"] for c in single["data"]["chunks"]]